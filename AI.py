@@ -1,25 +1,51 @@
+"""
+Offline evaluation of resume/JD fit scoring.
+
+Batch mode scores every resume against every job description concurrently, appends each result
+to a JSONL file as soon as it is available (so an interrupted run resumes where it stopped), and
+reports precision/recall/F1 across score thresholds against a labels file.
 
+Usage:
+    python AI.py evaluate --resumes resumes/ --jds jds/ --labels labels.csv --output runs/eval.jsonl
+    python AI.py colab    # the original interactive Colab flow (one resume, three JDs)
+
+Labels are a CSV with `resume,jd,label` columns or a JSON list of {"resume", "jd", "label"}
+objects, where resume/jd are file names (with or without extension) and label is 1 for a fit.
+To run against the local mock LLM, start `python mock_llm.py` and pass
+`--base-url http://127.0.0.1:8001/v1 --api-key mock`.
+"""
+import argparse
+import csv
 import io
 import json
+import mimetypes
+import os
 import re
-from PyPDF2 import PdfReader
-from docx import Document
-from openai import OpenAI
-from google.colab import files
-from sklearn.metrics import precision_score, recall_score, f1_score
-
-# --- Initialize OpenAI ---
-api_key = input("Paste your OpenAI API key: ").strip()
-client = OpenAI(api_key=api_key)
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from llm_client import LLMClient
+from compaction import JD_TOKEN_BUDGET, RESUME_TOKEN_BUDGET, compact_text, count_tokens
+from prompts import evaluator_messages
+
 model_choice = "gpt-4"
+# Default fit threshold used for the predicted labels, and the thresholds swept in batch mode
+FIT_THRESHOLD = 65
+EVAL_THRESHOLDS = "0:100:5"
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", "8"))
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc", ".txt")
+EMPTY_RESULT = {"fit_score": 0, "matching_skills": [], "missing_skills": [], "questions": []}
 
 # --- Extract text from file ---
 def extract_text(file_bytes, filename):
     try:
         if filename.lower().endswith('.pdf'):
+            from PyPDF2 import PdfReader
+
             print(f"Reading PDF: {filename}")
             return "\n".join([page.extract_text() or "" for page in PdfReader(io.BytesIO(file_bytes)).pages])
         elif filename.lower().endswith('.docx'):
+            from docx import Document
+
             print(f"Reading DOCX: {filename}")
             return "\n".join([para.text for para in Document(io.BytesIO(file_bytes)).paragraphs])
         elif filename.lower().endswith('.txt'):
@@ -33,27 +59,25 @@ def extract_text(file_bytes, filename):
         return None
 
 # --- Analyze resume vs JD using OpenAI ---
-def analyze(cv_text, jd_text):
-    try:
-        prompt = f"""Compare the following resume and job description. Return ONLY a valid JSON with these keys:
-- fit_score (number from 0-100)
-- matching_skills: list of 3 items, each like {{ "skill": "...", "percentage": number }}
-- missing_skills: list of 3 strings
-- questions: list of 3 items, each like {{ "question": "...", "options": ["...", "...", "...", "..."], "correct": [0, 2] }}
+def analyze(cv_text, jd_text, client, model=model_choice, verbose=True):
+    """
+    Scores a resume against a job description.
 
-Resume:
-{cv_text[:4000]}
-
-Job Description:
-{jd_text[:4000]}
-"""
-
-        response = client.chat.completions.create(
-            model=model_choice,
-            messages=[
-                {"role": "system", "content": "You are an expert resume and job match evaluator."},
-                {"role": "user", "content": prompt}
-            ],
+    Returns:
+        dict: fit_score, matching_skills, missing_skills and questions, plus an "error" key if
+        the call or the parsing failed.
+    """
+    try:
+        compact_cv = compact_text(cv_text, RESUME_TOKEN_BUDGET)
+        compact_jd = compact_text(jd_text, JD_TOKEN_BUDGET)
+        if verbose:
+            print(f"Prompt tokens: {count_tokens(cv_text) + count_tokens(jd_text)} before compaction, "
+                  f"{count_tokens(compact_cv) + count_tokens(compact_jd)} after")
+        # Instructions first, then the JD, then the resume: pairs are scored JD by JD, so
+        # consecutive requests share a cacheable prefix
+        response = client.chat_completion(
+            model=model,
+            messages=evaluator_messages(compact_jd, compact_cv),
             temperature=0.0
         )
 
@@ -64,10 +88,268 @@ Job Description:
 
     except Exception as e:
         print("Error during OpenAI API call or parsing:", e)
-        return {"fit_score": 0, "matching_skills": [], "missing_skills": [], "questions": []}
+        return {**EMPTY_RESULT, "error": str(e)}
+
+# --- Batch evaluation ---
+def list_documents(directory):
+    """
+    Returns the supported files in a directory, sorted by name.
+    """
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(SUPPORTED_EXTENSIONS))
+
+
+def load_documents(paths):
+    """
+    Extracts every document in parallel with the app's extraction backends.
+
+    Returns:
+        dict: File name -> extracted text, for the documents that produced text.
+    """
+    from jobs import StoredFile
+    from utils import extract_texts
+
+    files = []
+    for path in paths:
+        with open(path, "rb") as file:
+            data = file.read()
+        files.append(StoredFile(os.path.basename(path), mimetypes.guess_type(path)[0], data))
+    texts = {}
+    for _, name, text, error in extract_texts(files):
+        if error is not None or not text:
+            print(f"Skipping {name}: {error or 'no text extracted'}")
+        else:
+            texts[name] = text
+    return texts
+
+
+def _label_key(name):
+    return os.path.splitext(os.path.basename(str(name).strip()))[0]
+
+
+def load_labels(path):
+    """
+    Reads ground-truth labels from a CSV (resume,jd,label) or JSON file.
+
+    Returns:
+        dict: (resume stem, jd stem) -> 0 or 1.
+    """
+    with open(path, newline="") as file:
+        rows = json.load(file) if path.lower().endswith(".json") else list(csv.DictReader(file))
+    return {(_label_key(row["resume"]), _label_key(row["jd"])): int(float(row["label"]))
+            for row in rows}
+
+
+def load_completed(output_path):
+    """
+    Reads the successful results of a previous run of the same output file.
+
+    Returns:
+        dict: (resume, jd) -> record. Records with an error are not included, so they are retried.
+    """
+    completed = {}
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if not record.get("error"):
+                completed[(record["resume"], record["jd"])] = record
+    return completed
+
+
+_SCORE_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_fit_score(value):
+    """
+    Reads a fit score the model may have returned as a number or a string such as "85",
+    "85%" or "85/100".
+
+    Returns:
+        float: The score, or None if there is no number in it.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value is None:
+        # A missing score on an otherwise valid answer counts as 0, as before
+        return 0.0
+    match = _SCORE_PATTERN.search(value) if isinstance(value, str) else None
+    return float(match.group(0)) if match else None
+
+
+def score_matrix(resumes, jds, output_path, client, model=model_choice, workers=EVAL_WORKERS,
+                 completed=None):
+    """
+    Scores every resume x JD pair not already in `completed`, appending one JSONL record per pair.
+
+    At most `workers` requests are in flight; each record is written and flushed as soon as its
+    request finishes.
+
+    Returns:
+        dict: (resume, jd) -> record for every pair scored in this run.
+    """
+    completed = completed or {}
+    pairs = [(resume, jd) for jd in jds for resume in resumes if (resume, jd) not in completed]
+    results = {}
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    def run(resume, jd):
+        started = time.monotonic()
+        result = analyze(resumes[resume], jds[jd], client, model, verbose=False)
+        if not isinstance(result, dict):
+            result = {**EMPTY_RESULT, "error": f"Expected a JSON object, got: {result!r:.200}"}
+        error = result.pop("error", None)
+        fit_score = parse_fit_score(result.get("fit_score"))
+        if fit_score is None:
+            # One malformed answer is recorded (and retried on the next run), not fatal
+            error = error or f"Unreadable fit_score: {result.get('fit_score')!r:.200}"
+            fit_score = 0.0
+        return {
+            "resume": resume,
+            "jd": jd,
+            "model": model,
+            "fit_score": fit_score,
+            "latency_seconds": round(time.monotonic() - started, 3),
+            "error": error,
+            "result": result,
+        }
+
+    with open(output_path, "a") as output, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = set()
+        remaining = iter(pairs)
+        done_count = 0
+        while True:
+            # Keep the pool full without materializing a future per pair
+            for pair in remaining:
+                pending.add(executor.submit(run, *pair))
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                results[(record["resume"], record["jd"])] = record
+                done_count += 1
+            print(f"\rScored {done_count} of {len(pairs)} pairs", end="", flush=True)
+    if pairs:
+        print()
+    return results
+
+
+def parse_thresholds(spec):
+    """
+    Parses "start:stop:step" (inclusive) or a comma-separated list of thresholds.
+    """
+    import numpy as np
+
+    if ":" in spec:
+        start, stop, step = (float(part) for part in spec.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(value) for value in spec.split(",")])
+
+
+def threshold_metrics(scores, labels, thresholds):
+    """
+    Computes precision, recall and F1 for every threshold in one vectorized pass.
+
+    A pair is predicted as a fit when its score is >= the threshold. Undefined ratios (no
+    predicted or no actual positives) are reported as 0.
+
+    Returns:
+        dict: Arrays keyed by threshold, precision, recall, f1, tp, fp and fn.
+    """
+    import numpy as np
+
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels, dtype=bool)
+    thresholds = np.asarray(thresholds, dtype=float)
+    predicted = scores[None, :] >= thresholds[:, None]
+    tp = (predicted & labels).sum(axis=1)
+    fp = (predicted & ~labels).sum(axis=1)
+    fn = (~predicted & labels).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {"threshold": thresholds, "precision": precision, "recall": recall, "f1": f1,
+            "tp": tp, "fp": fp, "fn": fn}
+
+
+def evaluate(args):
+    resumes = load_documents(list_documents(args.resumes))
+    jds = load_documents(list_documents(args.jds))
+    labels = load_labels(args.labels) if args.labels else {}
+    if labels and not args.all_pairs:
+        # Only score the labelled pairs
+        labelled = {resume for resume, _ in labels}, {jd for _, jd in labels}
+        resumes = {name: text for name, text in resumes.items() if _label_key(name) in labelled[0]}
+        jds = {name: text for name, text in jds.items() if _label_key(name) in labelled[1]}
+    print(f"{len(resumes)} resumes x {len(jds)} job descriptions")
+
+    completed = {} if args.restart else load_completed(args.output)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    completed = {pair: record for pair, record in completed.items()
+                 if record.get("model") == args.model}
+    if completed:
+        print(f"Resuming: {len(completed)} pairs already scored in {args.output}")
+    client = LLMClient(api_key=args.api_key or os.environ.get("API_KEY"),
+                       **({"base_url": args.base_url} if args.base_url else {}))
+    started = time.monotonic()
+    try:
+        scored = score_matrix(resumes, jds, args.output, client, args.model, args.workers,
+                              completed)
+    finally:
+        client.close()
+    elapsed = time.monotonic() - started
+    stats = client.stats.snapshot()
+    errors = sum(1 for record in scored.values() if record["error"])
+    print(f"Scored {len(scored)} pairs in {elapsed:.1f}s "
+          f"({len(scored) / elapsed if elapsed else 0:.1f} pairs/s, {errors} errors, "
+          f"avg latency {stats['avg_latency_seconds']:.2f}s, "
+          f"{stats['prompt_tokens']} prompt ({stats['cached_tokens']} cached) / "
+          f"{stats['completion_tokens']} completion tokens)")
+
+    if not labels:
+        return
+    records = {**completed, **scored}
+    pairs = [(pair, labels.get((_label_key(pair[0]), _label_key(pair[1]))))
+             for pair in records if (pair[0] in resumes and pair[1] in jds)]
+    pairs = [(pair, label) for pair, label in pairs if label is not None]
+    if not pairs:
+        print("No scored pairs match the labels file.")
+        return
+    metrics = threshold_metrics([records[pair]["fit_score"] for pair, _ in pairs],
+                                [label for _, label in pairs],
+                                parse_thresholds(args.thresholds))
+    print(f"\n--- Evaluation over {len(pairs)} labelled pairs ---")
+    print(f"{'Threshold':>9} {'Precision':>9} {'Recall':>7} {'F1':>6} {'TP':>5} {'FP':>5} {'FN':>5}")
+    for row in zip(*(metrics[key] for key in ("threshold", "precision", "recall", "f1", "tp", "fp", "fn"))):
+        print("{:>9.1f} {:>9.2f} {:>7.2f} {:>6.2f} {:>5} {:>5} {:>5}".format(*row))
+    best = int(metrics["f1"].argmax())
+    print(f"\nBest F1 {metrics['f1'][best]:.2f} at threshold {metrics['threshold'][best]:.1f}")
+
+# --- Interactive (Colab) ---
+def colab_main():
+    from google.colab import files
+    from sklearn.metrics import precision_score, recall_score, f1_score
+
+    api_key = input("Paste your OpenAI API key: ").strip()
+    client = LLMClient(api_key=api_key)
 
-# --- Main ---
-def main():
     print("Step 1: Upload your resume")
     uploaded = files.upload()
     cv_file = next(iter(uploaded))
@@ -91,11 +373,11 @@ def main():
             continue
 
         print(f"Analyzing JD {i}...")
-        result = analyze(cv_text, jd_text)
+        result = analyze(cv_text, jd_text, client)
         results.append(result)
 
     # --- Show results ---
-    threshold = 65
+    threshold = FIT_THRESHOLD
     predicted = []
     print("\n--- Evaluation Results ---")
 
@@ -122,6 +404,34 @@ def main():
     print(f"Recall:    {recall:.2f}")
     print(f"F1 Score:  {f1:.2f}")
 
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate resume/JD fit scoring.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch = subparsers.add_parser("evaluate", help="Score a resume x JD matrix and report metrics.")
+    batch.add_argument("--resumes", required=True, help="Directory of resumes (PDF, DOCX, TXT).")
+    batch.add_argument("--jds", required=True, help="Directory of job descriptions.")
+    batch.add_argument("--labels", help="CSV or JSON labels file (resume, jd, label).")
+    batch.add_argument("--output", default="evaluation_results.jsonl",
+                       help="JSONL results file; existing results are reused.")
+    batch.add_argument("--model", default=model_choice)
+    batch.add_argument("--workers", type=int, default=EVAL_WORKERS,
+                       help="Maximum number of concurrent LLM requests.")
+    batch.add_argument("--thresholds", default=EVAL_THRESHOLDS,
+                       help='Fit thresholds as "start:stop:step" or "50,65,80".')
+    batch.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. the local mock.")
+    batch.add_argument("--api-key", help="Defaults to the API_KEY environment variable.")
+    batch.add_argument("--all-pairs", action="store_true",
+                       help="Score every pair, not only the labelled ones.")
+    batch.add_argument("--restart", action="store_true",
+                       help="Discard previous results in the output file.")
+    subparsers.add_parser("colab", help="Interactive Colab flow: one resume, three JDs.")
+    args = parser.parse_args()
+    if args.command == "colab":
+        colab_main()
+    else:
+        evaluate(args)
+
 # Run it
 if __name__ == "__main__":
     main()
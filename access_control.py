@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+
+ACCESS_FILE_PATH = os.environ.get("ACCESS_FILE_PATH", "Access.json")
+# How often (seconds) the allow-list file's mtime is checked for changes
+ACCESS_RELOAD_INTERVAL = float(os.environ.get("ACCESS_RELOAD_INTERVAL", "2"))
+# Optional Firestore collection with extra entries ({"email": ..., "role": ...}); empty disables it
+ACCESS_FIRESTORE_COLLECTION = os.environ.get("ACCESS_FIRESTORE_COLLECTION", "")
+ACCESS_FIRESTORE_TTL = float(os.environ.get("ACCESS_FIRESTORE_TTL", "60"))
+
+# Higher rank wins when an email matches several entries
+ROLE_RANK = {"user": 1, "admin": 2}
+
+
+def _normalize(entry):
+    return str(entry).strip().lower()
+
+
+class AccessIndex:
+    """
+    Immutable allow-list index with O(1) lookups.
+
+    Entries are email addresses or domain wildcards ("*@example.com"). Lookups are
+    case-insensitive; an exact email entry takes precedence over a domain rule.
+    """
+
+    def __init__(self, emails=None, domains=None):
+        self.emails = emails or {}
+        self.domains = domains or {}
+
+    @classmethod
+    def from_entries(cls, entries):
+        """
+        Builds an index from (entry, role) pairs, keeping the highest role for duplicates.
+        """
+        emails, domains = {}, {}
+        for entry, role in entries:
+            entry, role = _normalize(entry), _normalize(role)
+            if role not in ROLE_RANK or not entry:
+                continue
+            if entry.startswith("*@"):
+                target, key = domains, entry[2:]
+            elif entry.startswith("@"):
+                target, key = domains, entry[1:]
+            else:
+                target, key = emails, entry
+            if ROLE_RANK[role] > ROLE_RANK.get(target.get(key), 0):
+                target[key] = role
+        return cls(emails, domains)
+
+    @classmethod
+    def from_access_json(cls, data):
+        """
+        Builds an index from the Access.json format.
+
+        Supported keys: "admins" and "users" (lists of emails or "*@domain" rules), and an
+        optional "roles" map of email or rule -> role.
+
+        Raises:
+            ValueError: If the data does not have this shape.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+        for key in ("admins", "users"):
+            value = data.get(key, [])
+            if not isinstance(value, list) or not all(isinstance(email, str) for email in value):
+                raise ValueError(f'"{key}" must be a list of strings')
+        roles = data.get("roles", {})
+        if not isinstance(roles, dict) or not all(isinstance(role, str) for role in roles.values()):
+            raise ValueError('"roles" must map entries to role names')
+        entries = [(email, "admin") for email in data.get("admins", [])]
+        entries += [(email, "user") for email in data.get("users", [])]
+        entries += list(data.get("roles", {}).items())
+        return cls.from_entries(entries)
+
+    def merged(self, other):
+        """
+        Returns a new index combining both, keeping the highest role for shared entries.
+        """
+        entries = [(email, role) for email, role in self.emails.items()]
+        entries += [(f"*@{domain}", role) for domain, role in self.domains.items()]
+        entries += [(email, role) for email, role in other.emails.items()]
+        entries += [(f"*@{domain}", role) for domain, role in other.domains.items()]
+        return AccessIndex.from_entries(entries)
+
+    def role_for(self, email):
+        """
+        Returns "admin", "user" or None if the email is not allowed.
+        """
+        email = _normalize(email)
+        role = self.emails.get(email)
+        if role is not None:
+            return role
+        _, _, domain = email.rpartition("@")
+        return self.domains.get(domain) if domain else None
+
+
+class AccessControl:
+    """
+    Allow-list backed by Access.json, reloaded when the file's mtime changes.
+
+    A reload builds a new AccessIndex and swaps the reference, so concurrent lookups always see
+    either the old or the new index. If the file is missing or invalid, the last good index is
+    kept, the problem is logged and `last_error` describes it.
+
+    Args:
+        path (str): Path to the allow-list JSON file.
+        db: Optional Firestore client for entries stored in `collection`.
+    """
+
+    def __init__(self, path=ACCESS_FILE_PATH, reload_interval=ACCESS_RELOAD_INTERVAL,
+                 db=None, collection=ACCESS_FIRESTORE_COLLECTION,
+                 firestore_ttl=ACCESS_FIRESTORE_TTL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.db = db
+        self.collection = collection
+        self.firestore_ttl = firestore_ttl
+        self.last_error = None
+        self._file_index = AccessIndex()
+        self._firestore_index = AccessIndex()
+        self._index = AccessIndex()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._firestore_loaded_at = None
+        self._lock = threading.Lock()
+        self._refresh(force=True)
+
+    def _set_error(self, message):
+        # Logged once per distinct problem; the file is checked every reload_interval
+        if message != self.last_error:
+            print(f"Access control: {message}; keeping the previous allow-list.")
+        self.last_error = message
+
+    def _load_file(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._set_error(f"Allowed emails file not found: {self.path}")
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, "r") as file:
+                self._file_index = AccessIndex.from_access_json(json.load(file))
+        except (OSError, TypeError, ValueError) as e:
+            # ValueError covers both malformed JSON and a wrongly shaped allow-list
+            self._set_error(f"Invalid allowed emails file {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        self.last_error = None
+        return True
+
+    def _load_firestore(self):
+        if self.db is None or not self.collection:
+            return False
+        now = time.monotonic()
+        if self._firestore_loaded_at is not None and now - self._firestore_loaded_at < self.firestore_ttl:
+            return False
+        try:
+            entries = []
+            for doc in self.db.collection(self.collection).stream():
+                data = doc.to_dict() or {}
+                entries.append((data.get("email") or doc.id, data.get("role")))
+        except Exception as e:
+            # Keep serving the cached entries until Firestore is reachable again
+            print(f"Error loading access entries from Firestore: {e}")
+            self._firestore_loaded_at = now
+            return False
+        self._firestore_index = AccessIndex.from_entries(entries)
+        self._firestore_loaded_at = now
+        return True
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            file_changed = self._load_file()
+            firestore_changed = self._load_firestore()
+            if file_changed or firestore_changed:
+                self._index = self._file_index.merged(self._firestore_index)
+
+    def role_for(self, email):
+        """
+        Returns the role for an email ("admin" or "user"), or None if it is not allowed.
+        """
+        self._refresh()
+        return self._index.role_for(email)
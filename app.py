@@ -1,24 +1,54 @@
 import streamlit as st
 import pandas as pd
-import authentication
 from dotenv import load_dotenv
-import openai
 import os
 import re
-from resume_analysis import resume_analysis_dashboard
+import time
+
+# Load settings from .env before the app modules read them from the environment
+load_dotenv()
+import authentication
+import usage_analytics
+import metrics
+from resume_analysis import resume_analysis_dashboard, semantic_search_dashboard
 
 # Set page config
 st.set_page_config(page_title="TalentIQ", layout="wide")
 
-# Load OpenAI API Key
-load_dotenv()
+# Check the OpenAI API Key (read by the shared client in llm_client)
 api_key = os.getenv("API_KEY")
-if api_key:
-    openai.api_key = api_key
-else:
+if not api_key:
     st.error("API Key is missing. Please check your .env file.")
     st.stop()
 
+# Admin analytics reads are cached briefly so reruns do not query Firestore again
+ANALYTICS_CACHE_TTL = 60
+
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
+def cached_user_summaries():
+    return usage_analytics.load_user_summaries(authentication.get_db())
+
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
+def cached_daily_rollups(start_date, end_date):
+    return usage_analytics.load_daily_rollups(authentication.get_db(), start_date, end_date)
+
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL)
+def cached_usage_log_page(start_date, end_date, after):
+    return usage_analytics.load_usage_log_page(authentication.get_db(), start_date, end_date, after=after)
+
+# Pipeline metrics are read from the shared JSONL event log; this TTL bounds how often it is re-read
+METRICS_CACHE_TTL = 10
+METRICS_WINDOWS = {"Last hour": 1, "Last 24 hours": 24, "Last 7 days": 24 * 7}
+
+
+@st.cache_data(ttl=METRICS_CACHE_TTL)
+def cached_metric_summaries(window_hours):
+    events = metrics.load_events(since=time.time() - window_hours * 3600)
+    return metrics.stage_summary(events), metrics.counter_totals(events), metrics.pipeline_totals(events)
+
 # -------------------- Authentication --------------------
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
@@ -36,31 +66,100 @@ if st.session_state.authenticated:
     if st.session_state.role == "user":
         st.markdown(f"<h1 style='text-align: center;'>TalentIQ - User Dashboard</h1>", unsafe_allow_html=True)
         st.write(f"Welcome, {st.session_state.user_info['name']} ({st.session_state.user_info['email']})!")
-        resume_analysis_dashboard()
+        analysis_tab, search_tab = st.tabs(["Resume Analysis", "Semantic Search"])
+        with analysis_tab:
+            resume_analysis_dashboard()
+        with search_tab:
+            semantic_search_dashboard()
     elif st.session_state.role == "admin":
         st.markdown(f"<h1 style='text-align: center;'>TalentIQ - Admin Dashboard</h1>", unsafe_allow_html=True)
         st.write(f"Welcome, {st.session_state.user_info['name']} ({st.session_state.user_info['email']})!")
-        admin_option = st.sidebar.radio("Admin Options", ["Users & Usage Analytics", "Resume Analysis"])
+        access_error = authentication.get_access_control().last_error
+        if access_error:
+            st.warning(f"The allow-list could not be reloaded: {access_error}")
+        admin_option = st.sidebar.radio("Admin Options", ["Users & Usage Analytics", "Pipeline Metrics", "Resume Analysis", "Semantic Search"])
         if admin_option == "Users & Usage Analytics":
             st.subheader("Users & Usage Analytics")
-            users_ref = authentication.db.collection("users")
-            users = users_ref.stream()
-            users_data = [user.to_dict() for user in users]
-            usage_ref = authentication.db.collection("usage_logs")
-            usage_logs = usage_ref.stream()
-            usage_data = [log.to_dict() for log in usage_logs]
-            if users_data and usage_data:
+            default_start, default_end = usage_analytics.default_date_range()
+            date_range = st.date_input("Date range", (default_start, default_end))
+            start_date, end_date = (date_range if len(date_range) == 2 else
+                                    (date_range[0], date_range[0]))
+            users_data = cached_user_summaries()
+            daily_data = cached_daily_rollups(start_date, end_date)
+            if users_data:
                 df_users = pd.DataFrame(users_data)
-                df_usage = pd.DataFrame(usage_data)
-                df_combined = pd.merge(df_users, df_usage, left_on="email", right_on="user_email", how="left")
-                df_combined = df_combined[["email", "role", "usage_count", "num_resumes", "timestamp"]]
-                df_combined.columns = ["Email ID", "Role", "Usage Count", "Num Resumes Screened", "Timestamp"]
-                st.dataframe(df_combined)
+                df_users = df_users[["email", "role", "usage_count", "total_resumes_screened", "last_used"]]
+                df_users.columns = ["Email ID", "Role", "Usage Count", "Num Resumes Screened", "Last Used"]
+                st.dataframe(df_users)
             st.write("### Summary Metrics")
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Total Resumes Screened", df_usage["num_resumes"].sum())
+                st.metric("Total Resumes Screened", sum(day["num_resumes"] for day in daily_data))
+            with col2:
+                st.metric("Unique TAs Using the App",
+                          usage_analytics.count_unique_users(daily_data))
+            if daily_data:
+                st.bar_chart(pd.DataFrame(daily_data).set_index("date")[["num_resumes", "usage_count"]])
+
+            # Raw usage log, one page at a time
+            st.write("### Usage Log")
+            page_key = (start_date, end_date)
+            if st.session_state.get("usage_log_page_key") != page_key:
+                st.session_state.usage_log_page_key = page_key
+                st.session_state.usage_log_cursors = [None]
+            cursors = st.session_state.usage_log_cursors
+            logs, next_cursor = cached_usage_log_page(start_date, end_date, cursors[-1])
+            if logs:
+                df_logs = pd.DataFrame(logs)[["user_email", "num_resumes", "timestamp"]]
+                df_logs.columns = ["Email ID", "Num Resumes Screened", "Timestamp"]
+                st.dataframe(df_logs)
+            col1, col2, col3 = st.columns([1, 1, 4])
+            with col1:
+                if st.button("Previous page", disabled=len(cursors) == 1):
+                    cursors.pop()
+                    st.rerun()
             with col2:
-                st.metric("Unique TAs Using the App", df_usage["user_email"].nunique())
+                if st.button("Next page", disabled=next_cursor is None):
+                    cursors.append(next_cursor)
+                    st.rerun()
+            with col3:
+                if st.button("Rebuild rollups from usage logs"):
+                    with st.spinner("Rebuilding rollups..."):
+                        counts = usage_analytics.rebuild_rollups(authentication.get_db())
+                    st.cache_data.clear()
+                    st.success(f"Rebuilt rollups for {counts['users']} users and {counts['days']} days.")
+        elif admin_option == "Pipeline Metrics":
+            st.subheader("Pipeline Metrics")
+            window = st.selectbox("Window", list(METRICS_WINDOWS))
+            stages, counters, totals = cached_metric_summaries(METRICS_WINDOWS[window])
+            if not stages and not counters:
+                st.info("No pipeline metrics recorded in this window.")
+            else:
+                lookups = totals["cache_hits"] + totals["cache_misses"]
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Cache Hit Rate", f"{totals['cache_hits'] / lookups:.0%}" if lookups else "-")
+                with col2:
+                    st.metric("Extraction Fallbacks", totals["extraction_fallbacks"])
+                with col3:
+                    st.metric("Prompt Tokens", totals["prompt_tokens"],
+                              help=f"{totals['cached_tokens']} served from the provider's prompt cache")
+                with col4:
+                    st.metric("Completion Tokens", totals["completion_tokens"])
+                if stages:
+                    df_stages = pd.DataFrame(stages)
+                    df_stages[["p50", "p95"]] = (df_stages[["p50", "p95"]] * 1000).round(1)
+                    df_stages["total"] = df_stages["total"].round(2)
+                    df_stages.columns = ["Stage", "Count", "p50 (ms)", "p95 (ms)", "Total (s)"]
+                    st.write("### Stage Latency")
+                    st.dataframe(df_stages)
+                    st.bar_chart(df_stages.set_index("Stage")[["p50 (ms)", "p95 (ms)"]])
+                if counters:
+                    st.write("### Counters")
+                    df_counters = pd.DataFrame(counters)
+                    df_counters.columns = ["Counter", "Labels", "Value"]
+                    st.dataframe(df_counters)
         elif admin_option == "Resume Analysis":
-            resume_analysis_dashboard()
\ No newline at end of file
+            resume_analysis_dashboard()
+        elif admin_option == "Semantic Search":
+            semantic_search_dashboard()
\ No newline at end of file
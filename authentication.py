@@ -1,37 +1,29 @@
 import os
-import json
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from google.oauth2 import id_token
-from datetime import datetime
+from access_control import ACCESS_FIRESTORE_COLLECTION, AccessControl
+# FIREBASE_CREDENTIALS_PATH and log_usage are re-exported for existing callers
+from usage_logger import FIREBASE_CREDENTIALS_PATH, get_firestore_db, log_usage
+# Firebase, Google OAuth and the allow-list are created on first use and cached for the
+# process, so importing this module (on every script run) stays cheap.
 # - Firebase Setup -
-FIREBASE_CREDENTIALS_PATH = "talent-iq-firebase.json"
-if not os.path.exists(FIREBASE_CREDENTIALS_PATH):
-    raise FileNotFoundError(f"Firebase credentials file not found: {FIREBASE_CREDENTIALS_PATH}")
-cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+@st.cache_resource
+def get_db():
+    return get_firestore_db()
+def __getattr__(name):
+    # Keeps `authentication.db` working for existing callers
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 # - OAuth 2.0 Setup -
 CLIENT_SECRET_PATH = "client_secret.json"
-if not os.path.exists(CLIENT_SECRET_PATH):
-    raise FileNotFoundError(f"OAuth credentials file not found: {CLIENT_SECRET_PATH}")
-# Load allowed emails from JSON file
-def load_allowed_emails():
-    try:
-        with open("Access.json", "r") as file:
-            data = json.load(file)
-            return data
-    except FileNotFoundError:
-        st.error("Allowed emails file not found.")
-        return {"admins": [], "users": []}
-    except json.JSONDecodeError:
-        st.error("Invalid JSON format in allowed emails file.")
-        return {"admins": [], "users": []}
-ALLOWED_EMAILS = load_allowed_emails()
+# Allow-list from Access.json (hot-reloaded on change), optionally extended from Firestore
+@st.cache_resource
+def get_access_control():
+    return AccessControl(db=get_db() if ACCESS_FIRESTORE_COLLECTION else None)
 def get_flow():
+    from google_auth_oauthlib.flow import Flow
+    if not os.path.exists(CLIENT_SECRET_PATH):
+        raise FileNotFoundError(f"OAuth credentials file not found: {CLIENT_SECRET_PATH}")
     return Flow.from_client_secrets_file(
         CLIENT_SECRET_PATH,
         scopes=["openid", "https://www.googleapis.com/auth/userinfo.email", "https://www.googleapis.com/auth/userinfo.profile"],
@@ -71,6 +63,8 @@ def authenticate():
             )
         return False, None
     try:
+        from google.auth.transport.requests import Request
+        from google.oauth2 import id_token
         code = query_params["code"]
         flow = get_flow()
         flow.fetch_token(code=code)
@@ -78,16 +72,13 @@ def authenticate():
         id_info = id_token.verify_oauth2_token(credentials.id_token, Request())
         # Check if the email is allowed
         user_email = id_info["email"]
-        if user_email not in ALLOWED_EMAILS["admins"] + ALLOWED_EMAILS["users"]:
+        # Assign role based on email (allow-list problems are logged and shown to admins only)
+        role = get_access_control().role_for(user_email)
+        if role is None:
             st.error("You do not have access to this application.")
             return False, None
-        # Assign role based on email
-        if user_email in ALLOWED_EMAILS["admins"]:
-            role = "admin"
-        else:
-            role = "user"
         st.success(f"Logged in as: {id_info['name']} ({id_info['email']})")
-        user_ref = db.collection("users").document(id_info['email'])
+        user_ref = get_db().collection("users").document(id_info['email'])
         user_doc = user_ref.get()
         if not user_doc.exists:
             user_ref.set({
@@ -109,19 +100,6 @@ def authenticate():
     except Exception as e:
         st.error(f"Authentication failed: {e}")
         return False, None
-# Function to log usage
-def log_usage(email, num_resumes):
-    usage_ref = db.collection("usage_logs").document()
-    usage_ref.set({
-        "user_email": email,
-        "num_resumes": num_resumes,
-        "timestamp": datetime.now()
-    })
-    user_ref = db.collection("users").document(email)
-    user_ref.update({
-        "total_resumes_screened": firestore.Increment(num_resumes),
-        "usage_count": firestore.Increment(1)
-    })
 # Sign-out functionality
 def sign_out():
     st.session_state.authenticated = False
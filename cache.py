@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# Location and limits of the on-disk analysis cache
+CACHE_PATH = os.environ.get("ANALYSIS_CACHE_PATH", "analysis_cache.db")
+CACHE_TTL_SECONDS = float(os.environ.get("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+
+
+def normalize_for_key(text):
+    """
+    Normalizes text before hashing so whitespace-only differences share a cache entry.
+    """
+    return " ".join((text or "").split())
+
+
+def make_cache_key(kind, model, prompt_version, *parts):
+    """
+    Builds a content-addressed cache key from the request kind, model, prompt version and inputs.
+    """
+    digest = hashlib.sha256()
+    for part in (kind, model, prompt_version, *parts):
+        value = normalize_for_key(str(part)).encode("utf-8")
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(len(value).to_bytes(8, "big"))
+        digest.update(value)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    Persistent SQLite cache of parsed LLM responses with LRU and TTL eviction.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # The connection is shared by the scoring threads, so access is serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Returns the cached value for the key, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.increment("cache", result="miss")
+                return None
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                metrics.increment("cache", result="miss")
+                return None
+            self._conn.execute(
+                "UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        metrics.increment("cache", result="hit")
+        return json.loads(value)
+
+    def set(self, key, value):
+        """
+        Stores a JSON-serializable value and evicts the least recently used entries over the limit.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now))
+            if self.ttl:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,))
+            if self.max_entries:
+                self._conn.execute(
+                    """
+                    DELETE FROM analyses WHERE key IN (
+                        SELECT key FROM analyses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )
+                    """, (self.max_entries,))
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the number of stored entries.
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def clear(self):
+        """
+        Removes every cached entry and resets the counters.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM analyses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the process-wide analysis cache, creating it on first use.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnalysisCache()
+    return _cache
@@ -0,0 +1,258 @@
+import os
+import re
+import threading
+
+# Default token budgets for the resume and job description sent to the LLM
+RESUME_TOKEN_BUDGET = int(os.environ.get("RESUME_TOKEN_BUDGET", "2500"))
+JD_TOKEN_BUDGET = int(os.environ.get("JD_TOKEN_BUDGET", "1500"))
+
+# Tokens kept from the text before the first section header (name, email, location)
+HEADER_TOKEN_BUDGET = 120
+# Longer units (e.g. a bullet list extracted without sentence punctuation) are split into
+# windows of at most this many tokens, so a long section is trimmed instead of dropped
+UNIT_MAX_TOKENS = 64
+
+# Section priorities: lower is kept first; None means the section is dropped entirely.
+# Skills and projects carry 60% of the scoring rubric, so they are kept first.
+SECTION_PRIORITIES = {
+    "skills": 0,
+    "technical skills": 0,
+    "key skills": 0,
+    "core competencies": 0,
+    "programming languages": 0,
+    "projects": 0,
+    "academic projects": 0,
+    "personal projects": 0,
+    "requirements": 0,
+    "qualifications": 0,
+    "required skills": 0,
+    "responsibilities": 1,
+    "experience": 1,
+    "work experience": 1,
+    "professional experience": 1,
+    "employment history": 1,
+    "internships": 1,
+    "education": 2,
+    "certifications": 2,
+    "summary": 2,
+    "professional summary": 2,
+    "objective": 3,
+    "career objective": 3,
+    "achievements": 3,
+    "awards": 3,
+    "publications": 3,
+    "languages": 3,
+    "nice to have": 3,
+    "about us": 4,
+    "about the company": 4,
+    "benefits": 4,
+    "perks": 4,
+    "hobbies": 4,
+    "interests": 4,
+    "extracurricular activities": 4,
+    "references": None,
+    "declaration": None,
+    "personal details": None,
+    "equal opportunity": None,
+}
+HEADER_PRIORITY = -1
+
+# Headers are matched in Title Case or UPPER CASE, at the start of a line (after an optional
+# bullet) and standing alone: followed by a colon or the end of the line. Running text such as
+# "Experience with Python is required" or "Soft Skills" is therefore not mistaken for a section.
+# Longer names are tried first so "Work Experience" beats "Experience".
+_SECTION_NAMES = sorted(SECTION_PRIORITIES, key=len, reverse=True)
+_SECTION_PATTERN = re.compile(
+    r"^[ \t]*(?:[-*|>][ \t]*)?(" + "|".join(
+        alternative
+        for name in _SECTION_NAMES
+        for alternative in (re.escape(name.title()), re.escape(name.upper()))
+    ) + r")[ \t]*(?::[ \t]*|$)",
+    re.MULTILINE,
+)
+
+# Lines, sentences, bullets and pipe-separated fields are the units that are deduplicated and
+# budgeted
+_UNIT_SPLIT_PATTERN = re.compile(r"\s*\n\s*|(?<=[.;!?])\s+|\s+(?=[-*|>]\s)")
+_LOW_VALUE_PATTERN = re.compile(
+    r"references (?:are )?available|available (?:up)?on request|i hereby declare|"
+    r"curriculum vitae|^page \d+( of \d+)?$|^resume$",
+    re.IGNORECASE,
+)
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    Returns the tiktoken encoding used by o-series models, or False if tiktoken is unavailable.
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Counts tokens with the local tiktoken tokenizer, falling back to a word/punctuation estimate.
+    """
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_FALLBACK_TOKEN_PATTERN.findall(text))
+
+
+def segment_sections(text):
+    """
+    Splits text into sections on recognized headers.
+
+    Returns:
+        list: (section_name, body) tuples in document order. Text before the first header is
+        returned as the "header" section.
+    """
+    sections = []
+    position = 0
+    name = "header"
+    for match in _SECTION_PATTERN.finditer(text):
+        sections.append((name, text[position:match.start()].strip()))
+        name = match.group(1).lower()
+        position = match.end()
+    sections.append((name, text[position:].strip()))
+    return [(name, body) for name, body in sections if body or name != "header"]
+
+
+def _split_units(body):
+    return [unit.strip() for unit in _UNIT_SPLIT_PATTERN.split(body) if unit and unit.strip()]
+
+
+def _token_windows(unit, max_tokens=UNIT_MAX_TOKENS):
+    """
+    Splits a unit into consecutive word windows of at most `max_tokens` tokens.
+
+    Returns:
+        list: (text, tokens) tuples.
+    """
+    tokens = count_tokens(unit)
+    if tokens <= max_tokens:
+        return [(unit, tokens)]
+    windows, words, window_tokens = [], [], 0
+    for word in unit.split(" "):
+        word_tokens = count_tokens(" " + word)
+        if words and window_tokens + word_tokens > max_tokens:
+            windows.append(" ".join(words))
+            words, window_tokens = [], 0
+        words.append(word)
+        window_tokens += word_tokens
+    windows.append(" ".join(words))
+    return [(window, count_tokens(window)) for window in windows]
+
+
+def compact_text(text, token_budget):
+    """
+    Compacts a resume or job description to fit a token budget.
+
+    Drops low-value sections (references, declarations), duplicate and boilerplate sentences,
+    then keeps sentences by section priority (skills and projects first) until the budget is
+    used. Sentences longer than UNIT_MAX_TOKENS are kept window by window. Kept sentences stay
+    in document order under their section headers. Text without recognized section headers is
+    kept from the top.
+
+    Args:
+        text (str): The normalized resume or job description text.
+        token_budget (int): Maximum number of tokens in the result.
+
+    Returns:
+        str: The compacted text.
+    """
+    if not text or (count_tokens(text) <= token_budget and not _LOW_VALUE_PATTERN.search(text)):
+        return text
+
+    seen = set()
+    candidates = []  # (priority, order, section_index, unit, tokens)
+    sections = segment_sections(text)
+    # Without any header, the leading text is the whole document: it is not capped
+    has_sections = any(name != "header" for name, _ in sections)
+    for section_index, (name, body) in enumerate(sections):
+        if name == "header":
+            priority = HEADER_PRIORITY if has_sections else 2
+        else:
+            priority = SECTION_PRIORITIES.get(name, 2)
+        if priority is None:
+            continue
+        for unit in _split_units(body):
+            for window, tokens in _token_windows(unit):
+                key = " ".join(window.lstrip("-*|> ").lower().split())
+                if not key or key in seen or _LOW_VALUE_PATTERN.search(key):
+                    continue
+                seen.add(key)
+                candidates.append((priority, len(candidates), section_index, window, tokens))
+
+    kept = []
+    # Every output line costs its tokens plus the newline joining it to the next one; the last
+    # line has no newline, hence the - 1 in the budget check
+    used = 0
+    header_used = 0
+    titled = set()
+    for priority, order, section_index, unit, tokens in sorted(candidates):
+        if priority == HEADER_PRIORITY and header_used + tokens > HEADER_TOKEN_BUDGET:
+            continue
+        cost = tokens + 1
+        name = sections[section_index][0]
+        if name != "header" and section_index not in titled:
+            # The section's title line is written with its first kept unit
+            cost += count_tokens(f"{name.title()}:") + 1
+        if used + cost - 1 > token_budget:
+            continue
+        used += cost
+        if priority == HEADER_PRIORITY:
+            header_used += tokens
+        titled.add(section_index)
+        kept.append((order, section_index, unit))
+
+    output = []
+    current_section = None
+    for _, section_index, unit in sorted(kept):
+        if section_index != current_section:
+            name = sections[section_index][0]
+            if name != "header":
+                output.append(f"{name.title()}:")
+            current_section = section_index
+        output.append(unit)
+    return "\n".join(output)
+
+
+class CompactionStats:
+    """
+    Thread-safe running totals of prompt tokens before and after compaction.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, tokens_before, tokens_after):
+        with self._lock:
+            self.prompts += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+
+    def snapshot(self):
+        with self._lock:
+            return {"prompts": self.prompts,
+                    "tokens_before": self.tokens_before,
+                    "tokens_after": self.tokens_after}
+
+
+compaction_stats = CompactionStats()
@@ -0,0 +1,296 @@
+"""
+Persistent store of every extracted resume, keyed by a hash of its normalized text.
+
+The store keeps each resume's text, the uploaded files that produced it (so a re-uploaded file
+is not parsed again), a MinHash signature for near-duplicate detection across uploads, and the
+analysis of the resume for every job description version it was scored against (so a JD only
+needs LLM calls for resumes it has not been scored against yet).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from cache import normalize_for_key
+
+CORPUS_DB_PATH = os.environ.get("CORPUS_DB_PATH", "corpus.db")
+# MinHash signature length, split into LSH bands of MINHASH_PERMUTATIONS / MINHASH_BANDS rows.
+# 16 bands of 8 rows make resumes with a Jaccard similarity above ~0.7 likely candidates.
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 5
+# Estimated Jaccard similarity above which two different resumes are reported as duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.85"))
+
+# Universal hash family (a * x + b) mod p over 32-bit shingle hashes; a < 2**31 keeps the
+# products within uint64
+_MINHASH_PRIME = 4294967311
+_MINHASH_SEED = 1729
+_minhash_params = None
+
+
+def content_hash(text):
+    """
+    Returns the resume key: a hash of the whitespace-normalized text.
+    """
+    return hashlib.sha256(normalize_for_key(text).encode("utf-8")).hexdigest()[:16]
+
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _params():
+    global _minhash_params
+    if _minhash_params is None:
+        import numpy as np
+
+        rng = np.random.default_rng(_MINHASH_SEED)
+        _minhash_params = (rng.integers(1, 2**31, MINHASH_PERMUTATIONS, dtype=np.uint64),
+                           rng.integers(0, _MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64))
+    return _minhash_params
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Returns the set of 32-bit hashes of the word `size`-grams of a text.
+    """
+    words = normalize_for_key(text).lower().split()
+    if len(words) < size:
+        words = words + [""] * (size - len(words))
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+            for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text):
+    """
+    Computes the MinHash signature of a text's shingles in one vectorized pass.
+
+    Returns:
+        numpy.ndarray: MINHASH_PERMUTATIONS uint64 values.
+    """
+    import numpy as np
+
+    a, b = _params()
+    values = np.fromiter(shingles(text), dtype=np.uint64)
+    # permutations x shingles matrix of hashed values, reduced to the minimum per permutation
+    return ((a[:, None] * values[None, :] + b[:, None]) % _MINHASH_PRIME).min(axis=1)
+
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Estimates the Jaccard similarity of two texts from their MinHash signatures.
+    """
+    return float((signature_a == signature_b).mean())
+
+
+def _band_keys(signature):
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [(band, hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                   digest_size=8).hexdigest())
+            for band in range(MINHASH_BANDS)]
+
+
+class CorpusStore:
+    """
+    SQLite-backed resume corpus with file-level dedup, near-duplicate detection and per-JD scores.
+    """
+
+    def __init__(self, path=CORPUS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS resumes (
+                content_hash TEXT PRIMARY KEY,
+                file_name TEXT,
+                text TEXT NOT NULL,
+                signature BLOB,
+                duplicate_of TEXT,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS resume_files (
+                file_hash TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                file_name TEXT
+            );
+            CREATE TABLE IF NOT EXISTS resume_bands (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                content_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS resume_bands_bucket ON resume_bands (band, bucket);
+            CREATE TABLE IF NOT EXISTS scores (
+                jd_key TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (jd_key, content_hash)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def text_for_file(self, digest):
+        """
+        Returns the stored text of an already extracted file, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT r.text FROM resume_files f JOIN resumes r USING (content_hash) "
+                "WHERE f.file_hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def add_resume(self, text, file_name=None, digest=None):
+        """
+        Stores a resume (if new) and the file it came from.
+
+        A new resume is compared against the corpus through MinHash LSH; if an earlier resume is
+        at least NEAR_DUPLICATE_THRESHOLD similar, it is recorded as `duplicate_of`.
+
+        Returns:
+            tuple: (content_hash, duplicate_of) where duplicate_of is a content hash or None.
+        """
+        key = content_hash(text)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT duplicate_of FROM resumes WHERE content_hash = ?", (key,)).fetchone()
+            if row is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE resumes SET last_seen = ? WHERE content_hash = ?", (now, key))
+                    if digest:
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO resume_files VALUES (?, ?, ?)",
+                            (digest, key, file_name))
+                return key, row[0]
+        signature = minhash_signature(text)
+        bands = _band_keys(signature)
+        duplicate_of = self._find_near_duplicate(signature, bands)
+        with self._lock:
+            with self._conn:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO resumes (content_hash, file_name, text, signature, "
+                    "duplicate_of, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, file_name, text, signature.tobytes(), duplicate_of, now, now)).rowcount
+                if inserted:
+                    self._conn.executemany(
+                        "INSERT INTO resume_bands (band, bucket, content_hash) VALUES (?, ?, ?)",
+                        [(band, bucket, key) for band, bucket in bands])
+                if digest:
+                    self._conn.execute("INSERT OR IGNORE INTO resume_files VALUES (?, ?, ?)",
+                                       (digest, key, file_name))
+        return key, duplicate_of
+
+    def _find_near_duplicate(self, signature, bands):
+        import numpy as np
+
+        clauses = " OR ".join(["(band = ? AND bucket = ?)"] * len(bands))
+        params = [value for band in bands for value in band]
+        with self._lock:
+            candidates = self._conn.execute(
+                f"SELECT DISTINCT r.content_hash, r.signature, r.duplicate_of FROM resume_bands b "
+                f"JOIN resumes r USING (content_hash) WHERE {clauses}", params).fetchall()
+        best, best_similarity = None, NEAR_DUPLICATE_THRESHOLD
+        for key, blob, duplicate_of in candidates:
+            similarity = estimate_similarity(signature, np.frombuffer(blob, dtype=np.uint64))
+            if similarity >= best_similarity:
+                # Point at the original of a chain of near-duplicates
+                best, best_similarity = duplicate_of or key, similarity
+        return best
+
+    def duplicate_of(self, key):
+        """
+        Returns the content hash of the resume this one near-duplicates, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT duplicate_of FROM resumes WHERE content_hash = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_text(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM resumes WHERE content_hash = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def file_name(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_name FROM resumes WHERE content_hash = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_score(self, jd_key, key):
+        """
+        Returns the stored analysis of a resume for a JD version, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM scores WHERE jd_key = ? AND content_hash = ?",
+                (jd_key, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_score(self, jd_key, key, analysis):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO scores (jd_key, content_hash, analysis, created_at) "
+                    "VALUES (?, ?, ?, ?)", (jd_key, key, json.dumps(analysis), time.time()))
+
+    def list_resumes(self, include_duplicates=False):
+        """
+        Returns (content_hash, file_name, text) for the stored resumes, oldest first.
+        """
+        query = "SELECT content_hash, file_name, text FROM resumes"
+        if not include_duplicates:
+            query += " WHERE duplicate_of IS NULL"
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY first_seen").fetchall()
+
+    def resume_keys(self):
+        """
+        Returns the content hashes of the stored resumes without near-duplicates, oldest first.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT content_hash FROM resumes WHERE duplicate_of IS NULL ORDER BY first_seen")]
+
+    def count_unscored(self, jd_key):
+        """
+        Returns the number of stored resumes (without near-duplicates) not yet scored for a JD
+        version.
+        """
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT COUNT(*) FROM resumes r WHERE duplicate_of IS NULL AND NOT EXISTS "
+                "(SELECT 1 FROM scores s WHERE s.jd_key = ? AND s.content_hash = r.content_hash)",
+                (jd_key,)).fetchone()
+        return total
+
+    def count(self):
+        with self._lock:
+            (total,) = self._conn.execute("SELECT COUNT(*) FROM resumes").fetchone()
+        return total
+
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus():
+    """
+    Returns the process-wide corpus store, creating it on first use.
+    """
+    global _corpus
+    if _corpus is None:
+        with _corpus_lock:
+            if _corpus is None:
+                _corpus = CorpusStore()
+    return _corpus
@@ -0,0 +1,488 @@
+"""
+Local semantic index over the resume corpus, used to shortlist resumes for a job description
+before any LLM scoring.
+
+Resumes are embedded on the CPU, with a sentence-transformers model when the package is
+installed and otherwise with a feature-hashing embedder over words and word bigrams. The vectors
+are kept in a memory-mapped NumPy matrix. Once the index holds IVF_MIN_ROWS resumes it is
+partitioned into an inverted file (IVF): a k-means codebook of centroids, where a search only
+scores the rows listed under the EMBEDDING_NPROBE centroids closest to the query.
+
+Files in EMBEDDING_INDEX_DIR (data files carry a random suffix so a rewrite never changes a file
+another process has mapped; meta.json is replaced last and names the current ones):
+    meta.json        embedder, dimension, row count and the resume key of every row
+    vectors.*.npy    float32 L2-normalized rows (capacity x dimension)
+    alive.*.npy      bool per row; deleted rows are tombstoned until the index is compacted
+    lists.*.npy      int32 IVF list of every row (-1 before the index is trained)
+    centroids.*.npy  float32 IVF centroids
+"""
+import json
+import math
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+import metrics
+from prefilter import tokenize
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writes are only serialized within one process
+    fcntl = None
+
+EMBEDDING_INDEX_DIR = os.environ.get("EMBEDDING_INDEX_DIR", "embedding_index")
+# "auto" uses the sentence-transformers model when it is installed, "hashing" never loads it
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "auto")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+HASHING_DIMENSION = 512
+# The model only reads a few hundred word pieces, so long resumes are embedded in chunks of
+# this many words and the chunk vectors averaged
+EMBEDDING_CHUNK_WORDS = 180
+EMBEDDING_BATCH_SIZE = 64
+
+# IVF: brute force below IVF_MIN_ROWS live rows; about sqrt(rows) lists, retrained whenever the
+# index has doubled since the last training
+IVF_MIN_ROWS = int(os.environ.get("IVF_MIN_ROWS", "4096"))
+IVF_MAX_LISTS = 1024
+IVF_TRAIN_ROWS_PER_LIST = 64
+IVF_ITERATIONS = 10
+EMBEDDING_NPROBE = int(os.environ.get("EMBEDDING_NPROBE", "16"))
+# Deleted rows are dropped from the files once they make up this share of the index
+COMPACT_FRACTION = 0.25
+_ASSIGN_CHUNK = 8192
+
+
+# -- Embedders --
+class HashingEmbedder:
+    """
+    Embeds text as a signed feature-hashing vector of its terms and term bigrams, weighted by
+    1 + log(term frequency). Needs nothing beyond NumPy.
+    """
+
+    def __init__(self, dimension=HASHING_DIMENSION):
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            features = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+            if not features:
+                continue
+            hashes, counts = np.unique(
+                np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                            dtype=np.uint32, count=len(features)),
+                return_counts=True)
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            np.add.at(vectors[row], hashes % self.dimension, signs * (1 + np.log(counts)))
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Embeds text with a sentence-transformers model on the CPU, averaging the vectors of
+    EMBEDDING_CHUNK_WORDS-word chunks.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts):
+        import numpy as np
+
+        chunks, owners = [], []
+        for row, text in enumerate(texts):
+            words = text.split() or [""]
+            for start in range(0, len(words), EMBEDDING_CHUNK_WORDS):
+                chunks.append(" ".join(words[start:start + EMBEDDING_CHUNK_WORDS]))
+                owners.append(row)
+        chunk_vectors = self.model.encode(chunks, batch_size=EMBEDDING_BATCH_SIZE,
+                                          normalize_embeddings=True, convert_to_numpy=True)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(vectors, np.asarray(owners), chunk_vectors.astype(np.float32))
+        return _normalize(vectors)
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """
+    Returns the process-wide embedder: the sentence-transformers model if EMBEDDING_BACKEND
+    allows it and it loads, otherwise the hashing embedder.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                embedder = None
+                if EMBEDDING_BACKEND != "hashing":
+                    try:
+                        embedder = SentenceTransformerEmbedder()
+                    except Exception as e:
+                        if EMBEDDING_BACKEND == "model":
+                            raise
+                        print(f"Embedding model unavailable, using feature hashing: {e}")
+                _embedder = embedder or HashingEmbedder()
+    return _embedder
+
+
+# -- IVF --
+def _nearest(vectors, centroids):
+    """
+    Returns the index of the most similar centroid for every row, in bounded-memory chunks.
+    """
+    import numpy as np
+
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        block = np.asarray(vectors[start:start + _ASSIGN_CHUNK])
+        assignments[start:start + len(block)] = (block @ centroids.T).argmax(axis=1)
+    return assignments
+
+
+def train_centroids(vectors, num_lists, iterations=IVF_ITERATIONS, seed=0):
+    """
+    Runs spherical k-means on (a sample of) unit vectors.
+
+    Returns:
+        numpy.ndarray: num_lists L2-normalized float32 centroids.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), num_lists * IVF_TRAIN_ROWS_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = np.flatnonzero(~sums.any(axis=1))
+        # Re-seed empty lists with random sample rows
+        sums[empty] = sample[rng.choice(len(sample), len(empty))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+# -- Index --
+class EmbeddingIndex:
+    """
+    Memory-mapped vector index keyed by corpus resume keys, with incremental add/delete and
+    (approximate, once trained) top-K cosine search. Safe to share between threads; writes from
+    several processes are serialized with a file lock.
+
+    Args:
+        directory (str): Where the index files live.
+        embedder: Object with `name`, `dimension` and `embed(texts)`; defaults to get_embedder().
+    """
+
+    def __init__(self, directory=EMBEDDING_INDEX_DIR, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or get_embedder()
+        self._lock = threading.RLock()
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._loaded_stamp = None
+        self._set_empty()
+
+    def _set_empty(self):
+        self._meta = {"embedder": self.embedder.name, "dimension": self.embedder.dimension,
+                      "count": 0, "deleted": 0, "trained_rows": 0, "keys": [], "files": {}}
+        self._arrays = {}
+        self._row_of = {}
+
+    # -- Loading and saving --
+    def _load(self):
+        """
+        (Re)maps the index files if another process or thread saved a newer meta.json.
+        """
+        for _ in range(3):
+            try:
+                stat = os.stat(self._meta_path)
+            except FileNotFoundError:
+                if self._loaded_stamp is not None:
+                    self._set_empty()
+                    self._loaded_stamp = None
+                return
+            stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if stamp == self._loaded_stamp:
+                return
+            try:
+                with open(self._meta_path) as file:
+                    meta = json.load(file)
+                if meta.get("embedder") != self.embedder.name:
+                    # Built by another embedder: treated as empty and rebuilt on the next write
+                    self._set_empty()
+                else:
+                    self._open(meta)
+                self._loaded_stamp = stamp
+                return
+            except (FileNotFoundError, ValueError):
+                # Replaced while being read; read the newer meta.json
+                continue
+
+    def _open(self, meta):
+        import numpy as np
+
+        arrays = {kind: np.load(os.path.join(self.directory, name), mmap_mode="r+")
+                  for kind, name in meta["files"].items()}
+        alive = arrays.get("alive")
+        live_rows = np.flatnonzero(alive[:meta["count"]]) if alive is not None else []
+        self._meta, self._arrays = meta, arrays
+        self._row_of = {meta["keys"][row]: int(row) for row in live_rows}
+
+    def _new_file(self, kind, shape, dtype):
+        from numpy.lib.format import open_memmap
+
+        name = f"{kind}.{os.urandom(4).hex()}.npy"
+        self._meta["files"][kind] = name
+        self._arrays[kind] = open_memmap(os.path.join(self.directory, name), mode="w+",
+                                         dtype=dtype, shape=shape)
+        return self._arrays[kind]
+
+    def _save(self):
+        for array in self._arrays.values():
+            array.flush()
+        temp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self._meta, file)
+        os.replace(temp_path, self._meta_path)
+        stat = os.stat(self._meta_path)
+        self._loaded_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        # Files no longer named by meta.json stay readable by processes that still map them
+        current = set(self._meta["files"].values())
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy") and name not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._load()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- Reads --
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._row_of)
+
+    def keys(self):
+        with self._lock:
+            self._load()
+            return set(self._row_of)
+
+    def search(self, query, k=10, nprobe=EMBEDDING_NPROBE):
+        """
+        Returns the `k` indexed resumes most similar to `query`.
+
+        Args:
+            query (str): Job description (or any text).
+            nprobe (int): IVF lists scanned once the index is trained; more is slower and more
+                exact.
+
+        Returns:
+            list: (resume key, cosine similarity) pairs, most similar first.
+        """
+        import numpy as np
+
+        with self._lock:
+            self._load()
+            count = self._meta["count"]
+            if not self._row_of or not query.strip() or k < 1:
+                return []
+            with metrics.span("embed", backend=self.embedder.name, kind="query"):
+                vector = self.embedder.embed([query])[0]
+            with metrics.span("semantic_search"):
+                vectors, alive = self._arrays["vectors"], self._arrays["alive"]
+                centroids = self._arrays.get("centroids")
+                if centroids is not None and nprobe < len(centroids):
+                    probe = np.argpartition(-(centroids @ vector), nprobe)[:nprobe]
+                    rows = np.flatnonzero(np.isin(self._arrays["lists"][:count], probe) &
+                                          alive[:count])
+                    scores = vectors[rows] @ vector
+                else:
+                    rows = np.flatnonzero(alive[:count])
+                    scores = (vectors[:count] @ vector)[rows]
+                if len(rows) > k:
+                    top = np.argpartition(-scores, k)[:k]
+                    rows, scores = rows[top], scores[top]
+                order = np.argsort(-scores)
+                keys = self._meta["keys"]
+                return [(keys[rows[i]], float(scores[i])) for i in order]
+
+    # -- Writes --
+    def add(self, items):
+        """
+        Embeds and adds resumes that are not indexed yet.
+
+        Args:
+            items: Iterable of (resume key, text) pairs.
+
+        Returns:
+            int: The number of resumes added.
+        """
+        with self._lock:
+            self._load()
+            pending = {}
+            for key, text in items:
+                if key not in self._row_of and key not in pending and text and text.strip():
+                    pending[key] = text
+        if not pending:
+            return 0
+        # Embedded before taking the file lock so other writers are not held up by the model
+        with metrics.span("embed", backend=self.embedder.name, kind="resume"):
+            vectors = self.embedder.embed(list(pending.values()))
+        with self._write_lock():
+            new_rows = [row for row, key in enumerate(pending) if key not in self._row_of]
+            if not new_rows:
+                return 0
+            vectors = vectors[new_rows]
+            keys = [list(pending)[row] for row in new_rows]
+            start = self._meta["count"]
+            end = start + len(keys)
+            self._reserve(end)
+            self._arrays["vectors"][start:end] = vectors
+            self._arrays["alive"][start:end] = True
+            centroids = self._arrays.get("centroids")
+            self._arrays["lists"][start:end] = (_nearest(vectors, centroids)
+                                                if centroids is not None else -1)
+            self._meta["keys"].extend(keys)
+            self._meta["count"] = end
+            self._row_of.update((key, start + offset) for offset, key in enumerate(keys))
+            live = len(self._row_of)
+            if live >= IVF_MIN_ROWS and live >= 2 * self._meta["trained_rows"]:
+                self._train()
+            self._save()
+            return len(keys)
+
+    def delete(self, keys):
+        """
+        Removes resumes from the index.
+
+        Returns:
+            int: The number of resumes removed.
+        """
+        with self._write_lock():
+            rows = [self._row_of.pop(key) for key in keys if key in self._row_of]
+            if not rows:
+                return 0
+            self._arrays["alive"][rows] = False
+            self._meta["deleted"] += len(rows)
+            if self._meta["deleted"] >= COMPACT_FRACTION * self._meta["count"]:
+                self._compact()
+            self._save()
+            return len(rows)
+
+    def sync(self, corpus):
+        """
+        Brings the index in line with the corpus: adds resumes it has not embedded yet and drops
+        the ones no longer listed (near-duplicates are not indexed).
+
+        Returns:
+            tuple: (added, deleted) counts.
+        """
+        keys = corpus.resume_keys()
+        indexed = self.keys()
+        missing = [key for key in keys if key not in indexed]
+        added = 0
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE * 4):
+            added += self.add((key, corpus.get_text(key))
+                              for key in missing[start:start + EMBEDDING_BATCH_SIZE * 4])
+        deleted = self.delete(indexed - set(keys))
+        return added, deleted
+
+    def _reserve(self, rows):
+        """
+        Grows the row files to hold at least `rows` rows, doubling their capacity.
+        """
+        import numpy as np
+
+        vectors = self._arrays.get("vectors")
+        capacity = len(vectors) if vectors is not None else 0
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, 1024)
+        count = self._meta["count"]
+        old = dict(self._arrays)
+        for kind, shape, dtype in (("vectors", (capacity, self.embedder.dimension), np.float32),
+                                   ("alive", (capacity,), np.bool_),
+                                   ("lists", (capacity,), np.int32)):
+            array = self._new_file(kind, shape, dtype)
+            if kind in old:
+                array[:count] = old[kind][:count]
+
+    def _train(self):
+        import numpy as np
+
+        live_rows = np.flatnonzero(self._arrays["alive"][:self._meta["count"]])
+        num_lists = min(IVF_MAX_LISTS, max(1, int(math.sqrt(len(live_rows)))))
+        with metrics.span("ivf_train"):
+            centroids = train_centroids(self._arrays["vectors"][live_rows], num_lists)
+            self._new_file("centroids", centroids.shape, np.float32)[:] = centroids
+            lists = self._new_file("lists", (len(self._arrays["vectors"]),), np.int32)
+            lists[:] = -1
+            lists[:self._meta["count"]] = _nearest(
+                self._arrays["vectors"][:self._meta["count"]], centroids)
+        self._meta["trained_rows"] = len(live_rows)
+
+    def _compact(self):
+        """
+        Rewrites the row files without deleted rows.
+        """
+        import numpy as np
+
+        live_rows = np.flatnonzero(self._arrays["alive"][:self._meta["count"]])
+        old = dict(self._arrays)
+        capacity = max(len(live_rows), 1024)
+        for kind, shape, dtype in (("vectors", (capacity, self.embedder.dimension), np.float32),
+                                   ("alive", (capacity,), np.bool_),
+                                   ("lists", (capacity,), np.int32)):
+            self._new_file(kind, shape, dtype)[:len(live_rows)] = old[kind][live_rows]
+        keys = [self._meta["keys"][row] for row in live_rows]
+        self._meta.update(keys=keys, count=len(keys), deleted=0)
+        self._row_of = {key: row for row, key in enumerate(keys)}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the process-wide embedding index, creating it on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = EmbeddingIndex()
+    return _index
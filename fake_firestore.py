@@ -0,0 +1,206 @@
+"""
+In-memory stand-in for the subset of the Firestore client used by TalentIQ.
+
+It supports collections, documents, set/update (with merge and Increment transforms), write
+batches and simple queries (where/order_by/limit/start_after/stream), and counts document reads
+so benchmarks can compare access patterns without the Firestore emulator.
+"""
+import copy
+import threading
+import uuid
+
+
+class Increment:
+    """
+    Numeric increment transform, equivalent to `firestore.Increment`.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _is_increment(value):
+    # Accept both this class and google.cloud.firestore's Increment transform
+    return type(value).__name__ == "Increment" and hasattr(value, "value")
+
+
+def _apply(existing, data):
+    for key, value in data.items():
+        if _is_increment(value):
+            existing[key] = existing.get(key, 0) + value.value
+        elif isinstance(value, dict) and isinstance(existing.get(key), dict):
+            _apply(existing[key], value)
+        else:
+            existing[key] = copy.deepcopy(value)
+    return existing
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class DocumentReference:
+    def __init__(self, client, collection, document_id):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+
+    def get(self):
+        with self._client.lock:
+            self._client.reads += 1
+            data = self._client.collections.get(self._collection, {}).get(self.id)
+            return DocumentSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False):
+        with self._client.lock:
+            documents = self._client.collections.setdefault(self._collection, {})
+            existing = documents.get(self.id, {}) if merge else {}
+            documents[self.id] = _apply(dict(existing), data)
+            self._client.writes += 1
+
+    def update(self, data):
+        with self._client.lock:
+            documents = self._client.collections.setdefault(self._collection, {})
+            if self.id not in documents:
+                raise KeyError(f"No document to update: {self._collection}/{self.id}")
+            _apply(documents[self.id], data)
+            self._client.writes += 1
+
+    def delete(self):
+        with self._client.lock:
+            self._client.collections.get(self._collection, {}).pop(self.id, None)
+            self._client.writes += 1
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class Query:
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, client, collection, filters=(), orders=(), limit_count=None, cursor=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        values = {"filters": self._filters, "orders": self._orders,
+                  "limit_count": self._limit, "cursor": self._cursor}
+        values.update(changes)
+        return Query(self._client, self._collection, **values)
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, cursor):
+        """
+        Continues after a document snapshot or a dict of values for the order_by fields.
+        """
+        return self._copy(cursor=cursor)
+
+    def stream(self):
+        with self._client.lock:
+            documents = list(self._client.collections.get(self._collection, {}).items())
+        matches = [
+            (document_id, data) for document_id, data in documents
+            if all(_OPERATORS[op](data.get(field), value) for field, op, value in self._filters)
+        ]
+        for field, direction in reversed(self._orders):
+            matches.sort(key=lambda item: (item[1].get(field) is None, item[1].get(field)),
+                         reverse=direction == Query.DESCENDING)
+        if isinstance(self._cursor, dict):
+            # Field-value cursor on the first order_by field
+            field, direction = self._orders[0]
+            value = self._cursor[field]
+            if direction == Query.DESCENDING:
+                matches = [item for item in matches if _OPERATORS["<"](item[1].get(field), value)]
+            else:
+                matches = [item for item in matches if _OPERATORS[">"](item[1].get(field), value)]
+        elif self._cursor is not None:
+            ids = [document_id for document_id, _ in matches]
+            cursor_id = getattr(self._cursor, "id", None)
+            if cursor_id in ids:
+                matches = matches[ids.index(cursor_id) + 1:]
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        for document_id, data in matches:
+            with self._client.lock:
+                self._client.reads += 1
+            reference = DocumentReference(self._client, self._collection, document_id)
+            yield DocumentSnapshot(reference, copy.deepcopy(data))
+
+    def get(self):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex)
+
+
+class WriteBatch:
+    def __init__(self):
+        self._operations = []
+
+    def set(self, reference, data, merge=False):
+        self._operations.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._operations.append(lambda: reference.update(data))
+
+    def delete(self, reference):
+        self._operations.append(reference.delete)
+
+    def commit(self):
+        for operation in self._operations:
+            operation()
+        self._operations = []
+
+
+class FakeFirestore:
+    """
+    In-memory Firestore client with read/write counters.
+    """
+
+    def __init__(self):
+        self.collections = {}
+        self.lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def batch(self):
+        return WriteBatch()
@@ -0,0 +1,595 @@
+"""
+SQLite-backed job queue for screening batches.
+
+The dashboard stores a batch (job description, options and every uploaded file) as a job with
+one task per file, and worker processes extract and score the pending tasks outside the
+Streamlit script. Results are written per task as they complete, so a browser refresh or a
+worker crash loses no finished work: a job whose worker stops sending heartbeats is claimed
+again and only its unfinished tasks are processed.
+
+Usage:
+    python jobs.py worker
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs.db")
+# Number of worker processes the dashboard keeps running while jobs are queued
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+# Seconds between worker heartbeats, and after which a silent worker is considered dead
+WORKER_HEARTBEAT_INTERVAL = float(os.environ.get("WORKER_HEARTBEAT_INTERVAL", "2"))
+WORKER_STALE_AFTER = float(os.environ.get("WORKER_STALE_AFTER", "30"))
+# Workers started by the dashboard exit after this many idle seconds
+WORKER_IDLE_EXIT = float(os.environ.get("WORKER_IDLE_EXIT", "120"))
+WORKER_POLL_INTERVAL = 1.0
+
+JOB_ACTIVE_STATUSES = ("queued", "running")
+
+
+def _dump(value):
+    return json.dumps(value) if value is not None else None
+
+
+def _load(value):
+    return json.loads(value) if value is not None else None
+
+
+class JobStore:
+    """
+    Persistent store of screening jobs, their per-file tasks and results.
+
+    Each process opens its own store; SQLite in WAL mode lets the dashboard read while a worker
+    writes.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user_email TEXT,
+                job_description TEXT NOT NULL,
+                options TEXT,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                finished_at REAL,
+                worker_id TEXT,
+                heartbeat_at REAL,
+                error TEXT,
+                stats TEXT,
+                usage_logged INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_email, created_at);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS tasks (
+                job_id TEXT NOT NULL,
+                file_index INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                file_type TEXT,
+                data BLOB,
+                status TEXT NOT NULL DEFAULT 'pending',
+                result TEXT,
+                resume_text TEXT,
+                fit_score INTEGER,
+                error TEXT,
+                updated_at REAL,
+                preview TEXT,
+                seq INTEGER,
+                PRIMARY KEY (job_id, file_index)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (job_id, status);
+            CREATE INDEX IF NOT EXISTS tasks_rank ON tasks (job_id, fit_score DESC);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat_at REAL NOT NULL
+            );
+            """
+        )
+        # Stores created before streamed previews and incremental results lack these columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        for column in ("preview TEXT", "seq INTEGER"):
+            if column.split()[0] not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    # Added by another process in the meantime
+                    pass
+        if "seq" not in columns:
+            # Tasks finished before `seq` existed are numbered in insertion order
+            self._conn.execute(
+                "UPDATE tasks SET seq = rowid WHERE seq IS NULL AND status != 'pending'")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_seq ON tasks (job_id, seq)")
+        self._conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # -- Dashboard side --
+    def create_job(self, user_email, job_description, files, options=None):
+        """
+        Stores a new queued job with one pending task per file.
+
+        Args:
+            files (list): File-like objects with `name`, `type` and `getvalue()`/`read()`.
+            options (dict): Scoring options passed to `score_resumes` (e.g. top_k, min_score).
+
+        Returns:
+            str: The job ID.
+        """
+        from utils import _read_bytes
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, user_email, job_description, options, status, total, "
+                    "created_at, updated_at) VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, user_email, job_description, _dump(options or {}), len(files),
+                     now, now))
+                self._conn.executemany(
+                    "INSERT INTO tasks (job_id, file_index, file_name, file_type, data, "
+                    "updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(job_id, index, file.name, file.type, _read_bytes(file), now)
+                     for index, file in enumerate(files)])
+        return job_id
+
+    def get_job(self, job_id):
+        """
+        Returns the job with per-status task counts, or None if it does not exist.
+        """
+        rows = self._query(
+            "SELECT id, user_email, job_description, options, status, total, created_at, "
+            "updated_at, finished_at, error, stats, usage_logged FROM jobs WHERE id = ?",
+            (job_id,))
+        if not rows:
+            return None
+        job = rows[0]
+        job["options"] = _load(job["options"]) or {}
+        job["stats"] = _load(job["stats"]) or {}
+        counts = self._query(
+            "SELECT status, COUNT(*) AS count FROM tasks WHERE job_id = ? GROUP BY status",
+            (job_id,))
+        job["counts"] = {row["status"]: row["count"] for row in counts}
+        job["completed"] = job["total"] - job["counts"].get("pending", 0)
+        return job
+
+    def list_jobs(self, user_email=None, limit=20):
+        """
+        Returns the most recent jobs (without task counts), newest first.
+        """
+        if user_email is None:
+            return self._query(
+                "SELECT id, user_email, status, total, created_at FROM jobs "
+                "ORDER BY created_at DESC LIMIT ?", (limit,))
+        return self._query(
+            "SELECT id, user_email, status, total, created_at FROM jobs WHERE user_email = ? "
+            "ORDER BY created_at DESC LIMIT ?", (user_email, limit))
+
+    def get_results(self, job_id, include_text=False, after=0):
+        """
+        Returns the finished tasks of a job ranked by descending fit score.
+
+        Args:
+            after (int): Only return the tasks finished after the one with this `seq`, so a
+                caller polling a running job fetches each result once.
+
+        Returns:
+            list: Dicts with file_index, file_name, status, result (the ranked-table row or
+            None), error and seq (increasing in completion order), plus resume_text with
+            `include_text`.
+        """
+        text_column = "resume_text" if include_text else "NULL AS resume_text"
+        rows = self._query(
+            f"SELECT file_index, file_name, status, result, {text_column}, error, seq "
+            "FROM tasks WHERE job_id = ? AND status != 'pending' AND seq > ? "
+            "ORDER BY fit_score IS NULL, fit_score DESC, file_index", (job_id, after))
+        for row in rows:
+            row["result"] = _load(row["result"])
+        if not include_text:
+            for row in rows:
+                del row["resume_text"]
+        return rows
+
+    def iter_results(self, job_id, batch_size=500):
+        """
+        Yields a job's ranked-table rows in rank order, `batch_size` at a time, without holding
+        the whole job in memory.
+        """
+        offset = 0
+        while True:
+            rows = self._query(
+                "SELECT result FROM tasks WHERE job_id = ? AND status != 'pending' "
+                "AND result IS NOT NULL "
+                "ORDER BY fit_score IS NULL, fit_score DESC, file_index LIMIT ? OFFSET ?",
+                (job_id, batch_size, offset))
+            if not rows:
+                return
+            yield [_load(row["result"]) for row in rows]
+            offset += len(rows)
+
+    def get_task(self, job_id, file_index):
+        """
+        Returns one finished task's result and resume text, or None.
+        """
+        rows = self._query(
+            "SELECT file_name, result, resume_text FROM tasks WHERE job_id = ? "
+            "AND file_index = ?", (job_id, file_index))
+        if not rows:
+            return None
+        rows[0]["result"] = _load(rows[0]["result"])
+        return rows[0]
+
+    def file_statuses(self, job_id):
+        """
+        Returns (file_name, status, error) for every task of a job, in upload order.
+        """
+        rows = self._query(
+            "SELECT file_name, status, result, error FROM tasks WHERE job_id = ? "
+            "ORDER BY file_index", (job_id,))
+        statuses = []
+        for row in rows:
+            status = {"pending": "Queued", "failed": "Error"}.get(row["status"])
+            if status is None:
+                status = (_load(row["result"]) or {}).get("Status", "Scored")
+            statuses.append((row["file_name"], status, row["error"]))
+        return statuses
+
+    def previews(self, job_id):
+        """
+        Returns (file_name, candidate name, fit score) for the unfinished tasks whose name and
+        score have already streamed in, best score first.
+        """
+        rows = self._query(
+            "SELECT file_name, preview FROM tasks WHERE job_id = ? AND status = 'pending' "
+            "AND preview IS NOT NULL ORDER BY file_index", (job_id,))
+        previews = [(row["file_name"], preview.get("Candidate Name"), preview.get("Fit Score"))
+                    for row in rows for preview in [_load(row["preview"])]]
+        return sorted(previews, key=lambda preview: -(preview[2] or 0))
+
+    def cancel_job(self, job_id):
+        """
+        Marks a queued or running job as cancelled; its worker stops at the next task.
+        """
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = 'cancelled', updated_at = ?, finished_at = ? "
+            "WHERE id = ? AND status IN ('queued', 'running')", (now, now, job_id))
+
+    def resume_job(self, job_id):
+        """
+        Queues a cancelled or failed job again; only its pending tasks are processed.
+        """
+        self._execute(
+            "UPDATE jobs SET status = 'queued', error = NULL, finished_at = NULL, "
+            "updated_at = ? WHERE id = ? AND status IN ('cancelled', 'failed')",
+            (time.time(), job_id))
+
+    def live_workers(self):
+        """
+        Returns the number of workers that sent a heartbeat recently.
+        """
+        self._execute("DELETE FROM workers WHERE heartbeat_at < ?",
+                      (time.time() - WORKER_STALE_AFTER,))
+        rows = self._query("SELECT COUNT(*) AS count FROM workers")
+        return rows[0]["count"]
+
+    # -- Worker side --
+    def heartbeat(self, worker_id, job_id=None, pid=None):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                    (worker_id, pid or os.getpid(), now))
+                if job_id is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker_id = ?",
+                        (now, job_id, worker_id))
+
+    def remove_worker(self, worker_id):
+        self._execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def claim_job(self, worker_id):
+        """
+        Atomically claims the oldest queued job, or a running job whose worker has died.
+
+        Returns:
+            str: The claimed job ID, or None if there is nothing to do.
+        """
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', worker_id = ?, heartbeat_at = ?,
+                        updated_at = ?
+                    WHERE id = (
+                        SELECT id FROM jobs
+                        WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?)
+                        ORDER BY created_at LIMIT 1
+                    )
+                    """, (worker_id, now, now, now - WORKER_STALE_AFTER))
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE worker_id = ? AND status = 'running' "
+                    "AND heartbeat_at = ?", (worker_id, now)).fetchone()
+        return row[0] if row else None
+
+    def pending_tasks(self, job_id):
+        """
+        Returns (file_index, file_name, file_type) for the tasks not finished yet. The uploads
+        themselves are read one at a time with `task_data`.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT file_index, file_name, file_type FROM tasks "
+                "WHERE job_id = ? AND status = 'pending' ORDER BY file_index",
+                (job_id,)).fetchall()
+
+    def task_data(self, job_id, file_index):
+        """
+        Returns the uploaded bytes of one task (None once it is finished).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM tasks WHERE job_id = ? AND file_index = ?",
+                (job_id, file_index)).fetchone()
+        return row[0] if row else None
+
+    def preview_task(self, job_id, file_index, preview):
+        """
+        Records the name and score of a task whose analysis is still streaming in.
+        """
+        self._execute(
+            "UPDATE tasks SET preview = ?, updated_at = ? WHERE job_id = ? AND file_index = ? "
+            "AND status = 'pending'", (_dump(preview), time.time(), job_id, file_index))
+
+    def complete_task(self, job_id, file_index, status, result=None, resume_text=None,
+                      error=None):
+        """
+        Records the outcome of one file. Its uploaded bytes are dropped once it is finished.
+        """
+        fit_score = result.get("Fit Score") if result else None
+        # The job's next completion number; the statement runs under SQLite's write lock
+        self._execute(
+            "UPDATE tasks SET status = ?, result = ?, resume_text = ?, fit_score = ?, "
+            "error = ?, data = NULL, preview = NULL, updated_at = ?, "
+            "seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks WHERE job_id = ?) "
+            "WHERE job_id = ? AND file_index = ?",
+            (status, _dump(result), resume_text, fit_score, error, time.time(), job_id, job_id,
+             file_index))
+
+    def job_status(self, job_id):
+        rows = self._query("SELECT status FROM jobs WHERE id = ?", (job_id,))
+        return rows[0]["status"] if rows else None
+
+    def finish_job(self, job_id, worker_id, status, error=None, stats=None):
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, error = ?, stats = COALESCE(?, stats), "
+            "updated_at = ?, finished_at = ? WHERE id = ? AND worker_id = ? "
+            "AND status = 'running'",
+            (status, error, _dump(stats), now, now, job_id, worker_id))
+
+    def mark_usage_logged(self, job_id):
+        """
+        Flags the job's usage as logged. Returns False if it was already flagged.
+        """
+        cursor = self._execute(
+            "UPDATE jobs SET usage_logged = 1 WHERE id = ? AND usage_logged = 0", (job_id,))
+        return cursor.rowcount == 1
+
+
+class StoredFile:
+    """
+    File-like wrapper around a task's stored upload, as expected by `extract_texts`.
+
+    With `loader`, the bytes are read from the store each time they are needed instead of being
+    held for the whole job.
+    """
+
+    def __init__(self, name, type, data=None, loader=None):
+        self.name = name
+        self.type = type
+        self._data = data
+        self._loader = loader
+
+    def getvalue(self):
+        return self._data if self._loader is None else self._loader()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """
+    Returns the process-wide job store, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
+
+
+def ensure_workers(store=None, workers=JOB_WORKERS):
+    """
+    Starts detached worker processes until `workers` of them are alive.
+    """
+    store = store or get_job_store()
+    missing = workers - store.live_workers()
+    for _ in range(max(0, missing)):
+        worker_id = uuid.uuid4().hex
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "worker",
+             "--idle-exit", str(WORKER_IDLE_EXIT), "--worker-id", worker_id],
+            env={**os.environ, "JOBS_DB_PATH": os.path.abspath(store.path)},
+            stdin=subprocess.DEVNULL,
+            start_new_session=True)
+        # Registered under the worker's own ID, so it is counted before its first heartbeat and
+        # its row is removed when it exits (or goes stale if it never starts)
+        store.heartbeat(worker_id, pid=process.pid)
+
+
+# -- Worker --
+def run_job(store, job_id, worker_id):
+    """
+    Extracts and scores the pending tasks of a claimed job, recording each result as it lands.
+    """
+    # Imported here so the dashboard can use the store without loading the scoring stack
+    from cache import get_cache
+    from compaction import compaction_stats
+    from corpus import content_hash, get_corpus
+    from embeddings import get_index
+    from scoring import build_result_row, score_resumes
+    from skills import get_skill_matcher
+    from usage_logger import log_usage
+
+    job = store.get_job(job_id)
+    options = job["options"]
+    tasks = store.pending_tasks(job_id)
+    # Local skill matches are added to every row, including the pre-filtered ones
+    matcher = get_skill_matcher()
+    jd_skills = matcher.extract(job["job_description"])
+    files = [StoredFile(name, file_type,
+                        loader=lambda file_index=file_index: store.task_data(job_id, file_index))
+             for file_index, name, file_type in tasks]
+    indexes = {id(file): file_index for file, (file_index, *_) in zip(files, tasks)}
+    cache_before = get_cache().stats()
+    tokens_before = compaction_stats.snapshot()
+    for uploaded_file, resume_text, analysis, error, local_score in score_resumes(
+            job["job_description"], files,
+            top_k=options.get("top_k", 0),
+            min_score=options.get("min_score", 0),
+            on_partial=lambda uploaded_file, preview: store.preview_task(
+                job_id, indexes[id(uploaded_file)], preview)):
+        file_index = indexes[id(uploaded_file)]
+        if error is not None:
+            store.complete_task(job_id, file_index, "failed", error=str(error))
+        else:
+            resume_id = content_hash(resume_text)
+            original = get_corpus().duplicate_of(resume_id)
+            result = build_result_row(
+                uploaded_file.name, analysis, local_score, resume_id,
+                get_corpus().file_name(original) if original else None,
+                jd_skills, matcher.extract(resume_text))
+            store.complete_task(job_id, file_index, "done", result, resume_text,
+                                error=(analysis or {}).get("error"))
+        if store.job_status(job_id) != "running":
+            # Cancelled (or re-claimed after a missed heartbeat): leave the rest pending
+            return
+    cache_after = get_cache().stats()
+    tokens_after = compaction_stats.snapshot()
+    stats = dict(job["stats"])
+    for key, after, before in (("cache_hits", cache_after["hits"], cache_before["hits"]),
+                               ("cache_misses", cache_after["misses"], cache_before["misses"]),
+                               ("tokens_before", tokens_after["tokens_before"],
+                                tokens_before["tokens_before"]),
+                               ("tokens_after", tokens_after["tokens_after"],
+                                tokens_before["tokens_after"])):
+        stats[key] = stats.get(key, 0) + after - before
+    job = store.get_job(job_id)
+    if job["counts"].get("done") and job["user_email"] and store.mark_usage_logged(job_id):
+        try:
+            log_usage(job["user_email"], job["total"])
+        except Exception as e:
+            # Usage logging must not fail a job whose results are already stored
+            print(f"Error logging usage for job {job_id}: {e}")
+    try:
+        # New resumes become searchable from the dashboard's semantic search
+        get_index().sync(get_corpus())
+    except Exception as e:
+        print(f"Error updating the embedding index for job {job_id}: {e}")
+    store.finish_job(job_id, worker_id, "completed", stats=stats)
+
+
+def run_worker(store=None, idle_exit=None, worker_id=None):
+    """
+    Processes jobs until interrupted, or until idle for `idle_exit` seconds.
+
+    Args:
+        worker_id (str): The ID registered by `ensure_workers`, or None for a new one.
+    """
+    import metrics
+
+    store = store or get_job_store()
+    worker_id = worker_id or uuid.uuid4().hex
+    # Starts the /metrics endpoint when METRICS_PORT is set
+    metrics.get_metrics()
+    current = {"job_id": None}
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(WORKER_HEARTBEAT_INTERVAL):
+            try:
+                store.heartbeat(worker_id, current["job_id"])
+            except sqlite3.Error as e:
+                print(f"Error sending worker heartbeat: {e}")
+
+    store.heartbeat(worker_id)
+    threading.Thread(target=beat, name="job-worker-heartbeat", daemon=True).start()
+    idle_since = time.monotonic()
+    try:
+        while True:
+            job_id = store.claim_job(worker_id)
+            if job_id is None:
+                if idle_exit and time.monotonic() - idle_since > idle_exit:
+                    return
+                time.sleep(WORKER_POLL_INTERVAL)
+                continue
+            current["job_id"] = job_id
+            try:
+                run_job(store, job_id, worker_id)
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+                store.finish_job(job_id, worker_id, "failed", error=str(e))
+            current["job_id"] = None
+            idle_since = time.monotonic()
+    finally:
+        stop.set()
+        store.remove_worker(worker_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the TalentIQ screening job worker.")
+    parser.add_argument("command", choices=["worker"])
+    parser.add_argument("--idle-exit", type=float, default=0,
+                        help="Exit after this many idle seconds (0 = run until interrupted).")
+    parser.add_argument("--worker-id", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    try:
+        run_worker(idle_exit=args.idle_exit, worker_id=args.worker_id)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import os
+import random
+import threading
+import time
+
+import metrics
+from compaction import count_tokens
+
+# Endpoint and HTTP connection pool
+LLM_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+# Retries with exponential backoff and full jitter on 429, 5xx, timeouts and connection errors
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "30"))
+# Client-side rate limits (requests and tokens per minute; 0 disables a limit)
+LLM_RPM = float(os.environ.get("LLM_RPM", "500"))
+LLM_TPM = float(os.environ.get("LLM_TPM", "200000"))
+# Circuit breaker: open after this many consecutive failed calls, probe again after the cooldown
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is rejected because the circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    `acquire` blocks until the requested amount is available. `consume` charges the bucket
+    without waiting (it may go negative), e.g. to account for actual usage after a call.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        if self.rate <= 0:
+            return
+        # Requests larger than the bucket would never fit; cap them at its capacity
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def consume(self, amount):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls until `cooldown` has passed,
+    then lets a single probe call through (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.probing:
+                raise CircuitOpenError(
+                    "LLM circuit breaker is open after repeated failures; try again shortly.")
+            self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release(self):
+        """
+        Ends a call that says nothing about the service's health (e.g. a rejected request):
+        the failure count is unchanged, and a half-open breaker lets its next call probe.
+        """
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.threshold and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class LLMStats:
+    """
+    Thread-safe per-call latency and token accounting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.latency_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+
+    def record_call(self, latency, usage=None):
+        with self._lock:
+            self.calls += 1
+            self.latency_seconds += latency
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+                self.cached_tokens += cached_tokens(usage)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "avg_latency_seconds": self.latency_seconds / self.calls if self.calls else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cached_tokens": self.cached_tokens,
+            }
+
+
+def _is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error):
+    """
+    Returns the server-requested delay in seconds from a Retry-After header, if any.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def cached_tokens(usage):
+    """
+    Returns the prompt tokens of a response's `usage` served from the provider's prompt cache.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def record_usage(usage, model):
+    """
+    Records the token counts from a response's `usage` field.
+    """
+    metrics.increment("llm_tokens", usage.prompt_tokens or 0, model=model, kind="prompt")
+    metrics.increment("llm_tokens", usage.completion_tokens or 0, model=model, kind="completion")
+    metrics.increment("llm_tokens", cached_tokens(usage), model=model, kind="cached")
+
+
+class LLMClient:
+    """
+    Shared OpenAI client with connection pooling, retries, rate limiting and a circuit breaker.
+
+    Args:
+        api_key (str): The OpenAI API key (defaults to the API_KEY environment variable).
+        base_url (str): An OpenAI-compatible endpoint, e.g. a local mock server.
+    """
+
+    def __init__(self,
+                 api_key=None,
+                 base_url=LLM_BASE_URL,
+                 max_retries=LLM_MAX_RETRIES,
+                 requests_per_minute=LLM_RPM,
+                 tokens_per_minute=LLM_TPM,
+                 max_connections=LLM_MAX_CONNECTIONS):
+        # The SDK is imported here so importing this module does not load openai/httpx
+        import httpx
+        from openai import OpenAI
+
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections))
+        # Retries are handled here, so the SDK's own retry loop is disabled
+        self.client = OpenAI(api_key=api_key or os.environ.get("API_KEY"),
+                             base_url=base_url,
+                             max_retries=0,
+                             http_client=self.http_client)
+        self.max_retries = max_retries
+        self.request_limiter = TokenBucket(requests_per_minute)
+        self.token_limiter = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker()
+        self.stats = LLMStats()
+
+    def chat_completion(self, messages, model, **kwargs):
+        """
+        Creates a chat completion, retrying transient failures with exponential backoff.
+
+        Args:
+            messages (list): Chat messages.
+            model (str): The model name.
+            **kwargs: Passed through to `chat.completions.create` (e.g. `response_format`, `timeout`).
+
+        Returns:
+            The chat completion response.
+        """
+        response, start, estimated_tokens = self._create(messages, model, **kwargs)
+        self._record_success(model, time.perf_counter() - start, response.usage, estimated_tokens)
+        return response
+
+    def chat_completion_stream(self, messages, model, **kwargs):
+        """
+        Streams a chat completion, yielding the content as it arrives.
+
+        Failures before the response starts are retried like `chat_completion`; a failure
+        mid-stream is raised to the caller, which has already consumed part of the content, and
+        counts towards opening the circuit.
+
+        Yields:
+            str: Content deltas.
+        """
+        stream, start, estimated_tokens = self._create(
+            messages, model, stream=True, stream_options={"include_usage": True}, **kwargs)
+        usage = None
+        first_token = True
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    if first_token:
+                        first_token = False
+                        metrics.observe("llm_first_token", time.perf_counter() - start,
+                                        model=model)
+                    yield content
+        except Exception:
+            self.stats.record_failure()
+            self.breaker.record_failure()
+            metrics.observe("llm", time.perf_counter() - start, model=model, outcome="error")
+            metrics.increment("llm_calls", model=model, outcome="failure")
+            raise
+        finally:
+            stream.close()
+        self._record_success(model, time.perf_counter() - start, usage, estimated_tokens)
+
+    def _create(self, messages, model, **kwargs):
+        """
+        Sends the request through the circuit breaker, rate limits and retry loop.
+
+        Returns:
+            tuple: (response or stream, start time of the successful attempt, estimated prompt
+            tokens).
+        """
+        estimated_tokens = sum(count_tokens(message["content"]) for message in messages)
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            self.request_limiter.acquire()
+            self.token_limiter.acquire(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model, messages=messages, **kwargs)
+            except Exception as e:
+                retryable = _is_retryable(e)
+                metrics.observe("llm", time.perf_counter() - start, model=model, outcome="error")
+                if not retryable or attempt >= self.max_retries:
+                    self.stats.record_failure()
+                    metrics.increment("llm_calls", model=model, outcome="failure")
+                    # Only service-side failures count towards opening the circuit; a rejected
+                    # request (e.g. 400 or 401) neither opens nor closes it
+                    if retryable:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.release()
+                    raise
+                attempt += 1
+                self.stats.record_retry()
+                metrics.increment("llm_calls", model=model, outcome="retry")
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+                # Retry-After is honored up to LLM_BACKOFF_MAX, so a huge value cannot stall
+                # the calling thread
+                time.sleep(min(LLM_BACKOFF_MAX, max(backoff, _retry_after(e) or 0)))
+                continue
+            self.breaker.record_success()
+            return response, start, estimated_tokens
+
+    def _record_success(self, model, latency, usage, estimated_tokens):
+        self.stats.record_call(latency, usage)
+        metrics.observe("llm", latency, model=model, outcome="success")
+        metrics.increment("llm_calls", model=model, outcome="success")
+        if usage is not None:
+            record_usage(usage, model)
+            # Charge the token bucket for usage beyond the prompt estimate
+            self.token_limiter.consume(max(0, usage.total_tokens - estimated_tokens))
+
+    def close(self):
+        self.http_client.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide LLM client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
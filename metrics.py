@@ -0,0 +1,390 @@
+"""
+Per-stage latency, token and counter metrics for the screening pipeline.
+
+Instrumented code records stage timings with `span`/`observe` and counts events with
+`increment`. Every event is appended to a JSONL file shared by the Streamlit app and the job
+workers (read by the admin "Pipeline Metrics" panel), and each process can also serve its own
+totals on a Prometheus-style /metrics endpoint. Events are buffered in memory and written in
+batches by a background thread, so recording one never waits on the file.
+
+Labels never carry resume file names or other candidate data: the JSONL log is plain text.
+
+Stages: upload_read, extract (per backend), normalize, compaction, llm (per attempt),
+llm_first_token (streamed responses), parse, score (per LLM request, single or batched),
+log_usage, embed (resume or query), semantic_search and ivf_train.
+Counters: cache (hit/miss), extraction_backend (backend/outcome), extraction_fallbacks,
+llm_calls (outcome), llm_tokens (kind: prompt/completion/cached), prompt_tokens (after
+compaction), analysis_reasks (fields asked for again after failing validation),
+session_cache (result frames: hit/miss/evicted), interview_prefetch
+(submitted/cancelled/failed) and skill_check (LLM matched skills dropped as not in the resume).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# JSONL event log; it is rotated to "<path>.1" once it grows past METRICS_JSONL_MAX_BYTES
+METRICS_JSONL_PATH = os.environ.get("METRICS_JSONL_PATH", "metrics.jsonl")
+METRICS_JSONL_MAX_BYTES = int(os.environ.get("METRICS_JSONL_MAX_BYTES", str(20 * 1024 * 1024)))
+# Buffered events are written once this many are queued or this many seconds have passed
+METRICS_FLUSH_SIZE = int(os.environ.get("METRICS_FLUSH_SIZE", "500"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1"))
+# Port of the Prometheus-style endpoint (0 disables it)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Recent durations kept per stage for in-process quantiles
+METRICS_WINDOW = 2048
+QUANTILES = (0.5, 0.95)
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe recorder of stage durations and counters.
+
+    The lock only guards the in-memory totals and the event buffer; events are serialized and
+    written to the JSONL file by `flush`, from a background thread started on the first event.
+
+    Args:
+        jsonl_path (str): File every event is appended to ("" keeps metrics in memory only).
+        max_bytes (int): Size after which the JSONL file is rotated.
+        window (int): Number of recent durations kept per stage for quantiles.
+        flush_size (int): Wake the writer as soon as this many events are buffered.
+        flush_interval (float): Write buffered events at least this often, in seconds.
+    """
+
+    def __init__(self, jsonl_path=METRICS_JSONL_PATH, max_bytes=METRICS_JSONL_MAX_BYTES,
+                 window=METRICS_WINDOW, enabled=METRICS_ENABLED, flush_size=METRICS_FLUSH_SIZE,
+                 flush_interval=METRICS_FLUSH_INTERVAL):
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.window = window
+        self.enabled = enabled
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._durations = {}  # stage -> deque of recent seconds
+        self._totals = {}  # stage -> [count, sum]
+        self._counters = {}  # (name, sorted label items) -> value
+        self._events = []
+        self._wakeup = threading.Event()
+        self._writer = None
+        # Serializes file access between the writer thread and explicit flushes
+        self._flush_lock = threading.Lock()
+        self._handle = None
+        self._checked_at = 0.0
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """
+        Times the enclosed block as one observation of `stage`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def observe(self, stage, seconds, **labels):
+        """
+        Records one duration for a stage.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._durations.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+            totals = self._totals.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            self._emit({"ts": time.time(), "type": "span", "stage": stage,
+                        "seconds": round(seconds, 6), "labels": labels, "pid": os.getpid()})
+
+    def increment(self, name, value=1, **labels):
+        """
+        Adds `value` to a counter.
+        """
+        if not self.enabled or not value:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._emit({"ts": time.time(), "type": "counter", "name": name, "value": value,
+                        "labels": labels, "pid": os.getpid()})
+
+    def _emit(self, event):
+        # Called with the lock held: only queues the event
+        if not self.jsonl_path:
+            return
+        self._events.append(event)
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+        if len(self._events) >= self.flush_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered events to the JSONL file.
+        """
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events or not self.jsonl_path:
+                return
+            lines = "".join(json.dumps(event, default=str) + "\n" for event in events)
+            try:
+                handle = self._jsonl_handle()
+                handle.write(lines)
+                handle.flush()
+            except OSError as e:
+                print(f"Error writing metrics to {self.jsonl_path}: {e}")
+                self.jsonl_path = ""
+
+    def _jsonl_handle(self):
+        # Called with the flush lock held
+        now = time.monotonic()
+        if self._handle is not None and now - self._checked_at >= 1:
+            self._checked_at = now
+            # Another process may have rotated the file: reopen if the path changed identity
+            try:
+                current = os.stat(self.jsonl_path)
+            except FileNotFoundError:
+                current = None
+            if current is None or current.st_ino != os.fstat(self._handle.fileno()).st_ino:
+                self._handle.close()
+                self._handle = None
+            elif current.st_size > self.max_bytes:
+                self._handle.close()
+                self._handle = None
+                try:
+                    os.replace(self.jsonl_path, self.jsonl_path + ".1")
+                except FileNotFoundError:
+                    # Rotated by another process at the same time
+                    pass
+        if self._handle is None:
+            self._handle = open(self.jsonl_path, "a")
+        return self._handle
+
+    def summary(self):
+        """
+        Returns {stage: {"count", "sum", "p50", "p95"}} for this process.
+        """
+        with self._lock:
+            stages = {stage: (list(values), list(self._totals[stage]))
+                      for stage, values in self._durations.items()}
+        summary = {}
+        for stage, (values, (count, total)) in stages.items():
+            values.sort()
+            summary[stage] = {"count": count, "sum": total,
+                              **{f"p{int(q * 100)}": _quantile(values, q) for q in QUANTILES}}
+        return summary
+
+    def render_prometheus(self):
+        """
+        Renders this process's metrics in the Prometheus text exposition format.
+        """
+        lines = ["# TYPE talentiq_stage_seconds summary"]
+        for stage, values in sorted(self.summary().items()):
+            for q in QUANTILES:
+                lines.append(f"talentiq_stage_seconds{_label_text({'stage': stage, 'quantile': q})} "
+                             f"{values[f'p{int(q * 100)}']:.6f}")
+            lines.append(f"talentiq_stage_seconds_sum{_label_text({'stage': stage})} "
+                         f"{values['sum']:.6f}")
+            lines.append(f"talentiq_stage_seconds_count{_label_text({'stage': stage})} "
+                         f"{values['count']}")
+        with self._lock:
+            counters = sorted(self._counters.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE talentiq_{name}_total counter")
+            lines.append(f"talentiq_{name}_total{_label_text(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(metrics, port=METRICS_PORT):
+    """
+    Serves `metrics` on http://127.0.0.1:<port>/metrics from a background thread.
+
+    Returns:
+        The server, or None if the port is already in use (e.g. by another worker).
+    """
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Returns the process-wide recorder, starting the /metrics endpoint if METRICS_PORT is set.
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                metrics = Metrics()
+                if METRICS_PORT and metrics.enabled:
+                    start_metrics_server(metrics)
+                _metrics = metrics
+    return _metrics
+
+
+def span(stage, **labels):
+    return get_metrics().span(stage, **labels)
+
+
+def observe(stage, seconds, **labels):
+    get_metrics().observe(stage, seconds, **labels)
+
+
+def increment(name, value=1, **labels):
+    get_metrics().increment(name, value, **labels)
+
+
+# -- Reading the event log --
+def load_events(path=METRICS_JSONL_PATH, since=None, max_bytes=8 * 1024 * 1024):
+    """
+    Reads the most recent events from the JSONL log.
+
+    Args:
+        since (float): Only return events with a timestamp at or after this Unix time.
+        max_bytes (int): Read at most this many bytes from the end of the file.
+
+    Returns:
+        list: Event dictionaries, oldest first.
+    """
+    try:
+        with open(path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(max(0, size - max_bytes))
+            if size > max_bytes:
+                # Skip the partial first line
+                file.readline()
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return []
+    events = []
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if since is None or event.get("ts", 0) >= since:
+            events.append(event)
+    return events
+
+
+def stage_summary(events):
+    """
+    Computes count, p50, p95 and total seconds per stage from span events.
+
+    Returns:
+        list: One dict per stage (stage, count, p50, p95, total), slowest total first.
+    """
+    import numpy as np
+
+    durations = {}
+    for event in events:
+        if event.get("type") == "span":
+            durations.setdefault(event["stage"], []).append(event["seconds"])
+    summary = []
+    for stage, values in durations.items():
+        values = np.asarray(values)
+        p50, p95 = np.percentile(values, [50, 95])
+        summary.append({"stage": stage, "count": len(values), "p50": float(p50),
+                        "p95": float(p95), "total": float(values.sum())})
+    return sorted(summary, key=lambda row: -row["total"])
+
+
+def counter_totals(events):
+    """
+    Sums counter events by name and labels.
+
+    Returns:
+        list: One dict per (name, labels) with the summed value.
+    """
+    totals = {}
+    for event in events:
+        if event.get("type") == "counter":
+            labels = ", ".join(f"{key}={value}" for key, value in sorted(event["labels"].items()))
+            key = (event["name"], labels)
+            totals[key] = totals.get(key, 0) + event["value"]
+    return [{"name": name, "labels": labels, "value": value}
+            for (name, labels), value in sorted(totals.items())]
+
+
+def pipeline_totals(events):
+    """
+    Returns headline totals from counter events: cache hits/misses, extraction fallbacks and
+    LLM tokens by kind.
+    """
+    totals = {"cache_hits": 0, "cache_misses": 0, "extraction_fallbacks": 0,
+              "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    for event in events:
+        if event.get("type") != "counter":
+            continue
+        name, labels, value = event["name"], event["labels"], event["value"]
+        if name == "cache":
+            totals["cache_hits" if labels.get("result") == "hit" else "cache_misses"] += value
+        elif name == "extraction_fallbacks":
+            totals["extraction_fallbacks"] += value
+        elif name == "llm_tokens" and f"{labels.get('kind')}_tokens" in totals:
+            totals[f"{labels['kind']}_tokens"] += value
+    return totals
@@ -0,0 +1,260 @@
+"""
+Local OpenAI-compatible mock server for offline development and benchmarking.
+
+It answers POST /v1/chat/completions with deterministic analysis, batched analysis, evaluator or
+interview question JSON (streamed as server-sent events when the request sets "stream"), and can
+inject latency and transient 429/5xx failures. Like the OpenAI API, it reports the prompt tokens
+served from a prompt cache in `usage.prompt_tokens_details.cached_tokens`: the longest prefix
+already seen in an earlier request, in PROMPT_CACHE_BLOCK-token steps from
+PROMPT_CACHE_MIN_TOKENS.
+
+Usage:
+    python mock_llm.py --port 8001 --latency 0.5 --fail-every 10
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 streamlit run app.py
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RESUME_ID_PATTERN = re.compile(r"### Resume (R[0-9a-f]+(?:-\d+)?):")
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+# Characters of content per streamed chunk
+STREAM_CHUNK_SIZE = 16
+# Simulated provider prompt cache: prompts of at least PROMPT_CACHE_MIN_TOKENS tokens have their
+# prefix cached in blocks of PROMPT_CACHE_BLOCK tokens, keeping the PROMPT_CACHE_MAX_ENTRIES most
+# recently used prefixes
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK = 128
+PROMPT_CACHE_MAX_ENTRIES = 100000
+
+
+def _count_tokens(text):
+    return len(_WORD_PATTERN.findall(text))
+
+
+def _fake_analysis(seed_text):
+    """
+    Returns a deterministic analysis whose score depends on the given text.
+    """
+    digest = hashlib.sha256(seed_text.encode("utf-8")).digest()
+    score = digest[0] * 100 // 255
+    return {
+        "Candidate Name": f"Candidate {digest[1:4].hex()}",
+        "Email": f"candidate{digest[1:4].hex()}@example.com",
+        "Fit Score": str(score),
+        "Fit": "Yes" if score >= 70 else "No",
+        "Matched Skills": ["Python", "SQL"][: digest[4] % 3],
+        "Explanation": "Mock analysis.",
+    }
+
+
+def mock_completion_content(prompt):
+    """
+    Builds the JSON content the mock returns for a prompt.
+    """
+    resume_ids = _RESUME_ID_PATTERN.findall(prompt)
+    if resume_ids:
+        return json.dumps({"results": [
+            {"Resume ID": resume_id, **_fake_analysis(resume_id)} for resume_id in resume_ids
+        ]})
+    if "fit_score" in prompt:
+        # Offline evaluator prompt (AI.py)
+        analysis = _fake_analysis(prompt)
+        return json.dumps({
+            "fit_score": int(analysis["Fit Score"]),
+            "matching_skills": [{"skill": skill, "percentage": 80}
+                                for skill in analysis["Matched Skills"]],
+            "missing_skills": ["Kubernetes"],
+            "questions": [],
+        })
+    if '"questions"' in prompt:
+        return json.dumps({"questions": [
+            {"question": f"Question {i}", "answer": f"Suggested answer {i}"} for i in range(1, 11)
+        ]})
+    return json.dumps(_fake_analysis(prompt))
+
+
+class PromptCache:
+    """
+    Thread-safe LRU set of hashed prompt prefixes.
+    """
+
+    def __init__(self, max_entries=PROMPT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._prefixes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, messages):
+        """
+        Returns the number of leading prompt tokens of `messages` cached by earlier requests, and
+        caches this prompt's prefixes.
+        """
+        digest = hashlib.sha256()
+        boundaries = []
+        position = 0
+        for message in messages:
+            tokens = [f"<{message.get('role')}>", *_WORD_PATTERN.findall(message.get("content", ""))]
+            for token in tokens:
+                digest.update(token.encode("utf-8") + b"\0")
+                position += 1
+                if (position >= PROMPT_CACHE_MIN_TOKENS
+                        and (position - PROMPT_CACHE_MIN_TOKENS) % PROMPT_CACHE_BLOCK == 0):
+                    boundaries.append((position, digest.digest()))
+        cached = 0
+        with self._lock:
+            for position, key in boundaries:
+                if key in self._prefixes:
+                    cached = position
+                    self._prefixes.move_to_end(key)
+                else:
+                    self._prefixes[key] = True
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+        return cached
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            request_number = server.request_count
+        if server.latency:
+            time.sleep(server.latency)
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        if server.fail_every and request_number % server.fail_every == 0:
+            self._send_json(server.fail_status,
+                            {"error": {"message": "Injected failure", "type": "mock_error"}},
+                            headers={"Retry-After": str(server.retry_after)})
+            return
+
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        content = mock_completion_content(prompt)
+        prompt_tokens = _count_tokens(prompt)
+        completion_tokens = _count_tokens(content)
+        cached_tokens = server.prompt_cache.lookup(request.get("messages", [])) \
+            if server.prompt_cache is not None else 0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_tokens)},
+        }
+        if request.get("stream"):
+            self._send_stream(request_number, request.get("model", "mock"), content,
+                              usage if (request.get("stream_options") or {}).get("include_usage")
+                              else None)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{request_number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_stream(self, request_number, model, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {"id": f"chatcmpl-mock-{request_number}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        chunks = [{"choices": [{"index": 0, "delta": {"role": "assistant", "content": ""},
+                                "finish_reason": None}]}]
+        chunks += [{"choices": [{"index": 0, "delta": {"content": content[i:i + STREAM_CHUNK_SIZE]},
+                                 "finish_reason": None}]}
+                   for i in range(0, len(content), STREAM_CHUNK_SIZE)]
+        chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if usage is not None:
+            chunks.append({"choices": [], "usage": usage})
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps({**base, **chunk})}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_mock_server(port=0, latency=0.0, fail_every=0, fail_status=429, prompt_cache=True,
+                      retry_after=0):
+    """
+    Starts the mock server on a background thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free port).
+        latency (float): Seconds to wait before answering each request.
+        fail_every (int): Fail every N-th request with `fail_status` (0 = never).
+        fail_status (int): HTTP status of injected failures.
+        prompt_cache (bool): Report cached prompt tokens (see PromptCache).
+        retry_after (float): Retry-After header (seconds) sent with injected failures.
+
+    Returns:
+        tuple: (server, base_url). Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.fail_every = fail_every
+    server.fail_status = fail_status
+    server.retry_after = retry_after
+    server.request_count = 0
+    server.prompt_cache = PromptCache() if prompt_cache else None
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock server.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds to wait before answering each request.")
+    parser.add_argument("--fail-every", type=int, default=0,
+                        help="Fail every N-th request (0 = never).")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=0,
+                        help="Retry-After (seconds) sent with injected failures.")
+    parser.add_argument("--no-prompt-cache", action="store_true",
+                        help="Never report cached prompt tokens.")
+    args = parser.parse_args()
+    server, base_url = start_mock_server(args.port, args.latency, args.fail_every, args.fail_status,
+                                         not args.no_prompt_cache, args.retry_after)
+    print(f"Mock LLM listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+OCR fallback for scanned PDF resumes.
+
+OCR is the last PDF backend in utils, so it only runs when PyMuPDF, PDFMiner and PyPDF2 all
+find no text layer. Within a document, only the pages without text that contain images are read,
+among its first OCR_MAX_PAGES pages. Each page is rendered with PyMuPDF at OCR_DPI (capped at
+OCR_MAX_SIDE_PIXELS on its longer side) and recognized by a single-threaded Tesseract process,
+at most OCR_WORKERS pages at a time (all cores by default). When utils.extract_texts reads several
+documents at once, each OCR run gets its share of the cores instead (see `ocr_share`), so a single
+scan uses every core and a batch of scans does not start more Tesseract processes than there are
+CPUs. The whole document
+must finish within OCR_TIME_BUDGET seconds: pages not recognized by then are dropped. Complete
+results are cached on disk by the hash of the file, so a re-uploaded scan is never recognized
+twice.
+
+Requires the Tesseract binary (e.g. `apt install tesseract-ocr`); without it, scanned PDFs fail
+with an error that says so instead of being scored as empty resumes.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+OCR_ENABLED = os.environ.get("OCR_ENABLED", "1") == "1"
+OCR_TESSERACT_CMD = os.environ.get("OCR_TESSERACT_CMD", "tesseract")
+OCR_LANGUAGE = os.environ.get("OCR_LANGUAGE", "eng")
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_MAX_SIDE_PIXELS = int(os.environ.get("OCR_MAX_SIDE_PIXELS", "3500"))
+OCR_MAX_PAGES = int(os.environ.get("OCR_MAX_PAGES", "10"))
+# Pages recognized concurrently for one document (one Tesseract process each)
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", str(os.cpu_count() or 2)))
+# Seconds per document; keep it below EXTRACTION_TIMEOUT, which kills the whole backend
+OCR_TIME_BUDGET = float(os.environ.get("OCR_TIME_BUDGET", "40"))
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "ocr_cache")
+# Bump when rendering or recognition changes so cached texts are not reused
+OCR_VERSION = "1"
+
+
+def ocr_share(concurrent_documents):
+    """
+    Returns the OCR page workers for one of `concurrent_documents` documents being extracted at
+    the same time: an equal share of the cores, at least one and at most OCR_WORKERS.
+    """
+    return max(1, min(OCR_WORKERS, (os.cpu_count() or 2) // max(1, concurrent_documents)))
+
+
+def tesseract_available():
+    return shutil.which(OCR_TESSERACT_CMD) is not None
+
+
+def _cache_path(data):
+    settings = f"{OCR_VERSION}:{OCR_LANGUAGE}:{OCR_DPI}:{OCR_MAX_SIDE_PIXELS}:{OCR_MAX_PAGES}"
+    digest = hashlib.sha256(settings.encode("utf-8") + b"\0" + data).hexdigest()
+    return os.path.join(OCR_CACHE_DIR, f"{digest}.txt")
+
+
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return handle.read()
+    except OSError:
+        return None
+
+
+def _write_cache(path, text):
+    try:
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        # Written to a temporary file first so a concurrent reader never sees a partial text
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=OCR_CACHE_DIR,
+                                         suffix=".tmp", delete=False) as handle:
+            handle.write(text)
+        os.replace(handle.name, path)
+    except OSError as e:
+        print(f"Error caching OCR text: {e}")
+
+
+def _pages_to_ocr(doc, max_pages):
+    """
+    Returns the numbers of the pages without a text layer that contain images.
+    """
+    return [page.number for page in doc.pages(0, min(max_pages, doc.page_count))
+            if not page.get_text().strip() and page.get_images()]
+
+
+def _render_page(page, dpi=OCR_DPI):
+    """
+    Renders a page to a grayscale PNG at `dpi`, scaled down to OCR_MAX_SIDE_PIXELS if needed.
+    """
+    import fitz  # PyMuPDF
+
+    zoom = min(dpi / 72, OCR_MAX_SIDE_PIXELS / max(page.rect.width, page.rect.height, 1))
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY,
+                           alpha=False).tobytes("png")
+
+
+def _recognize(image, deadline):
+    """
+    Runs Tesseract on a PNG image. Returns None if the time budget ran out first.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return None
+    try:
+        result = subprocess.run(
+            [OCR_TESSERACT_CMD, "stdin", "stdout", "-l", OCR_LANGUAGE, "--psm", "3"],
+            input=image, capture_output=True, timeout=remaining,
+            # One thread per process: pages are parallelized across processes instead
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"})
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip()
+                           or f"tesseract exited with status {result.returncode}")
+    return result.stdout.decode("utf-8", "replace")
+
+
+def ocr_pdf_text(data, max_pages=OCR_MAX_PAGES, workers=OCR_WORKERS,
+                 time_budget=OCR_TIME_BUDGET):
+    """
+    Extracts raw text from the scanned pages of a PDF with Tesseract.
+
+    Args:
+        data (bytes): The PDF file contents.
+        max_pages (int): Only the first pages are considered.
+        workers (int): Pages recognized concurrently.
+        time_budget (float): Seconds for the whole document; pages not recognized in time are
+            dropped (and the partial text is not cached).
+
+    Returns:
+        str: The recognized text, pages separated by newlines ("" if no page needs OCR).
+    """
+    if not OCR_ENABLED:
+        return ""
+    cache_path = _cache_path(data)
+    cached = _read_cache(cache_path)
+    if cached is not None:
+        return cached
+    if not tesseract_available():
+        raise RuntimeError(f"{OCR_TESSERACT_CMD} is not installed; scanned PDFs cannot be read.")
+    import fitz  # PyMuPDF
+
+    deadline = time.monotonic() + time_budget
+    with fitz.open(stream=data, filetype="pdf") as doc, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        page_numbers = _pages_to_ocr(doc, max_pages)
+        futures = []
+        # Pages are rendered here (a document is not thread-safe) and recognized in parallel
+        for page_number in page_numbers:
+            if time.monotonic() >= deadline:
+                break
+            futures.append(executor.submit(_recognize, _render_page(doc[page_number]), deadline))
+        texts = [future.result() for future in futures]
+    missing = len(page_numbers) - len(futures) + texts.count(None)
+    text = "\n".join(text for text in texts if text)
+    if missing:
+        print(f"OCR time budget of {time_budget}s ran out; {missing} page(s) were not read.")
+    else:
+        _write_cache(cache_path, text)
+    return text
@@ -0,0 +1,261 @@
+"""
+Text extraction for Word documents without the python-docx/docx2txt object models.
+
+DOCX: the header, body and footer parts are streamed out of the zip and scanned with
+`iterparse`, so a large document is never held as a full element tree: every paragraph is
+cleared from the partial tree as soon as its text has been collected. Images are never read.
+
+DOC (Word 97-2003): a minimal reader of the OLE2 compound file (CFB) container locates the
+WordDocument and table streams, and the text is assembled from the piece table (CLX)
+referenced by the File Information Block, decoding 8-bit (cp1252) and UTF-16 pieces. Field
+instructions are dropped and Word's control characters are mapped to whitespace.
+"""
+import io
+import os
+import re
+import struct
+import zipfile
+from xml.etree import ElementTree
+
+# Largest uncompressed XML part read from a DOCX (guards against zip bombs)
+OFFICE_MAX_PART_BYTES = int(os.environ.get("OFFICE_MAX_PART_MB", "256")) * 1024 * 1024
+
+# -- DOCX --
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+# Text boxes are stored twice (DrawingML choice and VML fallback); only the choice is read
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_DOCX_TEXT = _W + "t"
+# Elements whose end adds a separator: tabs, line breaks, paragraphs and table cells
+_DOCX_SEPARATORS = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n", _W + "p": "\n",
+                    _W + "tc": "\t"}
+_DOCX_PARTS = re.compile(r"word/(header\d*|document|footer\d*)\.xml")
+
+
+def _docx_part_pieces(stream, pieces):
+    skip = 0
+    stack = []
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            if skip or element.tag == _MC_FALLBACK:
+                skip += 1
+            stack.append(element)
+            continue
+        stack.pop()
+        if skip:
+            skip -= 1
+        elif element.tag == _DOCX_TEXT:
+            if element.text:
+                pieces.append(element.text)
+        elif element.tag in _DOCX_SEPARATORS:
+            pieces.append(_DOCX_SEPARATORS[element.tag])
+        # Drop finished top-level paragraphs and tables so the tree never grows
+        if len(stack) <= 2 and stack:
+            stack[-1].clear()
+
+
+def docx_text(data):
+    """
+    Extracts raw text from a DOCX file: its headers, body and footers, in that order.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        parts = {match.group(1): info for info in archive.infolist()
+                 if (match := _DOCX_PARTS.fullmatch(info.filename))}
+        if "document" not in parts:
+            raise ValueError("Not a Word document: word/document.xml is missing.")
+        names = sorted(name for name in parts if name.startswith("header")) + ["document"] \
+            + sorted(name for name in parts if name.startswith("footer"))
+        pieces = []
+        for name in names:
+            if parts[name].file_size > OFFICE_MAX_PART_BYTES:
+                raise ValueError(f"{parts[name].filename} is larger than "
+                                 f"{OFFICE_MAX_PART_BYTES // (1024 * 1024)} MB.")
+            with archive.open(parts[name]) as stream:
+                _docx_part_pieces(stream, pieces)
+    return "".join(pieces)
+
+
+# -- OLE2 compound files --
+_CFB_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_END_OF_CHAIN = 0xFFFFFFFE
+_MAX_REGULAR_SECTOR = 0xFFFFFFFA
+
+
+class CompoundFile:
+    """
+    Read-only view of the streams of an OLE2 compound file.
+
+    Args:
+        data (bytes): The file contents.
+    """
+
+    def __init__(self, data):
+        if data[:8] != _CFB_SIGNATURE:
+            raise ValueError("Not an OLE2 compound file.")
+        self.data = memoryview(data)
+        sector_shift, mini_sector_shift = struct.unpack_from("<HH", data, 0x1E)
+        self.sector_size = 1 << sector_shift
+        self.mini_sector_size = 1 << mini_sector_shift
+        (fat_sectors, directory_start, _, self.mini_cutoff, mini_fat_start, _, difat_start,
+         difat_sectors) = struct.unpack_from("<8I", data, 0x2C)
+        # Sector IDs of the FAT: 109 in the header, the rest in a chain of DIFAT sectors
+        difat = list(struct.unpack_from("<109I", data, 0x4C))
+        per_sector = self.sector_size // 4
+        sector = difat_start
+        for _ in range(difat_sectors):
+            if sector > _MAX_REGULAR_SECTOR:
+                break
+            entries = struct.unpack_from(f"<{per_sector}I", self._sector(sector))
+            difat.extend(entries[:-1])
+            sector = entries[-1]
+        self.fat = []
+        for sector in difat[:fat_sectors]:
+            self.fat.extend(struct.unpack_from(f"<{per_sector}I", self._sector(sector)))
+        self.entries = {}
+        directory = self._chain_bytes(directory_start, self.fat, self._sector)
+        for offset in range(0, len(directory) - 127, 128):
+            name_length, kind = struct.unpack_from("<HB", directory, offset + 64)
+            if kind not in (1, 2, 5) or not 2 <= name_length <= 64:
+                continue
+            name = bytes(directory[offset:offset + name_length - 2]).decode("utf-16-le", "replace")
+            start, size = struct.unpack_from("<IQ", directory, offset + 116)
+            if self.sector_size == 512:
+                # Version 3 files only define the low 32 bits of the size
+                size &= 0xFFFFFFFF
+            self.entries.setdefault(name, (kind, start, size))
+        _, root_start, root_size = self.entries.get("Root Entry", (5, _END_OF_CHAIN, 0))
+        self.mini_fat = []
+        if mini_fat_start <= _MAX_REGULAR_SECTOR:
+            chain = self._chain_bytes(mini_fat_start, self.fat, self._sector)
+            self.mini_fat = list(struct.unpack_from(f"<{len(chain) // 4}I", chain))
+        self.mini_stream = self._chain_bytes(root_start, self.fat, self._sector)[:root_size]
+
+    def _sector(self, sector):
+        offset = (sector + 1) * self.sector_size
+        if offset + self.sector_size > len(self.data):
+            raise ValueError("Truncated compound file.")
+        return self.data[offset:offset + self.sector_size]
+
+    def _mini_sector(self, sector):
+        offset = sector * self.mini_sector_size
+        return self.mini_stream[offset:offset + self.mini_sector_size]
+
+    def _chain_bytes(self, start, table, read):
+        chunks = []
+        sector = start
+        # A chain cannot be longer than its table; a longer one is a loop in a corrupt file
+        for _ in range(len(table) + 1):
+            if sector > _MAX_REGULAR_SECTOR:
+                break
+            chunks.append(read(sector))
+            if sector >= len(table):
+                raise ValueError("Corrupt compound file: sector chain out of range.")
+            sector = table[sector]
+        else:
+            raise ValueError("Corrupt compound file: sector chain loops.")
+        return b"".join(chunks)
+
+    def stream(self, name):
+        """
+        Returns the contents of a stream by name.
+
+        Raises:
+            KeyError: If the file has no such stream.
+        """
+        kind, start, size = self.entries[name]
+        if kind != 2:
+            raise KeyError(name)
+        if size < self.mini_cutoff:
+            return self._chain_bytes(start, self.mini_fat, self._mini_sector)[:size]
+        return self._chain_bytes(start, self.fat, self._sector)[:size]
+
+
+# -- DOC (Word 97-2003) --
+_WORD_IDENT = 0xA5EC
+_FIELD_MARKS = re.compile("([\x13\x14\x15])")
+# Word control characters: paragraph/cell/row marks, line, page and section breaks become
+# whitespace; object anchors and optional hyphens are dropped
+_WORD_CONTROL = str.maketrans({"\r": "\n", "\x07": "\t", "\x0b": "\n", "\x0c": "\n",
+                               "\x0e": "\n", "\x1e": "-", "\x1f": None, "\x01": None,
+                               "\x02": None, "\x05": None, "\x08": None})
+
+
+def _strip_fields(text):
+    """
+    Keeps the displayed result of fields (e.g. a hyperlink's text) and drops their instructions.
+    """
+    output, stack = [], []  # stack: True while in a field's instruction part
+    for part in _FIELD_MARKS.split(text):
+        if part == "\x13":
+            stack.append(True)
+        elif part == "\x14":
+            if stack:
+                stack[-1] = False
+        elif part == "\x15":
+            if stack:
+                stack.pop()
+        elif not any(stack):
+            output.append(part)
+    return "".join(output)
+
+
+def _piece_table(clx):
+    """
+    Returns the (cp_start, cp_end, fc, compressed) pieces of a CLX structure.
+    """
+    offset = 0
+    # Skip the property modifiers (Prc) that precede the piece table (Pcdt)
+    while offset < len(clx) and clx[offset] == 0x01:
+        (size,) = struct.unpack_from("<H", clx, offset + 1)
+        offset += 3 + size
+    if offset >= len(clx) or clx[offset] != 0x02:
+        raise ValueError("Corrupt Word document: piece table not found.")
+    (size,) = struct.unpack_from("<I", clx, offset + 1)
+    plc = clx[offset + 5:offset + 5 + size]
+    count = (len(plc) - 4) // 12
+    positions = struct.unpack_from(f"<{count + 1}I", plc)
+    pieces = []
+    for i in range(count):
+        (fc,) = struct.unpack_from("<I", plc, 4 * (count + 1) + 8 * i + 2)
+        compressed = bool(fc & 0x40000000)
+        fc &= 0x3FFFFFFF
+        pieces.append((positions[i], positions[i + 1], fc // 2 if compressed else fc, compressed))
+    return pieces
+
+
+def doc_text(data):
+    """
+    Extracts raw text from a Word 97-2003 document. DOCX files uploaded as DOC are also read.
+
+    Raises:
+        ValueError: If the file is not a Word document, is encrypted or is corrupt.
+    """
+    if data[:2] == b"PK":
+        return docx_text(data)
+    container = CompoundFile(data)
+    try:
+        word = container.stream("WordDocument")
+    except KeyError:
+        raise ValueError("Not a Word document: the WordDocument stream is missing.")
+    (ident,) = struct.unpack_from("<H", word, 0)
+    (flags,) = struct.unpack_from("<H", word, 0x0A)
+    if ident != _WORD_IDENT:
+        raise ValueError("Not a Word 97-2003 document.")
+    if flags & 0x0100:
+        raise ValueError("The Word document is encrypted.")
+    # FibBase (32 bytes), then three length-prefixed arrays: FibRgW, FibRgLw, FibRgFcLcb
+    (csw,) = struct.unpack_from("<H", word, 32)
+    (cslw,) = struct.unpack_from("<H", word, 34 + 2 * csw)
+    fc_lcb_offset = 36 + 2 * csw + 4 * cslw
+    (fc_lcb_count,) = struct.unpack_from("<H", word, fc_lcb_offset)
+    if fc_lcb_count <= 33:
+        raise ValueError("Unsupported Word document: no piece table (Word 95 or earlier).")
+    fc_clx, lcb_clx = struct.unpack_from("<II", word, fc_lcb_offset + 2 + 33 * 8)
+    table = container.stream("1Table" if flags & 0x0200 else "0Table")
+    parts = []
+    for cp_start, cp_end, fc, compressed in _piece_table(table[fc_clx:fc_clx + lcb_clx]):
+        length = cp_end - cp_start
+        if compressed:
+            parts.append(bytes(word[fc:fc + length]).decode("cp1252", "replace"))
+        else:
+            parts.append(bytes(word[fc:fc + 2 * length]).decode("utf-16-le", "replace"))
+    return _strip_fields("".join(parts)).translate(_WORD_CONTROL)
@@ -0,0 +1,148 @@
+"""
+Background prefetching of interview questions for the top-ranked candidates.
+
+While a recruiter reviews the ranked table, the questions for the top INTERVIEW_PREFETCH_TOP_N
+candidates are generated on a small thread pool, so selecting one of them shows its questions at
+once. Finished questions are kept per candidate in a bounded LRU cache shared by all sessions.
+Every rerun of a session declares the candidates in its view; queued requests that no session
+wants any more are cancelled. A request already sent to the LLM cannot be interrupted, so it
+runs to completion and its result is cached.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+
+INTERVIEW_PREFETCH_TOP_N = int(os.environ.get("INTERVIEW_PREFETCH_TOP_N", "5"))
+INTERVIEW_PREFETCH_WORKERS = int(os.environ.get("INTERVIEW_PREFETCH_WORKERS", "2"))
+# Candidates whose questions are kept in memory (questions are also in the persistent cache)
+INTERVIEW_PREFETCH_MAX_ENTRIES = int(os.environ.get("INTERVIEW_PREFETCH_MAX_ENTRIES", "256"))
+
+
+class Prefetcher:
+    """
+    Thread-safe background runner with a bounded LRU cache of results by key.
+
+    Args:
+        workers (int): Requests run concurrently.
+        max_entries (int): Results kept in the cache; also bounds the remembered failures and
+            session views.
+    """
+
+    def __init__(self, workers=INTERVIEW_PREFETCH_WORKERS,
+                 max_entries=INTERVIEW_PREFETCH_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers),
+                                            thread_name_prefix="prefetch")
+        # Reentrant: a future that is already done runs its callback in the submitting thread
+        self._lock = threading.RLock()
+        self._results = OrderedDict()  # key -> result
+        self._failed = OrderedDict()  # keys whose last prefetch failed (not prefetched again)
+        self._futures = {}  # key -> queued or running Future
+        self._views = OrderedDict()  # view ID -> keys it wants
+
+    def get(self, key):
+        """
+        Returns the cached result for `key`, or None.
+        """
+        with self._lock:
+            if key not in self._results:
+                return None
+            self._results.move_to_end(key)
+            return self._results[key]
+
+    def pending(self, key):
+        with self._lock:
+            return key in self._futures
+
+    def submit(self, key, fn, *args):
+        """
+        Returns a future of `fn(*args)` for `key`: a completed one if the result is cached, the
+        queued or running one if the key is already pending, or a new one. Unlike `prefetch`,
+        this also retries a key whose prefetch failed.
+        """
+        with self._lock:
+            if key in self._results:
+                future = Future()
+                future.set_result(self.get(key))
+                return future
+            return self._submit(key, fn, args)
+
+    def prefetch(self, view_id, requests, keep=()):
+        """
+        Replaces the keys wanted by a view (e.g. a session) and queues the missing ones.
+
+        Queued requests for keys that no view wants any more are cancelled.
+
+        Args:
+            view_id: Identifies the view.
+            requests (dict): Key -> (fn, args), in priority order.
+            keep (iterable): Further keys the view still wants (e.g. an explicit request), which
+                are not queued here.
+        """
+        with self._lock:
+            previous = self._views.pop(view_id, set())
+            self._views[view_id] = set(requests) | set(keep)
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+            wanted = set().union(*self._views.values())
+            for key in previous - wanted:
+                future = self._futures.get(key)
+                if future is not None and future.cancel():
+                    metrics.increment("interview_prefetch", result="cancelled")
+            for key, (fn, args) in requests.items():
+                if key not in self._results and key not in self._failed:
+                    self._submit(key, fn, args)
+
+    def _submit(self, key, fn, args):
+        # Called with the lock held
+        future = self._futures.get(key)
+        if future is None:
+            future = self._executor.submit(fn, *args)
+            self._futures[key] = future
+            metrics.increment("interview_prefetch", result="submitted")
+            future.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                print(f"Prefetching {key} failed: {error}")
+                metrics.increment("interview_prefetch", result="failed")
+                self._failed[key] = True
+                while len(self._failed) > self.max_entries:
+                    self._failed.popitem(last=False)
+                return
+            self._failed.pop(key, None)
+            self._results[key] = future.result()
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"cached": len(self._results), "pending": len(self._futures),
+                    "failed": len(self._failed)}
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_interview_prefetcher():
+    """
+    Returns the process-wide interview question prefetcher, creating it on first use.
+    """
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
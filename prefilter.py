@@ -0,0 +1,101 @@
+import os
+import re
+
+# Resumes sent to the LLM: only the top K by local score (0 = no limit), and only those whose
+# score relative to the best resume in the batch is at least PREFILTER_MIN_SCORE (0-100).
+# Both default to 0: the pre-filter is off unless configured or set in the dashboard.
+PREFILTER_TOP_K = int(os.environ.get("PREFILTER_TOP_K", "0"))
+PREFILTER_MIN_SCORE = float(os.environ.get("PREFILTER_MIN_SCORE", "0"))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this "
+    "to we will with you your who what which must should can able strong good experience "
+    "work working years year role team candidate ability".split()
+)
+
+
+def tokenize(text):
+    """
+    Lowercases and splits text into terms, keeping tech tokens such as "c++", "c#" and "node.js".
+    """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def bm25_scores(query, documents, k1=BM25_K1, b=BM25_B):
+    """
+    Scores every document against the query with BM25 in one vectorized pass.
+
+    Args:
+        query (str): The job description.
+        documents (list): Resume texts.
+
+    Returns:
+        numpy.ndarray: One BM25 score per document.
+    """
+    # NumPy/SciPy are only loaded when a batch is actually pre-filtered
+    import numpy as np
+    from scipy import sparse
+
+    vocabulary = {}
+    rows, cols = [], []
+    for row, document in enumerate(documents):
+        for token in tokenize(document):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+    scores = np.zeros(len(documents))
+    query_ids = np.unique([vocabulary[token] for token in tokenize(query) if token in vocabulary])
+    if not len(query_ids):
+        return scores
+
+    # Duplicate (row, col) pairs are summed into term frequencies
+    term_counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(documents), len(vocabulary)))
+    num_documents = term_counts.shape[0]
+    document_frequency = np.diff(term_counts.tocsc().indptr)
+    idf = np.log1p((num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+    document_lengths = np.asarray(term_counts.sum(axis=1)).ravel()
+    length_norm = k1 * (1 - b + b * document_lengths / max(document_lengths.mean(), 1e-9))
+
+    query_counts = term_counts[:, query_ids].tocoo()
+    tf = query_counts.data
+    weights = idf[query_ids][query_counts.col] * tf * (k1 + 1) / (tf + length_norm[query_counts.row])
+    return np.bincount(query_counts.row, weights=weights, minlength=num_documents)
+
+
+def rank_resumes(jd, resume_texts, top_k=PREFILTER_TOP_K, min_score=PREFILTER_MIN_SCORE):
+    """
+    Ranks resumes against the job description locally and selects the ones worth an LLM call.
+
+    Args:
+        jd (str): The job description.
+        resume_texts (list): Resume texts.
+        top_k (int): Keep at most this many resumes (0 = no limit).
+        min_score (float): Minimum score relative to the best resume, from 0 to 100.
+
+    Returns:
+        tuple: (scores, keep) where `scores` are the 0-100 relative local scores and `keep` is a
+        boolean array marking the resumes to send to the LLM. If no resume shares a term with
+        the job description, the scores say nothing and only `top_k` applies.
+    """
+    import numpy as np
+
+    raw_scores = bm25_scores(jd, resume_texts)
+    best = raw_scores.max() if len(raw_scores) else 0
+    if best > 0:
+        scores = raw_scores / best * 100
+        keep = scores >= min_score
+    else:
+        scores = np.zeros_like(raw_scores)
+        keep = np.ones(len(scores), dtype=bool)
+    if top_k and keep.sum() > top_k:
+        # Stable sort keeps upload order among equal scores
+        order = np.argsort(-scores, kind="stable")
+        keep = np.zeros_like(keep)
+        keep[order[:top_k]] = True
+    return scores, keep
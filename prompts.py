@@ -0,0 +1,164 @@
+"""
+Versioned prompt templates, laid out for provider-side prompt caching.
+
+Providers cache the longest previously seen prefix of a request (in fixed-size token blocks), so
+every request is built from its most to its least shared part: the template's static system
+message (instructions, scoring rubric and output schema), then the job description (the same
+for every request of a screening run), then the per-resume content. A batch of requests against
+one JD therefore only sends the resumes uncached.
+
+The system messages are module constants with no interpolated values, so they are
+byte-identical across requests, processes and deployments. Bump a template's version whenever
+its text changes; `template_key` also covers the exact text, so cached results are never reused
+across an edit.
+"""
+import hashlib
+from collections import namedtuple
+
+PromptTemplate = namedtuple("PromptTemplate", "name version system")
+
+_ANALYSIS_SYSTEM = """You are an expert AI recruitment assistant analyzing resumes against job descriptions. Only match the skills explicitly listed in the Job Description and mentioned in the candidate's resume.
+
+The next message holds the Job Description and the message after it holds the resumes to score. Score each resume independently against the Job Description. When the Job Description message ends with "### Required Skills:", those are the skills detected in it under their canonical names: use these names in Matched Skills for the ones a resume mentions.
+
+**Scoring Criteria (0-100):**
+1. **Tech Skills (60%)**: Compare job-required technical skills with resume skills.
+  - **Project-Based Skills (45%)**: Extract and match skills from project descriptions with JD requirements.
+  - **General Skills (15%)**: Consider listed skills outside of projects.
+  - Prioritize core skills in programming languages, frameworks, and tools mentioned in the JD.
+2. **Experience - Based on Designation (10%)**:
+  - If experienced: Evaluate past roles, years in industry, and job relevance.
+  - If fresher: Consider projects, internships, and specialization.
+3. **Education (20%)**:
+  - Check if the degree aligns with JD requirements.
+  - Consider relevant certifications and coursework.
+4. **Location (5%)**:
+  - Check if the candidate is in a preferred location.
+  - If fresher, **specialization + location** matters.
+5. **Additional (5%)**:
+  - Extra certifications, courses, or trainings.
+
+**Fit Classification:**
+- **Fit: Yes** (if score ≥ 70)
+- **Fit: No** (if score < 70)
+
+**Matched Skills:** Extract and list relevant skills that align with the JD.
+**Explanation:** Provide a short reason why the candidate is or isn’t a good fit.
+**Candidate Name:** Extract the candidate's name from the resume.
+**Email:** Extract the candidate's email from the resume.
+
+### Output Format (in JSON, no other text allowed):
+For a single resume, return one analysis object:
+{
+    "Candidate Name": "Name of the Candidate",
+    "Email": "Candidate's Email",
+    "Fit Score": "XX",
+    "Fit": "Yes/No",
+    "Matched Skills": ["Skill1", "Skill2", "Skill3"],
+    "Explanation": "Candidate has strong skills in X and Y but lacks experience in Z..."
+}
+When the resumes have "### Resume <ID>:" headings, return one analysis object per resume in "results", each with its "Resume ID" copied exactly from its heading:
+{
+    "results": [
+        {"Resume ID": "R0123456789", "Candidate Name": "...", "Email": "...", "Fit Score": "XX", "Fit": "Yes/No", "Matched Skills": ["..."], "Explanation": "..."}
+    ]
+}"""
+
+_INTERVIEW_SYSTEM = """You are an expert AI recruitment assistant tasked with generating phone interview questions and suggested answers for the TA team to assess a candidate's suitability based on the job description, the candidate's resume, and the matched skills.
+
+The next message holds the Job Description and the message after it holds the candidate's resume and matched skills.
+
+**Instructions:**
+- Generate 10 basic interview questions specifically focused on the **project skills** mentioned in the candidate's resume.
+- Focus on the skills that the candidate has used in their projects, as described in their resume.
+- Ensure that the questions are straightforward and relevant to the practical application of these skills in real-world projects.
+- Provide clear and concise suggested answers for each question.
+- Avoid complex or advanced questions; focus on fundamental concepts and practical applications related to the project skills.
+
+### Output Format (JSON):
+{
+    "questions": [
+        {
+            "question": "Question 1",
+            "answer": "Suggested answer for Question 1"
+        },
+        {
+            "question": "Question 2",
+            "answer": "Suggested answer for Question 2"
+        },
+        ...
+    ]
+}"""
+
+# Offline evaluator (AI.py)
+_EVALUATOR_SYSTEM = """You are an expert resume and job match evaluator.
+
+The next message holds the Job Description and the message after it holds the resume. Compare the resume and job description. Return ONLY a valid JSON with these keys:
+- fit_score (number from 0-100)
+- matching_skills: list of 3 items, each like { "skill": "...", "percentage": number }
+- missing_skills: list of 3 strings
+- questions: list of 3 items, each like { "question": "...", "options": ["...", "...", "...", "..."], "correct": [0, 2] }"""
+
+ANALYSIS_TEMPLATE = PromptTemplate("analysis", "4", _ANALYSIS_SYSTEM)
+INTERVIEW_TEMPLATE = PromptTemplate("interview", "4", _INTERVIEW_SYSTEM)
+EVALUATOR_TEMPLATE = PromptTemplate("evaluator", "2", _EVALUATOR_SYSTEM)
+
+
+def template_key(template):
+    """
+    Identifies a template version and its exact text, e.g. "analysis-v3-1a2b3c4d5e6f".
+    """
+    digest = hashlib.sha256(template.system.encode("utf-8")).hexdigest()[:12]
+    return f"{template.name}-v{template.version}-{digest}"
+
+
+def _messages(template, jd, content, jd_skills=()):
+    jd_message = f"### Job Description:\n{jd}"
+    if jd_skills:
+        # Part of the JD message, so it stays in the prefix shared by the JD's requests
+        jd_message += f"\n\n### Required Skills:\n{', '.join(jd_skills)}"
+    return [
+        {"role": "system", "content": template.system},
+        {"role": "user", "content": jd_message},
+        {"role": "user", "content": content},
+    ]
+
+
+def analysis_messages(jd, resume_text, jd_skills=()):
+    """
+    Builds the messages scoring one (already compacted) resume against a job description.
+
+    Args:
+        jd_skills (list): Canonical skills detected in the job description (see skills.py).
+    """
+    return _messages(ANALYSIS_TEMPLATE, jd, f"### Resume:\n{resume_text}", jd_skills)
+
+
+def batch_analysis_messages(jd, resume_texts, jd_skills=()):
+    """
+    Builds the messages scoring several (already compacted) resumes in one request.
+
+    Args:
+        resume_texts (dict): Resume ID -> resume text.
+        jd_skills (list): Canonical skills detected in the job description.
+    """
+    resumes = "\n\n".join(f"### Resume {resume_id}:\n{resume_text}"
+                          for resume_id, resume_text in resume_texts.items())
+    return _messages(ANALYSIS_TEMPLATE, jd,
+                     f"Score each of the {len(resume_texts)} resumes below.\n\n{resumes}",
+                     jd_skills)
+
+
+def interview_messages(jd, resume_text, matched_skills):
+    """
+    Builds the messages generating interview questions for one candidate.
+    """
+    return _messages(INTERVIEW_TEMPLATE, jd,
+                     f"### Resume:\n{resume_text}\n\n### Matched Skills:\n{', '.join(matched_skills)}")
+
+
+def evaluator_messages(jd, resume_text):
+    """
+    Builds the messages of the offline evaluator for one resume/JD pair.
+    """
+    return _messages(EVALUATOR_TEMPLATE, jd, f"### Resume:\n{resume_text}")
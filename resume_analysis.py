@@ -1,14 +1,30 @@
 import streamlit as st
-import json
 import pandas as pd
-from utils import extract_text_from_file
-import authentication
-from openai import OpenAI
+from utils import _read_bytes
+from corpus import content_hash, file_hash, get_corpus
+from embeddings import get_index
+from prefetch import INTERVIEW_PREFETCH_TOP_N, get_interview_prefetcher
+from session_store import append_results, csv_export, current_session_id, get_frame_cache
+from cache import get_cache, make_cache_key
+from compaction import JD_TOKEN_BUDGET, RESUME_TOKEN_BUDGET, compact_text
+from prefilter import PREFILTER_MIN_SCORE, PREFILTER_TOP_K
+from jobs import JOB_ACTIVE_STATUSES, StoredFile, ensure_workers, get_job_store
+from llm_client import get_client
+from prompts import INTERVIEW_TEMPLATE, interview_messages, template_key
+# The scoring pipeline lives in scoring.py so the job workers can run it without Streamlit
+from scoring import LLM_MODEL, jd_version_key
+from structured_output import loads_lenient, validate_questions
 import os
+import time
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("API_KEY"))
+# Seconds between status refreshes while a background job is running
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
 
+# Default number of stored resumes shortlisted by semantic search
+SEARCH_TOP_K = int(os.environ.get("SEARCH_TOP_K", "20"))
+
+# Interview prompt template version (see prompts.py); cached questions are keyed by it
+INTERVIEW_PROMPT_VERSION = template_key(INTERVIEW_TEMPLATE)
 
 
 # -- Resume Analysis Dashboard --
@@ -19,204 +35,302 @@ def resume_analysis_dashboard():
         st.write("### Enter the Job Description:")
         job_description = st.text_area("Job Description", height=200)
     with col2:
-        st.write("### Upload Resumes (PDF, DOCX, or TXT):")
+        st.write("### Upload Resumes (PDF, DOCX, DOC, or TXT):")
         uploaded_files = st.file_uploader("Drag and drop files here",
-                                          type=["pdf", "docx", "txt"],
+                                          type=["pdf", "docx", "doc", "txt"],
                                           accept_multiple_files=True,
                                           key="resume_uploader")
+    with st.expander("Local pre-filter"):
+        prefilter_top_k = st.number_input(
+            "Send only the top K resumes to the LLM (0 = all)",
+            min_value=0,
+            value=PREFILTER_TOP_K,
+            step=10)
+        prefilter_min_score = st.slider(
+            "Minimum local score (% of the best match in the batch)", 0, 100,
+            int(PREFILTER_MIN_SCORE))
+    corpus = get_corpus()
+    stored_count = corpus.count()
+    if stored_count and job_description:
+        stored_label = (f"{stored_count} in the corpus, "
+                        f"{corpus.count_unscored(jd_version_key(job_description))} "
+                        "not yet scored for this job description")
+    else:
+        stored_label = f"{stored_count} in the corpus"
+    include_stored = st.checkbox(
+        f"Include stored resumes from earlier uploads ({stored_label})",
+        help="Resumes already scored against this job description reuse their stored analysis; "
+        "only the others are sent to the LLM.")
     submit_button = st.button(
         "Submit",
         type="primary",
-        disabled=not (job_description and uploaded_files))
-
-    # Initialize session state variables
-    if "results" not in st.session_state:
-        st.session_state.results = []
-    if "resume_texts" not in st.session_state:
-        st.session_state.resume_texts = {}
-    if "interview_questions" not in st.session_state:
-        st.session_state.interview_questions = None
+        disabled=not (job_description and (uploaded_files or include_stored)))
+
+    # Only small per-session state is kept here; results and resume texts stay in the job store
     if "selected_candidate" not in st.session_state:
         st.session_state.selected_candidate = None
-    if "interview_questions_and_answers" not in st.session_state:
-        st.session_state.interview_questions_and_answers = []
 
-    # Process resumes when the submit button is clicked
+    # Queue the batch as a background job; a worker process extracts and scores it
+    store = get_job_store()
+    user_email = st.session_state.user_info['email']
     if submit_button:
-        with st.spinner("Analyzing resumes..."):
-            st.session_state.results = []
-            st.session_state.resume_texts = {}
-            for uploaded_file in uploaded_files:
-                try:
-                    resume_text = extract_text_from_file(uploaded_file)
-                    analysis = analyze_resume_with_jd(job_description,
-                                                      resume_text)
-                    fit_score, fit, skills, explanation, name, email = parse_llm_output(
-                        analysis)
-                    st.session_state.results.append({
-                        "Candidate Name": name,
-                        "Email": email,
-                        "Fit Score": fit_score,
-                        "Fit": fit,
-                        "Matched Skills": skills,
-                        "Explanation": explanation,
-                    })
-                    st.session_state.resume_texts[name] = resume_text
-                except Exception as e:
-                    st.error(f"Error processing {uploaded_file.name}: {e}")
-
-        # Log usage if results are generated
-        if st.session_state.results:
-            authentication.log_usage(st.session_state.user_info['email'],
-                                     len(uploaded_files))
+        files = list(uploaded_files or [])
+        if include_stored:
+            files += stored_resume_files(corpus, files)
+        st.session_state.job_id = store.create_job(
+            user_email, job_description, files, {
+                "top_k": int(prefilter_top_k),
+                "min_score": prefilter_min_score
+            })
+        reset_results()
+        ensure_workers(store)
+
+    # After a refresh or a new sign-in, reattach to the user's most recent job
+    if "job_id" not in st.session_state:
+        recent_jobs = store.list_jobs(user_email, limit=1)
+        st.session_state.job_id = recent_jobs[0]["id"] if recent_jobs else None
+        reset_results()
+    job = store.get_job(
+        st.session_state.job_id) if st.session_state.job_id else None
+    results = None
+    if job is not None:
+        if job["status"] in JOB_ACTIVE_STATUSES:
+            # Restart the worker if it died; the job resumes from its pending files
+            ensure_workers(store)
+            job_progress(job["id"])
+        else:
+            # Compact ranked results, cached per session within a memory budget
+            results = cached_results(store, job["id"])
+        job_controls(store, job)
+        # Interview questions use the description the listed results were scored against
+        job_description = job["job_description"]
 
     # Display ranked candidates if results are available
-    if st.session_state.results:
-        results_sorted = sorted(st.session_state.results,
-                                key=lambda x: x["Fit Score"],
-                                reverse=True)
-        df_sorted = pd.DataFrame(results_sorted)
+    if results is not None and len(results):
         st.subheader("Ranked Candidates")
-        st.dataframe(df_sorted, height=400)
+        st.dataframe(results, height=400, hide_index=True)
 
-        # Download results as CSV
-        csv_data = df_sorted.to_csv(index=False).encode("utf-8")
+        # The CSV is only generated, from the store, when the button is clicked
         st.download_button(label=":inbox_tray: Download Results as CSV",
-                           data=csv_data,
+                           data=csv_export(store, job["id"], list(results.columns)),
                            file_name="ranked_resume_analysis_results.csv",
-                           mime="text/csv")
+                           mime="text/csv",
+                           on_click="ignore")
 
         # -- Interview Questions Section --
         st.subheader("Generate Interview Questions")
-        candidate_names = [
-            result["Candidate Name"] for result in results_sorted
-        ]
+        candidate_keys = results.index.tolist()
 
-        # Use session state to store the selected candidate
+        # Use session state to store the selected candidate (its file index in the job)
         selected_candidate = st.selectbox(
             "Select a candidate to generate interview questions:",
-            candidate_names,
-            index=candidate_names.index(st.session_state.selected_candidate)
-            if st.session_state.selected_candidate else 0)
+            candidate_keys,
+            index=candidate_keys.index(st.session_state.selected_candidate)
+            if st.session_state.selected_candidate in candidate_keys else 0,
+            format_func=lambda key:
+            f"{results.at[key, 'Candidate Name']} ({results.at[key, 'Email']})")
         st.session_state.selected_candidate = selected_candidate
 
-        if selected_candidate:
-            resume_text = st.session_state.resume_texts.get(
-                selected_candidate, "")
-            if resume_text:
-                # Extract matched skills for the selected candidate
-                matched_skills = next(
-                    (result["Matched Skills"]
-                     for result in st.session_state.results
-                     if result["Candidate Name"] == selected_candidate), [])
-
-                # Check if there are matched skills before generating questions
-                if matched_skills:
+        # Questions for the top-ranked candidates are generated in the background while the
+        # table is reviewed; queued requests for candidates out of view are cancelled
+        prefetcher = get_interview_prefetcher()
+        selected_key = (job["id"], selected_candidate)
+        has_skills = results["Matched Skills"].astype(bool) if "Matched Skills" in results \
+            else pd.Series(False, index=results.index)
+        top = results.index[has_skills.to_numpy()][:INTERVIEW_PREFETCH_TOP_N]
+        prefetcher.prefetch(
+            current_session_id(),
+            {(job["id"], key): (candidate_interview_questions, (job["id"], key, job_description))
+             for key in top},
+            keep=[selected_key])
+
+        if selected_candidate is not None:
+            questions_and_answers = prefetcher.get(selected_key)
+            if questions_and_answers is None:
+                if has_skills[selected_candidate]:
+                    if prefetcher.pending(selected_key):
+                        st.caption("Interview questions for this candidate are being prepared.")
                     if st.button("Generate Interview Questions and Answers"):
-                        with st.spinner(
-                                "Generating interview questions and answers..."
-                        ):
-                            st.session_state.interview_questions_and_answers = generate_interview_questions_and_answers(
-                                job_description, resume_text, matched_skills)
+                        with st.spinner("Generating interview questions and answers..."):
+                            try:
+                                questions_and_answers = prefetcher.submit(
+                                    selected_key, candidate_interview_questions, job["id"],
+                                    selected_candidate, job_description).result()
+                            except ValueError as e:
+                                st.warning(str(e))
+                            except Exception as e:
+                                st.error(f"Error generating interview questions and answers: {e}")
                 else:
                     st.warning(
                         "No matched skills found for this candidate. Cannot generate interview questions."
                     )
 
-                # Display generated questions and answers
-                if st.session_state.interview_questions_and_answers:
-                    st.write("### Suggested Interview Questions and Answers:")
-                    st.write(st.session_state.interview_questions_and_answers)
-
-
-# -- LLM Analysis --
-def analyze_resume_with_jd(jd, resume_text):
-    if not resume_text.strip():
-        return {"error": "Resume text is empty."}
-    prompt = f"""
-    You are an AI recruitment assistant analyzing resumes against job descriptions. Only match the skills explicitly listed in the Job Description and mentioned in the candidate's resume.
-
-    ### Job Description:
-    {jd}
-
-    ### Resume:
-    {resume_text}
-
-    **Scoring Criteria (0-100):**
-    1. **Tech Skills (60%)**: Compare job-required technical skills with resume skills.
-      - **Project-Based Skills (45%)**: Extract and match skills from project descriptions with JD requirements.
-      - **General Skills (15%)**: Consider listed skills outside of projects.
-      - Prioritize core skills in programming languages, frameworks, and tools mentioned in the JD.
-    2. **Experience - Based on Designation (10%)**:
-      - If experienced: Evaluate past roles, years in industry, and job relevance.
-      - If fresher: Consider projects, internships, and specialization.
-    3. **Education (20%)**:
-      - Check if the degree aligns with JD requirements.
-      - Consider relevant certifications and coursework.
-    4. **Location (5%)**:
-      - Check if the candidate is in a preferred location.
-      - If fresher, **specialization + location** matters.
-    5. **Additional (5%)**:
-      - Extra certifications, courses, or trainings.
-
-    **Fit Classification:**
-    - **Fit: Yes** (if score ≥ 70)
-    - **Fit: No** (if score < 70)
-
-    **Matched Skills:** Extract and list relevant skills that align with the JD.
-    **Explanation:** Provide a short reason why the candidate is or isn’t a good fit.
-    **Candidate Name:** Extract the candidate's name from the resume.
-    **Email:** Extract the candidate's email from the resume.
-
-    ### Output Format (in JSON, no other text allowed):
-    {{
-        "Candidate Name": "Name of the Candidate",
-        "Email": "Candidate's Email",
-        "Fit Score": "XX",
-        "Fit": "Yes/No",
-        "Matched Skills": ["Skill1", "Skill2", "Skill3"],
-        "Explanation": "Candidate has strong skills in X and Y but lacks experience in Z..."
-    }}
+            # Display generated questions and answers
+            if questions_and_answers:
+                st.write("### Suggested Interview Questions and Answers:")
+                st.write(format_interview_questions(questions_and_answers))
+
+
+# -- Semantic Search --
+def semantic_search_dashboard():
     """
-    try:
-        response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[{
-                "role": "system",
-                "content": "You are an expert AI recruitment assistant."
-            }, {
-                "role": "user",
-                "content": prompt
-            }],
-            response_format={"type": "json_object"},
-        )
-        response_text = response.choices[0].message.content
-        return json.loads(response_text)  # Directly parse the JSON response
-    except Exception as e:
-        return {"error": f"Error parsing LLM output: {str(e)}"}
+    Shortlists the stored resumes closest to a job description with the local embedding index,
+    and can queue the shortlist for LLM scoring.
+    """
+    corpus = get_corpus()
+    st.write("### Shortlist stored resumes for a job description")
+    query = st.text_area("Job Description", height=200, key="search_job_description")
+    top_k = st.number_input("Number of resumes to shortlist", min_value=1, max_value=1000,
+                            value=SEARCH_TOP_K)
+    if st.button("Search", disabled=not query.strip()):
+        index = get_index()
+        with st.spinner("Indexing new resumes..."):
+            index.sync(corpus)
+        start = time.perf_counter()
+        hits = index.search(query, int(top_k))
+        st.session_state.shortlist = {
+            "query": query,
+            "hits": hits,
+            "searched": len(index),
+            "ms": (time.perf_counter() - start) * 1000
+        }
+        st.session_state.shortlist_job = None
+
+    shortlist = st.session_state.get("shortlist")
+    if not shortlist:
+        return
+    if not shortlist["hits"]:
+        st.info("No stored resumes yet. Resumes are indexed once they have been screened.")
+        return
+    st.caption(f"Searched {shortlist['searched']} resumes in {shortlist['ms']:.1f} ms")
+    st.dataframe(pd.DataFrame([{
+        "Rank": rank,
+        "File Name": corpus.file_name(key),
+        "Similarity": round(score, 3),
+        "Resume ID": key
+    } for rank, (key, score) in enumerate(shortlist["hits"], start=1)]), hide_index=True)
+    if st.button("Score the shortlist with the LLM", type="primary"):
+        files = []
+        for key, _ in shortlist["hits"]:
+            text = corpus.get_text(key)
+            if text is not None:
+                files.append(StoredFile(corpus.file_name(key) or f"{key}.txt", "text/plain",
+                                        text.encode("utf-8")))
+        store = get_job_store()
+        st.session_state.job_id = store.create_job(
+            st.session_state.user_info['email'], shortlist["query"], files, {
+                "top_k": 0,
+                "min_score": 0
+            })
+        st.session_state.shortlist_job = st.session_state.job_id
+        reset_results()
+        ensure_workers(store)
+        st.rerun()
+    if st.session_state.get("shortlist_job"):
+        st.success("The shortlist is being scored; follow its progress under Resume Analysis.")
+
+
+def stored_resume_files(corpus, uploaded_files):
+    """
+    Returns the corpus resumes (without near-duplicates) as text files for a job, skipping the
+    ones already in this upload.
+    """
+    uploaded = set()
+    for uploaded_file in uploaded_files:
+        text = corpus.text_for_file(file_hash(_read_bytes(uploaded_file)))
+        if text is not None:
+            uploaded.add(content_hash(text))
+    return [
+        StoredFile(file_name or f"{key}.txt", "text/plain", text.encode("utf-8"))
+        for key, file_name, text in corpus.list_resumes() if key not in uploaded
+    ]
+
+
+# -- Background Jobs --
+def reset_results():
+    """
+    Clears the state of the previously shown job from the session.
+    """
+    st.session_state.selected_candidate = None
 
 
-# - Parsing LLM Output -
-def parse_llm_output(output):
-    try:
-        if "error" in output:
-            return (0, "No", [], output["error"], "Unknown", "N/A")
-        # Ensure the output has the expected keys
-        fit_score = int(output.get("Fit Score", 0))
-        fit = output.get("Fit", "No")
-        matched_skills = output.get("Matched Skills", [])
-        explanation = output.get("Explanation", "No explanation provided.")
-        candidate_name = output.get("Candidate Name", "Unknown")
-        email = output.get("Email", "N/A")
-        return (fit_score, fit, matched_skills, explanation, candidate_name,
-                email)
-    except Exception as e:
-        st.error(f"Error parsing output: {e}")
-        return 0, "No", [], f"Error parsing output: {e}", "Unknown", "N/A"
+def cached_results(store, job_id):
+    """
+    Returns the job's ranked results frame, cached per session; each call only reads the
+    results finished since the previous one.
+    """
+    return get_frame_cache().update(
+        current_session_id(), job_id,
+        lambda frame: append_results(frame, store.get_results(
+            job_id, after=frame.attrs["seq"] if frame is not None else 0)))
+
+
+def file_status_frame(store, job_id):
+    return pd.DataFrame(store.file_statuses(job_id),
+                        columns=["File", "Status", "Error"])
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress(job_id):
+    """
+    Shows the progress and partial ranking of a running job, refreshed every JOB_POLL_INTERVAL
+    seconds without rerunning the rest of the page.
+    """
+    store = get_job_store()
+    job = store.get_job(job_id)
+    if job["status"] not in JOB_ACTIVE_STATUSES:
+        # Finished: rerun the whole page to load the results and the interview section
+        st.rerun(scope="app")
+    total = max(1, job["total"])
+    label = ("Waiting for a worker..." if job["status"] == "queued" else
+             f"Analyzed {job['completed']} of {job['total']} resumes")
+    st.progress(job["completed"] / total, text=label)
+    with st.expander("File status"):
+        st.dataframe(file_status_frame(store, job_id))
+    previews = store.previews(job_id)
+    if previews:
+        # Name and score streamed in before the rest of the analysis
+        st.write("#### Scoring now")
+        st.dataframe(pd.DataFrame(previews, columns=["File", "Candidate Name", "Fit Score"]),
+                     hide_index=True)
+    results = cached_results(store, job_id)
+    if len(results):
+        st.subheader("Ranked Candidates")
+        st.dataframe(results, height=400, hide_index=True)
+
+
+def job_controls(store, job):
+    """
+    Shows the job's status, its file errors and cancel/resume actions.
+    """
+    if job["status"] in JOB_ACTIVE_STATUSES:
+        if st.button("Cancel job"):
+            store.cancel_job(job["id"])
+            st.rerun()
+        return
+    statuses = file_status_frame(store, job["id"])
+    errors = statuses[statuses["Error"].notna()]
+    with st.expander(f"File status ({len(errors)} with errors)"):
+        st.dataframe(statuses)
+    if job["status"] in ("cancelled", "failed"):
+        message = f"This job was {job['status']} after {job['completed']} of {job['total']} resumes."
+        if job["error"]:
+            message += f" Error: {job['error']}"
+        st.warning(message)
+        if st.button("Resume job"):
+            store.resume_job(job["id"])
+            ensure_workers(store)
+            st.rerun()
+    stats = job["stats"]
+    if stats:
+        st.caption(f"Analysis cache: {stats.get('cache_hits', 0)} hits, "
+                   f"{stats.get('cache_misses', 0)} misses | Prompt tokens: "
+                   f"{stats.get('tokens_before', 0)} before compaction, "
+                   f"{stats.get('tokens_after', 0)} after")
 
 
 # -- Generate Interview Questions --
-def generate_interview_questions_and_answers(jd, resume_text, matched_skills):
+def interview_questions(jd, resume_text, matched_skills):
     """
     Generates basic interview questions and answers based on the matched skills from the resume and job description.
 
@@ -226,60 +340,62 @@ def generate_interview_questions_and_answers(jd, resume_text, matched_skills):
         matched_skills (list): A list of skills matched between the resume and job description.
 
     Returns:
-        str: Formatted string containing questions and suggested answers.
-    """
-    prompt = f"""
-    You are an AI recruitment assistant tasked with generating phone interview questions and suggested answers for the TA team to assess a candidate's suitability based on the job description, the candidate's resume, and the matched skills.
-
-    ### Job Description:
-    {jd}
-
-    ### Resume:
-    {resume_text}
-
-    ### Matched Skills:
-    {', '.join(matched_skills)}
-
-     **Instructions:**
-    - Generate 10 basic interview questions specifically focused on the **project skills** mentioned in the candidate's resume.
-    - Focus on the skills that the candidate has used in their projects, as described in their resume.
-    - Ensure that the questions are straightforward and relevant to the practical application of these skills in real-world projects.
-    - Provide clear and concise suggested answers for each question.
-    - Avoid complex or advanced questions; focus on fundamental concepts and practical applications related to the project skills.
-
-    ### Output Format (JSON):
-    {{
-        "questions": [
-            {{
-                question: "Question 1",
-                "answer": "Suggested answer for Question 1"
-            }},
-            {{
-                question: "Question 1",
-                "answer": "Suggested answer for Question 2"
-            }},
-            ...
-        ]
-    }}
+        list: {"question", "answer"} dictionaries.
+
+    Raises:
+        ValueError: If no valid questions were generated.
     """
-    try:
-        response = client.chat.completions.create(
-            model="o3-mini",
-            messages=[{
-                "role": "system",
-                "content": "You are an expert AI recruitment assistant."
-            }, {
-                "role": "user",
-                "content": prompt
-            }],
+    jd = compact_text(jd, JD_TOKEN_BUDGET)
+    resume_text = compact_text(resume_text, RESUME_TOKEN_BUDGET)
+    cache_key = make_cache_key("interview", LLM_MODEL,
+                               INTERVIEW_PROMPT_VERSION, jd, resume_text,
+                               "\n".join(matched_skills))
+    questions_and_answers = get_cache().get(cache_key)
+    if questions_and_answers is None:
+        response = get_client().chat_completion(
+            model=LLM_MODEL,
+            messages=interview_messages(jd, resume_text, matched_skills),
             response_format={"type": "json_object"},
         )
-        response_json = json.loads(response.choices[0].message.content)
-        questions_and_answers = response_json.get("questions", [])
-        formatted_output = []
-        for i, qa in enumerate(questions_and_answers):
-            formatted_output.append(f"**{i+1}. {qa['question']}**\n")
-            formatted_output.append(f"Suggested Answer: {qa['answer']}\n\n")
-        return "\n".join(formatted_output)
+        # Malformed entries are skipped instead of failing the whole answer
+        questions_and_answers = validate_questions(
+            loads_lenient(response.choices[0].message.content))
+        if not questions_and_answers:
+            raise ValueError("No interview questions were generated. Please try again.")
+        get_cache().set(cache_key, questions_and_answers)
+    return questions_and_answers
+
+
+def candidate_interview_questions(job_id, file_index, jd):
+    """
+    Generates the interview questions of a scored candidate, reading its resume and matched
+    skills from the job store (run by the prefetcher).
+    """
+    task = get_job_store().get_task(job_id, file_index)
+    matched_skills = (task["result"] or {}).get("Matched Skills") if task else None
+    if not task or not task["resume_text"] or not matched_skills:
+        raise ValueError("No matched skills found for this candidate.")
+    return interview_questions(jd, task["resume_text"], matched_skills)
+
+
+def format_interview_questions(questions_and_answers):
+    formatted_output = []
+    for i, qa in enumerate(questions_and_answers):
+        formatted_output.append(f"**{i+1}. {qa['question']}**\n")
+        formatted_output.append(f"Suggested Answer: {qa['answer']}\n\n")
+    return "\n".join(formatted_output)
+
+
+def generate_interview_questions_and_answers(jd, resume_text, matched_skills):
+    """
+    Generates interview questions and answers for a candidate (see `interview_questions`).
+
+    Returns:
+        str: Formatted string containing questions and suggested answers.
+    """
+    try:
+        return format_interview_questions(interview_questions(jd, resume_text, matched_skills))
+    except ValueError as e:
+        return str(e)
     except Exception as e:
         return f"Error generating interview questions and answers: {str(e)}"
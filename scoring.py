@@ -0,0 +1,590 @@
+"""
+Resume scoring pipeline: extraction through the corpus, local pre-filtering and concurrent
+(optionally batched and streamed) LLM analysis, and the ranked-table rows built from it.
+
+Nothing here imports Streamlit, so the job workers (jobs.py) score resumes without loading the
+dashboard; the dashboard in resume_analysis.py starts and displays the jobs.
+"""
+import hashlib
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import metrics
+from cache import get_cache, make_cache_key
+from compaction import (JD_TOKEN_BUDGET, RESUME_TOKEN_BUDGET, compact_text, compaction_stats,
+                        count_tokens)
+from corpus import content_hash, file_hash, get_corpus
+from llm_client import get_client
+from prefilter import rank_resumes
+from prompts import ANALYSIS_TEMPLATE, analysis_messages, batch_analysis_messages, template_key
+from skills import check_matched_skills, get_skill_matcher, skill_coverage
+from structured_output import (ANALYSIS_FIELDS, Analysis, StreamingJSONParser, loads_lenient,
+                               merge_fields, preview_listener, validate_analysis)
+from utils import _read_bytes, extract_texts
+
+# Maximum number of resumes scored concurrently and per-request LLM timeout (seconds)
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", "8"))
+LLM_REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "120"))
+# Stream analysis responses and parse them as they arrive (names and scores are shown before a
+# response is complete), and how many times invalid fields are asked for again
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "1") == "1"
+ANALYSIS_MAX_REASKS = int(os.environ.get("ANALYSIS_MAX_REASKS", "1"))
+
+# Batched scoring: several resumes per request, sized by their compacted token count
+LLM_BATCH_SCORING = os.environ.get("LLM_BATCH_SCORING", "1") == "1"
+BATCH_TOKEN_BUDGET = int(os.environ.get("BATCH_TOKEN_BUDGET", "12000"))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "8"))
+
+# Model and analysis prompt template version (see prompts.py); cached results are keyed by both
+LLM_MODEL = "o3-mini"
+ANALYSIS_PROMPT_VERSION = template_key(ANALYSIS_TEMPLATE)
+
+
+# -- Ranked Table Rows --
+def build_result_row(file_name, analysis, local_score=None, resume_id=None,
+                     duplicate_of=None, jd_skills=None, resume_skills=None):
+    """
+    Builds the ranked-table row for a scored or pre-filtered resume.
+
+    Args:
+        file_name (str): Name of the uploaded file.
+        analysis (dict): The LLM analysis, or None if the resume was pre-filtered.
+        local_score (float): Local pre-filter score, or None without a pre-filter.
+        resume_id (str): The resume's corpus key (content hash).
+        duplicate_of (str): File name of an earlier resume this one nearly duplicates.
+        jd_skills (list): Canonical skills of the job description (see skills.py).
+        resume_skills (list): Canonical skills of the resume; the LLM's matched skills that
+            it does not mention are dropped.
+
+    Returns:
+        dict: Candidate Name, Email, Fit Score, Fit, Matched Skills and Explanation, plus Skill
+        Coverage and Missing Skills when the JD has known skills, Status and Local Score when
+        the pre-filter was used, Resume ID and Duplicate Of.
+    """
+    if analysis is None:
+        # Pre-filtered: not sent to the LLM
+        result = {
+            "Candidate Name": file_name,
+            "Email": "N/A",
+            "Fit Score": 0,
+            "Fit": "No",
+            "Matched Skills": [],
+            "Explanation": "Pre-filtered: low local match with the job description.",
+            "Status": "Pre-filtered",
+        }
+    else:
+        fit_score, fit, skills, explanation, name, email = parse_llm_output(
+            analysis, resume_skills=resume_skills)
+        result = {
+            "Candidate Name": name,
+            "Email": email,
+            "Fit Score": fit_score,
+            "Fit": fit,
+            "Matched Skills": skills,
+            "Explanation": explanation,
+        }
+    if jd_skills and resume_skills is not None:
+        coverage, missing = skill_coverage(jd_skills, resume_skills)
+        result["Skill Coverage"] = round(coverage, 1)
+        result["Missing Skills"] = missing
+    if local_score is not None:
+        result.setdefault("Status", "Scored")
+        result["Local Score"] = round(local_score, 1)
+    if resume_id is not None:
+        result["Resume ID"] = resume_id
+    if duplicate_of is not None:
+        result["Duplicate Of"] = duplicate_of
+    return result
+
+
+# -- Concurrent Scoring --
+def score_resumes(jd,
+                  uploaded_files,
+                  max_in_flight=MAX_CONCURRENT_REQUESTS,
+                  timeout=LLM_REQUEST_TIMEOUT,
+                  top_k=0,
+                  min_score=0,
+                  batch_scoring=LLM_BATCH_SCORING,
+                  on_partial=None):
+    """
+    Extracts resumes in worker processes and scores them on a bounded thread pool.
+
+    At most `max_in_flight` batches are submitted at a time. Closing the generator cancels the
+    batches not started yet and does not wait for the running ones.
+
+    Without a pre-filter, a resume is queued for scoring as soon as its text is extracted, and
+    its batch is sent once it is full or extraction is done. With a
+    pre-filter (`top_k` or `min_score`), every resume is extracted and ranked locally first and
+    only the selected ones are sent to the LLM.
+
+    Every resume goes into the persistent corpus: files extracted before are not parsed again,
+    and resumes already scored against this JD version reuse the stored analysis.
+
+    Args:
+        jd (str): The job description.
+        uploaded_files (list): Uploaded resume files.
+        max_in_flight (int): Maximum number of LLM requests running at the same time.
+        timeout (float): Timeout in seconds for each LLM request.
+        top_k (int): Send at most this many resumes to the LLM (0 = no limit).
+        min_score (float): Minimum local score, relative to the best resume, from 0 to 100.
+        batch_scoring (bool): Score several resumes per LLM request, up to BATCH_TOKEN_BUDGET
+            compacted resume tokens and MAX_BATCH_SIZE resumes per batch.
+        on_partial (callable): Called from the scoring threads as
+            on_partial(uploaded_file, {"Candidate Name", "Fit Score"}) as soon as a resume's
+            name and score have streamed in, before its analysis is complete.
+
+    Yields:
+        tuple: (uploaded_file, resume_text, analysis, error, local_score) in completion order.
+        `error` is the exception raised while processing the file, or None on success.
+        `analysis` is None for pre-filtered resumes. `local_score` is None without a pre-filter.
+    """
+    prefilter = bool(top_k or min_score)
+    corpus = get_corpus()
+    jd_key = jd_version_key(jd)
+    # Small drives use smaller batches so every request slot is used
+    batch_size = MAX_BATCH_SIZE if batch_scoring else 1
+    batch_size = max(1, min(batch_size, math.ceil(len(uploaded_files) / max(1, max_in_flight))))
+    # Streamlit calls are only made by the caller, on the script thread
+    executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight))
+    closed = False
+    try:
+        futures = {}  # future -> {resume_id: (uploaded_file, resume_text, local_score)}
+        batch = {}
+        batch_tokens = 0
+
+        def collect(future):
+            items = futures.pop(future)
+            try:
+                analyses, error = future.result(), None
+            except Exception as e:
+                analyses, error = {}, e
+            for resume_id, (_, resume_text, _) in items.items():
+                analysis = analyses.get(resume_id)
+                if analysis is not None and "error" not in analysis:
+                    corpus.save_score(jd_key, content_hash(resume_text), analysis)
+            return [(uploaded_file, resume_text, analyses.get(resume_id),
+                     error, local_score) for resume_id,
+                    (uploaded_file, resume_text, local_score) in items.items()]
+
+        def flush():
+            nonlocal batch, batch_tokens
+            if batch:
+                # At most max_in_flight batches are submitted and unfinished at a time, so
+                # nothing piles up in the executor's queue that a cancelled job would still pay for
+                while len(futures) >= max(1, max_in_flight):
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        ready.extend(collect(future))
+                future = executor.submit(
+                    analyze_resumes_batch, jd,
+                    {resume_id: item[1] for resume_id, item in batch.items()},
+                    timeout,
+                    (lambda resume_id, preview, items=batch: on_partial(items[resume_id][0], preview))
+                    if on_partial else None)
+                futures[future] = batch
+            batch, batch_tokens = {}, 0
+
+        ready = []  # results that need no LLM call, yielded by the loops below
+
+        def submit(uploaded_file, resume_text, local_score=None):
+            nonlocal batch_tokens
+            stored = corpus.get_score(jd_key, content_hash(resume_text))
+            if stored is not None:
+                metrics.increment("corpus", result="score_reused")
+                ready.append((uploaded_file, resume_text, stored, None, local_score))
+                return
+            tokens = count_tokens(compact_text(resume_text, RESUME_TOKEN_BUDGET))
+            if batch and (batch_tokens + tokens > BATCH_TOKEN_BUDGET
+                          or len(batch) >= batch_size):
+                flush()
+            resume_id = make_resume_id(resume_text)
+            if resume_id in batch:
+                # Identical files in the same batch
+                resume_id = f"{resume_id}-{len(batch)}"
+            batch[resume_id] = (uploaded_file, resume_text, local_score)
+            batch_tokens += tokens
+            if len(batch) >= batch_size:
+                flush()
+
+        def drain():
+            while ready:
+                yield ready.pop(0)
+            for future in [f for f in futures if f.done()]:
+                yield from collect(future)
+
+        extracted = []
+        for uploaded_file, resume_text, error in extract_with_corpus(corpus, uploaded_files):
+            if error is not None:
+                yield uploaded_file, None, None, error, None
+            elif prefilter:
+                extracted.append((uploaded_file, resume_text))
+            else:
+                submit(uploaded_file, resume_text)
+            yield from drain()
+
+        if extracted:
+            scores, keep = rank_resumes(jd, [text for _, text in extracted],
+                                        top_k=top_k,
+                                        min_score=min_score)
+            for (uploaded_file, resume_text), score, selected in zip(
+                    extracted, scores, keep):
+                if selected:
+                    submit(uploaded_file, resume_text, float(score))
+                else:
+                    yield uploaded_file, resume_text, None, None, float(score)
+        flush()
+        yield from drain()
+        for future in as_completed(list(futures)):
+            yield from collect(future)
+    except GeneratorExit:
+        # Closed by the caller (e.g. the job was cancelled): drop the queued batches and return
+        # without waiting for the requests already running
+        closed = True
+        raise
+    finally:
+        executor.shutdown(wait=not closed, cancel_futures=closed)
+
+
+def extract_with_corpus(corpus, uploaded_files):
+    """
+    Yields (uploaded_file, text, error) for every file, adding new resumes to the corpus.
+
+    Files whose exact bytes were extracted before are served from the corpus first; the rest
+    are extracted in parallel and yielded in completion order.
+    """
+    to_extract = []
+    for uploaded_file in uploaded_files:
+        digest = file_hash(_read_bytes(uploaded_file))
+        text = corpus.text_for_file(digest)
+        if text is None:
+            to_extract.append((uploaded_file, digest))
+        else:
+            metrics.increment("corpus", result="file_reused")
+            corpus.add_resume(text, uploaded_file.name, digest)
+            yield uploaded_file, text, None
+    for index, _, text, error in extract_texts([item[0] for item in to_extract]):
+        uploaded_file, digest = to_extract[index]
+        if error is None:
+            corpus.add_resume(text, uploaded_file.name, digest)
+        yield uploaded_file, text, error
+
+
+# -- LLM Analysis --
+def build_analysis_prompt(jd, resume_text):
+    """
+    Builds the resume analysis request from a compacted job description and resume.
+
+    Returns:
+        tuple: (messages, stats) where stats holds the resume and JD token counts before and
+        after compaction.
+    """
+    with metrics.span("compaction"):
+        compact_jd = compact_text(jd, JD_TOKEN_BUDGET)
+        compact_resume = compact_text(resume_text, RESUME_TOKEN_BUDGET)
+    stats = {
+        "tokens_before": count_tokens(jd) + count_tokens(resume_text),
+        "tokens_after": count_tokens(compact_jd) + count_tokens(compact_resume),
+    }
+    compaction_stats.record(stats["tokens_before"], stats["tokens_after"])
+    metrics.increment("prompt_tokens", stats["tokens_after"], prompt="analysis")
+    return analysis_messages(compact_jd, compact_resume, get_skill_matcher().extract(jd)), stats
+
+
+def jd_version_key(jd):
+    """
+    Identifies a JD version: its normalized text plus the model, prompt version, skills taxonomy
+    and budgets, so stored scores are only reused when they would be produced the same way.
+    """
+    return make_cache_key("jd", LLM_MODEL, ANALYSIS_PROMPT_VERSION, get_skill_matcher().key,
+                          RESUME_TOKEN_BUDGET, JD_TOKEN_BUDGET, jd)
+
+
+def analysis_cache_key(jd, resume_text):
+    """
+    Returns the cache key of a single resume analysis, shared by single and batched scoring.
+    """
+    return make_cache_key("analysis", LLM_MODEL, ANALYSIS_PROMPT_VERSION,
+                          get_skill_matcher().key, RESUME_TOKEN_BUDGET, JD_TOKEN_BUDGET, jd,
+                          resume_text)
+
+
+def analyze_resume_with_jd(jd, resume_text, timeout=LLM_REQUEST_TIMEOUT, on_partial=None):
+    """
+    Scores one resume against the job description.
+
+    The response is validated against the analysis schema; fields that cannot be repaired are
+    asked for again (only those fields), up to ANALYSIS_MAX_REASKS times.
+
+    Args:
+        on_partial (callable): Called with {"Candidate Name", "Fit Score"} as soon as both have
+            streamed in, before the analysis is complete.
+
+    Returns:
+        dict: The analysis, or {"error": ...} if it failed.
+    """
+    if not resume_text.strip():
+        return {"error": "Resume text is empty."}
+    cache_key = analysis_cache_key(jd, resume_text)
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        return cached
+    messages, _ = build_analysis_prompt(jd, resume_text)
+    try:
+        with metrics.span("score", mode="single"):
+            response_text = request_json(
+                messages, timeout, preview_listener(on_partial) if on_partial else None)
+        with metrics.span("parse", mode="single"):
+            values, invalid = validate_analysis(loads_lenient(response_text))
+        for _ in range(ANALYSIS_MAX_REASKS if invalid else 0):
+            reply = reask_invalid_fields(messages, response_text, {None: invalid}, timeout)
+            values, invalid = merge_fields(values, invalid, reply.get(None))
+            if not invalid:
+                break
+        # Still-invalid fields fall back to their defaults; an unusable score is an error
+        analysis = Analysis.from_values(values).to_dict()
+        get_cache().set(cache_key, analysis)
+        return analysis
+    except Exception as e:
+        return {"error": f"Error parsing LLM output: {str(e)}"}
+
+
+def request_json(messages, timeout=LLM_REQUEST_TIMEOUT, on_field=None):
+    """
+    Sends a JSON-mode request and returns the response text.
+
+    With LLM_STREAMING the response is streamed and parsed incrementally, and
+    `on_field(path, value)` is called for every value as soon as it is complete (see
+    `StreamingJSONParser`).
+    """
+    if not LLM_STREAMING:
+        response = get_client().chat_completion(
+            model=LLM_MODEL,
+            messages=messages,
+            response_format={"type": "json_object"},
+            timeout=timeout,
+        )
+        return response.choices[0].message.content
+    parser = StreamingJSONParser()
+    chunks = []
+    for content in get_client().chat_completion_stream(
+            model=LLM_MODEL,
+            messages=messages,
+            response_format={"type": "json_object"},
+            timeout=timeout,
+    ):
+        chunks.append(content)
+        if on_field is not None:
+            for path, value in parser.feed(content):
+                on_field(path, value)
+    return "".join(chunks)
+
+
+def reask_invalid_fields(messages, response_text, invalid, timeout=LLM_REQUEST_TIMEOUT):
+    """
+    Asks the model for only the fields of its previous answer that failed validation, instead
+    of repeating the whole analysis.
+
+    Args:
+        messages (list): The original request.
+        response_text (str): The model's answer.
+        invalid (dict): Resume ID (None for a single-resume answer) -> invalid field names.
+
+    Returns:
+        dict: Resume ID (or None) -> the reply's raw values for that resume.
+    """
+
+    def describe(fields):
+        return ", ".join(f'"{name}" ({ANALYSIS_FIELDS[name].description})' for name in fields)
+
+    if list(invalid) == [None]:
+        request = (f"These fields of your answer were missing or invalid: {describe(invalid[None])}. "
+                   "Reply with a JSON object containing only these fields, corrected.")
+    else:
+        listing = "\n".join(f"- {resume_id}: {describe(fields)}"
+                            for resume_id, fields in invalid.items())
+        request = ("These fields of your answer were missing or invalid:\n"
+                   f"{listing}\n"
+                   'Reply with {"results": [...]} holding one object per resume listed, with its '
+                   '"Resume ID" and only these fields, corrected.')
+    metrics.increment("analysis_reasks", sum(len(fields) for fields in invalid.values()))
+    response = get_client().chat_completion(
+        model=LLM_MODEL,
+        messages=messages + [{
+            "role": "assistant",
+            "content": response_text
+        }, {
+            "role": "user",
+            "content": request
+        }],
+        response_format={"type": "json_object"},
+        timeout=timeout,
+    )
+    output = loads_lenient(response.choices[0].message.content)
+    if list(invalid) == [None]:
+        return {None: output}
+    entries = output.get("results") if isinstance(output, dict) else output
+    return {
+        str(entry.get("Resume ID", "")).strip(): entry
+        for entry in (entries if isinstance(entries, list) else [])
+        if isinstance(entry, dict)
+    }
+
+
+# -- Batched LLM Analysis --
+def make_resume_id(resume_text):
+    """
+    Returns a stable ID for a resume, derived from its content.
+    """
+    return "R" + hashlib.sha256(resume_text.encode("utf-8")).hexdigest()[:10]
+
+
+def build_batch_analysis_prompt(jd, resume_texts):
+    """
+    Builds one analysis request that scores several resumes against the same job description.
+
+    Args:
+        jd (str): The job description.
+        resume_texts (dict): Resume ID -> resume text.
+    """
+    jd_skills = get_skill_matcher().extract(jd)
+    with metrics.span("compaction"):
+        jd = compact_text(jd, JD_TOKEN_BUDGET)
+        resume_texts = {resume_id: compact_text(resume_text, RESUME_TOKEN_BUDGET)
+                        for resume_id, resume_text in resume_texts.items()}
+    return batch_analysis_messages(jd, resume_texts, jd_skills)
+
+
+def analyze_resumes_batch(jd, resume_texts, timeout=LLM_REQUEST_TIMEOUT, on_partial=None):
+    """
+    Scores several resumes against the job description in a single LLM request.
+
+    Cached resumes are not sent. Entries of the batched response with invalid fields have only
+    those fields asked for again; resumes still missing or unusable are re-scored one at a time
+    with `analyze_resume_with_jd`.
+
+    Args:
+        jd (str): The job description.
+        resume_texts (dict): Resume ID -> resume text.
+        timeout (float): Timeout in seconds for each LLM request.
+        on_partial (callable): Called as on_partial(resume_id, {"Candidate Name", "Fit Score"})
+            as soon as a resume's name and score have streamed in.
+
+    Returns:
+        dict: Resume ID -> analysis dictionary, as returned by `analyze_resume_with_jd`.
+    """
+    analyses = {}
+    pending = {}
+    for resume_id, resume_text in resume_texts.items():
+        cached = get_cache().get(analysis_cache_key(jd, resume_text)) if resume_text.strip() else None
+        if cached is not None:
+            analyses[resume_id] = cached
+        elif resume_text.strip():
+            pending[resume_id] = resume_text
+
+    def on_preview(fields):
+        resume_id = str(fields.get("Resume ID", "")).strip()
+        if resume_id in pending:
+            on_partial(resume_id, {name: fields[name] for name in ("Candidate Name", "Fit Score")})
+
+    if len(pending) > 1:
+        try:
+            messages = build_batch_analysis_prompt(jd, pending)
+            metrics.increment("prompt_tokens",
+                              sum(count_tokens(message["content"]) for message in messages),
+                              prompt="batch")
+            with metrics.span("score", mode="batch", resumes=len(pending)):
+                response_text = request_json(
+                    messages, timeout,
+                    preview_listener(on_preview, require_id=True) if on_partial else None)
+            with metrics.span("parse", mode="batch"):
+                valid, partial = _validate_batch_output(loads_lenient(response_text),
+                                                        list(pending))
+            if partial and ANALYSIS_MAX_REASKS:
+                try:
+                    replies = reask_invalid_fields(
+                        messages, response_text,
+                        {resume_id: invalid for resume_id, (_, invalid) in partial.items()},
+                        timeout)
+                except Exception as e:
+                    print(f"Re-asking invalid fields failed: {e}")
+                    replies = {}
+                for resume_id, (values, invalid) in partial.items():
+                    values, invalid = merge_fields(values, invalid, replies.get(resume_id))
+                    try:
+                        valid[resume_id] = Analysis.from_values(values).to_dict()
+                    except ValueError:
+                        # Unusable score: scored again on its own below
+                        pass
+            for resume_id, analysis in valid.items():
+                get_cache().set(analysis_cache_key(jd, pending.pop(resume_id)),
+                                analysis)
+                analyses[resume_id] = analysis
+        except Exception as e:
+            print(f"Batched analysis failed, falling back to per-resume calls: {e}")
+    for resume_id, resume_text in resume_texts.items():
+        if resume_id not in analyses:
+            analyses[resume_id] = analyze_resume_with_jd(
+                jd, resume_text, timeout,
+                on_partial=(lambda preview, resume_id=resume_id: on_partial(resume_id, preview))
+                if on_partial else None)
+    return analyses
+
+
+# - Parsing LLM Output -
+def _validate_batch_output(output, resume_ids):
+    """
+    Validates a batched response and splits it into per-resume analyses.
+
+    Entries with an unknown or duplicate ID are dropped, so the caller can re-score those
+    resumes individually.
+
+    Returns:
+        tuple: (valid, partial) where valid maps resume IDs to analysis dictionaries and partial
+        maps resume IDs to (values, invalid field names) for entries that failed validation.
+    """
+    entries = output.get("results") if isinstance(output, dict) else output
+    if not isinstance(entries, list):
+        raise ValueError("Batched output does not contain a results array.")
+    expected = set(resume_ids)
+    valid, partial = {}, {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        resume_id = str(entry.get("Resume ID", "")).strip()
+        if resume_id not in expected or resume_id in valid or resume_id in partial:
+            continue
+        values, invalid = validate_analysis(entry)
+        if invalid:
+            partial[resume_id] = (values, invalid)
+        else:
+            valid[resume_id] = Analysis.from_values(values).to_dict()
+    return valid, partial
+
+
+def parse_llm_output(output, resume_ids=None, resume_skills=None):
+    """
+    Parses an analysis response into (fit_score, fit, matched_skills, explanation, name, email).
+
+    With `resume_skills` (the canonical skills found locally in the resume), matched skills the
+    skills taxonomy knows but the resume does not mention are dropped.
+
+    With `resume_ids`, `output` is a batched response instead: it is validated and split into
+    a dictionary of resume ID -> analysis dictionary, containing only the valid entries.
+    """
+    if resume_ids is not None:
+        return _validate_batch_output(output, resume_ids)[0]
+    try:
+        if "error" in output:
+            return (0, "No", [], output["error"], "Unknown", "N/A")
+        # Stored analyses are validated again; fields that are still invalid get defaults
+        values, _ = validate_analysis(output)
+        analysis = Analysis.from_values(values, lenient=True)
+        matched_skills = analysis.matched_skills
+        if resume_skills is not None:
+            matched_skills = check_matched_skills(matched_skills, resume_skills)
+        return (analysis.fit_score, analysis.fit, matched_skills,
+                analysis.explanation, analysis.candidate_name, analysis.email)
+    except Exception as e:
+        print(f"Error parsing output: {e}")
+        return 0, "No", [], f"Error parsing output: {e}", "Unknown", "N/A"
@@ -0,0 +1,352 @@
+"""
+Memory-bounded result views for dashboard sessions.
+
+A session only keeps the ID of the job it shows. A job's ranked results are loaded from the
+job store into a compact columnar DataFrame (small integer and categorical dtypes, skills joined
+into one string), extended with only the newly finished results while the job runs and held in
+a process-wide LRU cache with a total byte budget and a per-session byte budget; evicted frames
+are simply loaded again from the store. Resume texts and full result rows are never kept in the
+session: they are read from the store by file index when a candidate is selected, and the CSV
+export is generated from the store, batch by batch, only when the download button is clicked.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+
+SESSION_CACHE_MAX_BYTES = int(os.environ.get("SESSION_CACHE_MAX_MB", "256")) * 1024 * 1024
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_MB", "32")) * 1024 * 1024
+# Results read from the store per batch while writing a CSV export
+CSV_BATCH_SIZE = 500
+
+RESULT_COLUMNS = ["Candidate Name", "Email", "Fit Score", "Fit", "Matched Skills", "Skill Coverage",
+                  "Missing Skills", "Explanation", "Status", "Local Score", "Resume ID",
+                  "Duplicate Of"]
+
+
+def _csv_value(column, value):
+    if column in ("Matched Skills", "Missing Skills") and isinstance(value, list):
+        return ", ".join(str(skill) for skill in value)
+    return value
+
+
+def _compact(frame):
+    import pandas as pd
+
+    if "Fit Score" in frame:
+        frame["Fit Score"] = pd.to_numeric(frame["Fit Score"], errors="coerce").fillna(0) \
+            .astype("int16")
+    for column in ("Skill Coverage", "Local Score"):
+        if column in frame:
+            frame[column] = frame[column].astype("float32")
+    for column in ("Fit", "Status", "Duplicate Of"):
+        if column in frame:
+            frame[column] = frame[column].astype("category")
+    return frame
+
+
+def results_frame(rows):
+    """
+    Builds the compact columnar frame of a job's ranked results.
+
+    Args:
+        rows (list): Rows from `JobStore.get_results` (rank order).
+
+    Returns:
+        pandas.DataFrame: One row per result, indexed by file index, with only the result
+        columns present in the job. `frame.attrs["seq"]` is the highest task `seq` it holds.
+    """
+    import pandas as pd
+
+    seq = max((row.get("seq") or 0 for row in rows), default=0)
+    rows = [row for row in rows if row["result"] is not None]
+    present = set()
+    for row in rows:
+        present.update(row["result"])
+    columns = [column for column in RESULT_COLUMNS if column in present]
+    data = {column: [_csv_value(column, row["result"].get(column)) for row in rows]
+            for column in columns}
+    frame = pd.DataFrame(data, index=pd.Index([row["file_index"] for row in rows],
+                                              dtype="int32", name="file_index"))
+    frame = _compact(frame)
+    frame.attrs["seq"] = seq
+    return frame
+
+
+def _rank_keys(frame):
+    """
+    Returns one int64 sort key per row of a results frame: Fit Score descending, then file
+    index ascending (the order `append_results` keeps).
+    """
+    import numpy as np
+
+    index = frame.index.to_numpy(dtype=np.int64)
+    if "Fit Score" not in frame:
+        return index
+    return -frame["Fit Score"].to_numpy(dtype=np.int64) * 2**32 + index
+
+
+def _align_categories(frame, new):
+    # Gives each categorical column the same categories in both frames so that concatenating
+    # them keeps the categorical dtype (only the category lists change, not the codes)
+    for column in frame.columns:
+        if frame[column].dtype == "category" and new[column].dtype == "category":
+            categories = frame[column].cat.categories.union(new[column].cat.categories)
+            frame[column] = frame[column].cat.set_categories(categories)
+            new[column] = new[column].cat.set_categories(categories)
+    return frame, new
+
+
+def append_results(frame, rows):
+    """
+    Adds newly finished results to a frame from `results_frame`, keeping the rank order.
+
+    Only the new rows are sorted; they are merged into the already ranked frame at the
+    positions found by a binary search over its sort keys, and the compact dtypes are kept
+    rather than recomputed. The frame is only compacted again when the new rows bring a
+    column it does not have yet.
+
+    Args:
+        frame (pandas.DataFrame): The frame built so far, or None.
+        rows (list): Rows from `JobStore.get_results(..., after=frame.attrs["seq"])`.
+
+    Returns:
+        pandas.DataFrame: `frame` itself when there is nothing new, else a new frame.
+    """
+    import numpy as np
+    import pandas as pd
+
+    new = results_frame(rows)
+    if frame is None:
+        return _sorted(new)
+    if not rows:
+        return frame
+    seq = max(frame.attrs["seq"], new.attrs["seq"])
+    if len(new):
+        new = _sorted(new[~new.index.duplicated(keep="last")])
+        # A task finished twice (e.g. by a worker that lost its claim) keeps its latest result
+        stale = frame.index.isin(new.index)
+        frame = frame[~stale] if stale.any() else frame.copy()
+        missing = [column for column in frame.columns if column not in new]
+        if set(new.columns) <= set(frame.columns) and not any(
+                frame[column].dtype.kind in "iub" for column in missing):
+            # Columns the new rows do not have (e.g. "Duplicate Of") are empty in the frame's dtype
+            new = new.reindex(columns=frame.columns).astype(
+                {column: frame[column].dtype for column in missing})
+            frame, new = _align_categories(frame, new)
+            # Final position of every new row: its insertion point among the old rows, shifted
+            # by the new rows placed before it
+            positions = (np.searchsorted(_rank_keys(frame), _rank_keys(new), side="right")
+                         + np.arange(len(new)))
+            is_new = np.zeros(len(frame) + len(new), dtype=bool)
+            is_new[positions] = True
+            order = np.empty(len(is_new), dtype=np.intp)
+            order[is_new] = np.arange(len(frame), len(is_new))
+            order[~is_new] = np.arange(len(frame))
+            frame = pd.concat([frame, new]).take(order)
+        else:
+            # A column seen for the first time: rebuild the dtypes once
+            combined = pd.concat([frame.astype({column: "object" for column in frame.columns
+                                                if frame[column].dtype == "category"}), new])
+            combined = combined[[column for column in RESULT_COLUMNS if column in combined]]
+            frame = _sorted(_compact(combined))
+    frame.attrs["seq"] = seq
+    return frame
+
+
+def _sorted(frame):
+    import numpy as np
+
+    return frame.take(np.argsort(_rank_keys(frame), kind="stable"))
+
+
+class FrameCache:
+    """
+    Thread-safe LRU cache of result frames, bounded in bytes overall and per session.
+
+    Args:
+        max_bytes (int): Total budget across sessions.
+        session_max_bytes (int): Budget of the frames loaded by one session; a frame larger
+            than this is returned without being cached.
+    """
+
+    def __init__(self, max_bytes=SESSION_CACHE_MAX_BYTES, session_max_bytes=SESSION_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.session_max_bytes = session_max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (session_id, key) -> (frame, size)
+        self._session_bytes = {}
+        self._total_bytes = 0
+
+    def get(self, session_id, key, loader):
+        """
+        Returns the cached frame for `key`, calling `loader()` to build it on a miss.
+        """
+        entry_key = (session_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+                metrics.increment("session_cache", result="hit")
+                return entry[0]
+        metrics.increment("session_cache", result="miss")
+        frame = loader()
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        if size > self.session_max_bytes:
+            return frame
+        with self._lock:
+            if entry_key not in self._entries:
+                self._entries[entry_key] = (frame, size)
+                self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + size
+                self._total_bytes += size
+                self._evict(session_id)
+        return frame
+
+    def update(self, session_id, key, updater):
+        """
+        Replaces the cached frame for `key` with `updater(frame)`, where `frame` is None on a
+        miss, and returns the new frame.
+        """
+        entry_key = (session_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+        metrics.increment("session_cache", result="hit" if entry is not None else "miss")
+        frame = updater(entry[0] if entry is not None else None)
+        if entry is not None and frame is entry[0]:
+            return frame
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if entry_key in self._entries:
+                self._remove(entry_key, evicted=False)
+            if size <= self.session_max_bytes:
+                self._entries[entry_key] = (frame, size)
+                self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + size
+                self._total_bytes += size
+                self._evict(session_id)
+        return frame
+
+    def _evict(self, session_id):
+        # Called with the lock held: the session's own oldest frames first, then the oldest
+        # frames of any session
+        for entry_key in list(self._entries):
+            if self._session_bytes.get(session_id, 0) <= self.session_max_bytes:
+                break
+            if entry_key[0] == session_id:
+                self._remove(entry_key)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_key, evicted=True):
+        _, size = self._entries.pop(entry_key)
+        self._total_bytes -= size
+        self._session_bytes[entry_key[0]] -= size
+        if not self._session_bytes[entry_key[0]]:
+            del self._session_bytes[entry_key[0]]
+        if evicted:
+            metrics.increment("session_cache", result="evicted")
+
+    def discard_session(self, session_id):
+        """
+        Drops every frame loaded by a session.
+        """
+        with self._lock:
+            for entry_key in [key for key in self._entries if key[0] == session_id]:
+                self._remove(entry_key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes,
+                    "sessions": len(self._session_bytes)}
+
+
+_frame_cache = None
+_frame_cache_lock = threading.Lock()
+
+
+def get_frame_cache():
+    """
+    Returns the process-wide result frame cache, creating it on first use.
+    """
+    global _frame_cache
+    if _frame_cache is None:
+        with _frame_cache_lock:
+            if _frame_cache is None:
+                _frame_cache = FrameCache()
+    return _frame_cache
+
+
+def current_session_id():
+    """
+    Returns the ID of the Streamlit session running the script ("default" outside Streamlit).
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "default"
+
+
+def iter_csv(store, job_id, columns, batch_size=CSV_BATCH_SIZE):
+    """
+    Yields a job's ranked results as UTF-8 CSV chunks: the header, then one chunk per batch of
+    `batch_size` results read from the store, so only one batch is in memory at a time.
+
+    Args:
+        columns (list): CSV columns, in order.
+    """
+    import pandas as pd
+
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+    for batch in store.iter_results(job_id, batch_size):
+        # Object columns keep the values as they are: no "85.0" for a score next to a missing one
+        chunk = pd.DataFrame([[_csv_value(column, result.get(column)) for column in columns]
+                              for result in batch], columns=columns, dtype=object)
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
+
+
+class _ChunkStream(io.RawIOBase):
+    """
+    Read-only binary file over an iterator of byte chunks, pulled from it as it is read.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = b""
+        self._offset = 0
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        # st.download_button rewinds the file before reading it; that is all it supports
+        if (offset, whence) == (0, io.SEEK_SET) and self._position == 0:
+            return 0
+        raise io.UnsupportedOperation("seek")
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._chunk):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._chunk, self._offset = chunk, 0
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = memoryview(self._chunk)[self._offset:self._offset + size]
+        self._offset += size
+        self._position += size
+        return size
+
+
+def csv_export(store, job_id, columns):
+    """
+    Returns a callable for `st.download_button` that streams a job's ranked results as CSV
+    (see `iter_csv`) when the button is clicked.
+
+    Args:
+        columns (list): CSV columns, in order.
+    """
+    return lambda: _ChunkStream(iter_csv(store, job_id, columns))
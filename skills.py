@@ -0,0 +1,396 @@
+"""
+Local, deterministic skill extraction and matching.
+
+A taxonomy of canonical skills and their aliases (e.g. "k8s" -> Kubernetes) is compiled once
+into an Aho-Corasick automaton, so all the skills in a job description or resume are found in a
+single linear pass over its text, whatever the size of the taxonomy. Matches must stand on word
+boundaries ("java" is not found in "javascript"), and where matches overlap the longest wins
+("Spring Boot" is not also "Spring").
+
+The skills found feed the analysis prompt (the JD's required skills under canonical names), the
+ranked table (coverage of the JD's skills and the missing ones) and a sanity check of the LLM's
+"Matched Skills": a skill the taxonomy knows but that is not in the resume is dropped.
+
+Extra skills can be added with a JSON file at SKILLS_TAXONOMY_PATH: {"Canonical Name": ["alias",
+...]}; aliases of a canonical name already in SKILL_TAXONOMY are added to its own.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+
+import metrics
+
+SKILLS_TAXONOMY_PATH = os.environ.get("SKILLS_TAXONOMY_PATH", "")
+
+# Canonical skill -> aliases, matched case-insensitively along with the canonical name. Aliases
+# are only other spellings of the same skill; related tools (e.g. Keras and TensorFlow, GitHub and
+# Git, EKS and Kubernetes) are separate skills, so one does not count as having the other.
+SKILL_TAXONOMY = {
+    # Languages
+    "Python": ("python3", "python 3", "py3"),
+    "Java": ("java 8", "java 11", "java 17", "core java"),
+    "JavaScript": ("js", "ecmascript", "es6", "vanilla js"),
+    "TypeScript": (),
+    "C": ("c programming", "c language", "ansi c"),
+    "C++": ("cpp", "c/c++", "modern c++", "c++11", "c++14", "c++17", "c++20"),
+    "C#": ("c sharp", "csharp"),
+    "Go": ("golang", "go lang", "go programming"),
+    "Rust": ("rustlang",),
+    "Kotlin": (),
+    "Swift": (),
+    "Objective-C": ("objective c", "objc"),
+    "Ruby": (),
+    "PHP": (),
+    "Scala": (),
+    "R": ("r programming", "r language"),
+    "MATLAB": (),
+    "Perl": (),
+    "Bash": ("bash scripting",),
+    "Shell Scripting": ("shell script", "unix shell"),
+    "PowerShell": (),
+    "SQL": ("ansi sql",),
+    "T-SQL": ("tsql", "transact-sql"),
+    "PL/SQL": ("plsql",),
+    "HTML": ("html5",),
+    "CSS": ("css3",),
+    "Sass": ("scss",),
+    "Dart": (),
+    "Solidity": (),
+    # Frameworks and libraries
+    "React": ("react.js", "reactjs", "react js"),
+    "React Native": ("react-native",),
+    "Angular": (),
+    "AngularJS": ("angular.js", "angular js"),
+    "Vue.js": ("vue", "vuejs", "vue js"),
+    "Next.js": ("nextjs", "next js"),
+    "Node.js": ("node", "nodejs", "node js"),
+    "Express.js": ("expressjs", "express js"),
+    "Redux": (),
+    "jQuery": (),
+    "Tailwind CSS": ("tailwind", "tailwindcss"),
+    "Bootstrap": (),
+    "SwiftUI": (),
+    "Django": (),
+    "Django REST Framework": ("drf",),
+    "Flask": (),
+    "FastAPI": ("fast api",),
+    "Spring": ("spring framework",),
+    "Spring MVC": (),
+    "Spring Boot": ("springboot", "spring-boot"),
+    "Hibernate": (),
+    ".NET": ("dotnet", "dot net", ".net core"),
+    "ASP.NET": ("asp.net core", "asp.net mvc"),
+    "Ruby on Rails": ("rails", "ror"),
+    "Laravel": (),
+    "Flutter": (),
+    "GraphQL": (),
+    "REST APIs": ("rest api", "restful", "restful api", "restful apis", "rest services",
+                  "restful services"),
+    "gRPC": (),
+    "Microservices": ("microservice", "micro services", "micro-services"),
+    # Data and machine learning
+    "Machine Learning": ("ml", "machine-learning"),
+    "Deep Learning": ("deep-learning",),
+    "Natural Language Processing": ("nlp",),
+    "Computer Vision": (),
+    "OpenCV": (),
+    "Large Language Models": ("llm", "llms"),
+    "Generative AI": ("genai", "gen ai"),
+    "TensorFlow": ("tensor flow", "tf2"),
+    "Keras": (),
+    "PyTorch": ("torch",),
+    "scikit-learn": ("scikit learn", "sklearn", "sci-kit learn"),
+    "Pandas": (),
+    "NumPy": (),
+    "SciPy": (),
+    "Matplotlib": (),
+    "Seaborn": (),
+    "Tidyverse": (),
+    "RStudio": (),
+    "Hugging Face": ("huggingface",),
+    "LangChain": (),
+    "Apache Spark": ("spark",),
+    "PySpark": (),
+    "Spark SQL": (),
+    "Hadoop": ("apache hadoop",),
+    "HDFS": (),
+    "MapReduce": ("map reduce",),
+    "Apache Kafka": ("kafka",),
+    "Apache Airflow": ("airflow",),
+    "dbt": (),
+    "Snowflake": (),
+    "Databricks": (),
+    "ETL": (),
+    "ELT": (),
+    "Data Pipelines": ("data pipeline",),
+    "Data Analysis": ("data analytics",),
+    "Data Visualization": ("data visualisation",),
+    "Statistics": ("statistical analysis", "statistical modeling", "statistical modelling"),
+    "Tableau": (),
+    "Power BI": ("powerbi", "power-bi"),
+    "Excel": ("ms excel", "microsoft excel", "advanced excel"),
+    # Databases
+    "MySQL": (),
+    "PostgreSQL": ("postgres", "postgre sql", "psql"),
+    "Oracle Database": ("oracle db", "oracle sql", "oracle 19c"),
+    "SQL Server": ("mssql", "ms sql", "microsoft sql server"),
+    "SQLite": (),
+    "MongoDB": ("mongo", "mongo db"),
+    "Redis": (),
+    "Cassandra": ("apache cassandra",),
+    "Elasticsearch": ("elastic search",),
+    "OpenSearch": (),
+    "ELK Stack": ("elk",),
+    "DynamoDB": ("dynamo db",),
+    "NoSQL": ("no-sql",),
+    "Firebase": (),
+    "Firestore": ("cloud firestore",),
+    "BigQuery": ("big query",),
+    # Cloud and DevOps
+    "AWS": ("amazon web services",),
+    "Amazon EC2": ("ec2",),
+    "Amazon S3": ("s3",),
+    "AWS Lambda": ("lambda functions",),
+    "Azure": ("microsoft azure",),
+    "Azure DevOps": (),
+    "Google Cloud": ("gcp", "google cloud platform"),
+    "Docker": (),
+    "Docker Compose": ("docker-compose",),
+    "Containerization": ("containerisation",),
+    "Kubernetes": ("k8s",),
+    "Amazon EKS": ("eks",),
+    "Azure Kubernetes Service": ("aks",),
+    "Google Kubernetes Engine": ("gke",),
+    "OpenShift": (),
+    "Helm": (),
+    "Terraform": (),
+    "Infrastructure as Code": ("iac",),
+    "Ansible": (),
+    "Jenkins": (),
+    "CI/CD": ("ci cd", "ci-cd", "continuous integration", "continuous delivery",
+              "continuous deployment"),
+    "GitHub Actions": (),
+    "GitLab CI": ("gitlab ci/cd",),
+    "Git": (),
+    "GitHub": (),
+    "GitLab": (),
+    "Bitbucket": (),
+    "Linux": (),
+    "Unix": (),
+    "Ubuntu": (),
+    "Red Hat Enterprise Linux": ("rhel", "red hat linux"),
+    "CentOS": (),
+    "Nginx": (),
+    "Prometheus": (),
+    "Grafana": (),
+    "Serverless": (),
+    # Practices and testing
+    "Agile": ("agile methodology",),
+    "Scrum": (),
+    "Kanban": (),
+    "Unit Testing": ("unit tests", "unit test"),
+    "Test-Driven Development": ("test driven development", "tdd"),
+    "pytest": (),
+    "JUnit": (),
+    "Jest": (),
+    "Mocha": (),
+    "Selenium": (),
+    "Cypress": (),
+    "Object-Oriented Programming": ("oop", "oops", "object oriented programming"),
+    "Object-Oriented Design": ("object oriented design", "ood"),
+    "Data Structures and Algorithms": ("dsa", "data structures & algorithms"),
+    "Data Structures": (),
+    "Algorithms": (),
+    "System Design": (),
+    "Distributed Systems": (),
+    "Cybersecurity": ("cyber security", "information security", "infosec"),
+    "Networking": ("computer networks", "computer networking"),
+    "TCP/IP": (),
+    "Figma": (),
+    "UI/UX Design": ("ui/ux",),
+    "UI Design": ("user interface design",),
+    "UX Design": ("user experience", "user experience design"),
+    "Android": ("android development", "android sdk"),
+    "iOS": ("ios development",),
+    "Jira": (),
+    "Salesforce": (),
+    "SAP": (),
+    "Blockchain": (),
+    "Web3": (),
+}
+# Canonical names that are also common words or letters, only matched through their aliases
+AMBIGUOUS_SKILL_NAMES = frozenset({"C", "Go", "R"})
+
+# Characters that continue a word: a match must not be preceded or followed by one ("+" and "#"
+# only after a match, as they make "c++" and "c#" different names)
+_WORD_BEFORE = frozenset("abcdefghijklmnopqrstuvwxyz0123456789_")
+_WORD_AFTER = _WORD_BEFORE | frozenset("+#")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text):
+    return _WHITESPACE.sub(" ", text.lower())
+
+
+def load_taxonomy(path=SKILLS_TAXONOMY_PATH):
+    """
+    Returns SKILL_TAXONOMY extended with the skills of the JSON file at `path`, if any.
+    """
+    taxonomy = {skill: tuple(aliases) for skill, aliases in SKILL_TAXONOMY.items()}
+    if path:
+        try:
+            with open(path, encoding="utf-8") as handle:
+                extra = json.load(handle)
+            for skill, aliases in extra.items():
+                taxonomy[skill] = taxonomy.get(skill, ()) + tuple(aliases)
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            print(f"Error loading the skills taxonomy {path}: {e}")
+    return taxonomy
+
+
+class SkillMatcher:
+    """
+    Aho-Corasick matcher of a skills taxonomy.
+
+    Args:
+        taxonomy (dict): Canonical skill name -> aliases.
+    """
+
+    def __init__(self, taxonomy=SKILL_TAXONOMY):
+        self.skills = sorted(taxonomy, key=str.lower)
+        # Trie: one transition dict per state, the state's failure link and the (length, skill
+        # index) of every term ending there, including those of its failure chain
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        owners = {}  # term -> skill index; an alias shared by two skills goes to the first
+        for index, skill in enumerate(self.skills):
+            names = taxonomy[skill] if skill in AMBIGUOUS_SKILL_NAMES else (skill, *taxonomy[skill])
+            for term in {_normalize(name).strip() for name in names}:
+                if term and owners.setdefault(term, index) == index:
+                    self._add(term, index)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] += self._output[self._fail[child]]
+        # Identifies the taxonomy, so results computed with another one are not reused
+        self.key = hashlib.sha256(json.dumps(
+            [{skill: sorted(taxonomy[skill]) for skill in self.skills},
+             sorted(AMBIGUOUS_SKILL_NAMES)], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    def _add(self, term, index):
+        state = 0
+        for char in term:
+            child = self._goto[state].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[state][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = child
+        self._output[state] += ((len(term), index),)
+
+    def extract(self, text):
+        """
+        Returns the canonical skills mentioned in `text`, in order of first mention.
+        """
+        text = _normalize(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] and (end == len(text) or text[end] not in _WORD_AFTER):
+                for length, index in output[state]:
+                    start = end - length
+                    if start == 0 or text[start - 1] not in _WORD_BEFORE:
+                        matches.append((start, -length, index))
+        # Longest match first among overlapping ones
+        found = {}
+        covered = 0
+        for start, negative_length, index in sorted(matches):
+            if start >= covered:
+                found.setdefault(self.skills[index], None)
+                covered = start - negative_length
+        return list(found)
+
+    def verify(self, claimed, found):
+        """
+        Splits skills claimed for a resume (e.g. by the LLM) by whether the resume mentions them.
+
+        Args:
+            claimed (list): Skill names, as written by the claimant.
+            found (iterable): Canonical skills extracted from the resume.
+
+        Returns:
+            tuple: (kept, dropped). A claim is kept if the resume mentions one of the taxonomy
+            skills it names, or if it names none (it cannot be checked).
+        """
+        found = set(found)
+        kept, dropped = [], []
+        for skill in claimed:
+            named = self.extract(skill)
+            (kept if not named or found.intersection(named) else dropped).append(skill)
+        return kept, dropped
+
+
+def skill_coverage(jd_skills, resume_skills):
+    """
+    Computes how many of the job description's skills a resume covers.
+
+    Args:
+        jd_skills (list): Canonical skills of the job description.
+        resume_skills (iterable): Canonical skills of the resume.
+
+    Returns:
+        tuple: (coverage, missing) where coverage is the percentage (0-100) of `jd_skills` in
+        the resume (None when the JD has no known skills) and missing lists the JD skills absent
+        from the resume, in JD order.
+    """
+    if not jd_skills:
+        return None, []
+    resume_skills = set(resume_skills)
+    missing = [skill for skill in jd_skills if skill not in resume_skills]
+    return 100 * (len(jd_skills) - len(missing)) / len(jd_skills), missing
+
+
+def check_matched_skills(claimed, resume_skills):
+    """
+    Drops the skills of an LLM's "Matched Skills" that the resume does not mention.
+
+    Returns:
+        list: The skills kept, in their original order and spelling.
+    """
+    kept, dropped = get_skill_matcher().verify(claimed, resume_skills)
+    if dropped:
+        metrics.increment("skill_check", len(dropped), result="dropped")
+    return kept
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_skill_matcher():
+    """
+    Returns the process-wide matcher of the skills taxonomy, compiling it on first use.
+    """
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = SkillMatcher(load_taxonomy())
+    return _matcher
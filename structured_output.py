@@ -0,0 +1,330 @@
+"""
+Incremental JSON parsing and schema validation for LLM analysis responses.
+
+`StreamingJSONParser` scans a response while it streams in and reports every value as soon as
+it is complete, so a resume's name and score can be shown before the rest of its analysis has
+arrived. `validate_analysis` checks a parsed analysis against ANALYSIS_FIELDS, repairs values
+that have an unambiguous fix (e.g. "85%" -> 85, a comma-separated skill string -> a list) and
+reports the fields that are still invalid, so only those need to be asked for again.
+"""
+import json
+import re
+from collections import namedtuple
+from copy import copy
+from dataclasses import dataclass
+
+# Fit classification threshold of the scoring rubric
+FIT_THRESHOLD = 70
+
+_EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+# -- Incremental parsing --
+class _Frame:
+    __slots__ = ("kind", "key", "index", "expect_key", "child_start", "scalar")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.key = None
+        self.index = -1
+        self.expect_key = kind == "{"
+        self.child_start = None
+        self.scalar = False
+
+
+class StreamingJSONParser:
+    """
+    Incremental scanner for one JSON document arriving in pieces.
+
+    `feed` returns the (path, value) pairs of the values completed by the new text, for values
+    nested at most `max_depth` containers deep. A path holds object keys and array indexes,
+    e.g. ("Fit Score",) or ("results", 0, "Candidate Name"). Text before the document (such as
+    a Markdown fence) is ignored.
+    """
+
+    __slots__ = ("max_depth", "_buffer", "_pos", "_stack", "_in_string", "_escape",
+                 "_key_start", "done")
+
+    def __init__(self, max_depth=3):
+        self.max_depth = max_depth
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._key_start = None
+        self.done = False
+
+    def feed(self, text):
+        self._buffer += text
+        buffer, stack, events = self._buffer, self._stack, []
+        for i in range(self._pos, len(buffer)):
+            if self.done:
+                break
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        stack[-1].key = json.loads(buffer[self._key_start:i + 1])
+                        self._key_start = None
+                    else:
+                        self._end_child(i + 1, events)
+                continue
+            if stack and stack[-1].scalar and (char in ",]}" or char.isspace()):
+                self._end_child(i, events)
+            if char == '"':
+                self._in_string = True
+                if stack and stack[-1].expect_key:
+                    self._key_start = i
+                else:
+                    self._start_child(i)
+            elif char in "{[":
+                self._start_child(i)
+                stack.append(_Frame(char))
+            elif char in "}]":
+                if stack:
+                    stack.pop()
+                    if stack:
+                        self._end_child(i + 1, events)
+                    else:
+                        self.done = True
+            elif char == ",":
+                if stack and stack[-1].kind == "{":
+                    stack[-1].expect_key = True
+            elif char == ":":
+                if stack:
+                    stack[-1].expect_key = False
+            elif not char.isspace() and stack and stack[-1].child_start is None:
+                self._start_child(i)
+                stack[-1].scalar = True
+        self._pos = len(buffer)
+        return events
+
+    def _start_child(self, position):
+        if self._stack:
+            frame = self._stack[-1]
+            frame.child_start = position
+            if frame.kind == "[":
+                frame.index += 1
+
+    def _end_child(self, end, events):
+        frame = self._stack[-1]
+        start, frame.child_start, frame.scalar = frame.child_start, None, False
+        if start is None or len(self._stack) > self.max_depth:
+            return
+        try:
+            value = json.loads(self._buffer[start:end])
+        except ValueError:
+            return
+        events.append((tuple(f.key if f.kind == "{" else f.index for f in self._stack), value))
+
+
+def loads_lenient(text):
+    """
+    Parses a JSON object, ignoring any text around it (such as a Markdown code fence).
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+# -- Analysis schema --
+def _parse_text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected a non-empty string")
+    return value.strip()
+
+
+def _parse_email(value):
+    # Resumes without an email are valid, so anything unusable becomes "N/A"
+    match = _EMAIL_PATTERN.search(value) if isinstance(value, str) else None
+    return match.group(0) if match else "N/A"
+
+
+def _parse_score(value):
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    if isinstance(value, str):
+        match = _NUMBER_PATTERN.search(value)
+        if not match:
+            raise ValueError("expected a number")
+        value = match.group(0)
+    score = round(float(value))
+    if not 0 <= score <= 100:
+        raise ValueError("score out of range")
+    return score
+
+
+def _parse_fit(value):
+    text = str(value).strip().lower() if isinstance(value, (str, bool)) else ""
+    if text in ("yes", "true"):
+        return "Yes"
+    if text in ("no", "false"):
+        return "No"
+    raise ValueError('expected "Yes" or "No"')
+
+
+def _parse_skills(value):
+    if isinstance(value, str):
+        value = re.split(r"[,;\n]", value)
+    if not isinstance(value, list):
+        raise ValueError("expected a list of skills")
+    return [str(skill).strip() for skill in value
+            if isinstance(skill, (str, int, float)) and str(skill).strip()]
+
+
+_Field = namedtuple("_Field", "attribute parse default description")
+
+# JSON field name -> attribute, parser (raises ValueError when invalid), default used when the
+# field is still invalid after a re-ask (None: the analysis is unusable) and the description
+# used when asking for the field again
+ANALYSIS_FIELDS = {
+    "Candidate Name": _Field("candidate_name", _parse_text, "Unknown",
+                             "the candidate's full name"),
+    "Email": _Field("email", _parse_email, "N/A", 'the candidate\'s email address, or "N/A"'),
+    "Fit Score": _Field("fit_score", _parse_score, None, "an integer from 0 to 100"),
+    "Fit": _Field("fit", _parse_fit, None, '"Yes" or "No"'),
+    "Matched Skills": _Field("matched_skills", _parse_skills, [],
+                             "a JSON array of the matched skill names"),
+    "Explanation": _Field("explanation", _parse_text, "No explanation provided.",
+                          "a short explanation of the score"),
+}
+
+
+@dataclass(slots=True)
+class Analysis:
+    """
+    A validated resume analysis.
+    """
+    candidate_name: str
+    email: str
+    fit_score: int
+    fit: str
+    matched_skills: list
+    explanation: str
+
+    @classmethod
+    def from_values(cls, values, lenient=False):
+        """
+        Builds the record from validated values, filling the defaults of missing fields.
+
+        Raises:
+            ValueError: If the score is missing, unless `lenient` (which scores it 0).
+        """
+        values = dict(values)
+        if "Fit Score" not in values:
+            if not lenient:
+                raise ValueError("Fit Score is missing or invalid.")
+            values["Fit Score"] = 0
+        values.setdefault("Fit", "Yes" if values["Fit Score"] >= FIT_THRESHOLD else "No")
+        return cls(**{field.attribute: values[name] if name in values else copy(field.default)
+                      for name, field in ANALYSIS_FIELDS.items()})
+
+    def to_dict(self):
+        return {name: getattr(self, field.attribute) for name, field in ANALYSIS_FIELDS.items()}
+
+
+def validate_analysis(data):
+    """
+    Validates and repairs one analysis against ANALYSIS_FIELDS.
+
+    Returns:
+        tuple: (values, invalid) where values maps field names to repaired values and invalid
+        lists the fields that are missing or could not be repaired. A missing "Fit" is derived
+        from the score.
+    """
+    if not isinstance(data, dict):
+        return {}, list(ANALYSIS_FIELDS)
+    values, invalid = {}, []
+    for name, field in ANALYSIS_FIELDS.items():
+        try:
+            values[name] = field.parse(data.get(name))
+        except (TypeError, ValueError):
+            invalid.append(name)
+    if "Fit" in invalid and "Fit Score" in values:
+        values["Fit"] = "Yes" if values["Fit Score"] >= FIT_THRESHOLD else "No"
+        invalid.remove("Fit")
+    return values, invalid
+
+
+def preview_fields(values):
+    """
+    Returns the name and score of a partially streamed analysis once both are valid, or None.
+    """
+    try:
+        return {"Candidate Name": _parse_text(values.get("Candidate Name")),
+                "Fit Score": _parse_score(values.get("Fit Score"))}
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_questions(data):
+    """
+    Returns the valid {"question", "answer"} pairs of an interview question response, skipping
+    malformed entries.
+    """
+    questions = data.get("questions") if isinstance(data, dict) else None
+    pairs = []
+    for entry in questions if isinstance(questions, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        entry = {str(key).strip().lower(): value for key, value in entry.items()}
+        try:
+            pairs.append({"question": _parse_text(entry.get("question")),
+                          "answer": _parse_text(entry.get("answer"))})
+        except ValueError:
+            continue
+    return pairs
+
+
+def merge_fields(values, invalid, reply):
+    """
+    Merges the re-asked fields of `reply` into validated values.
+
+    Returns:
+        tuple: (values, invalid) with the fields that are still invalid.
+    """
+    reply_values, _ = validate_analysis(reply)
+    values = {**values, **{name: reply_values[name] for name in invalid if name in reply_values}}
+    return values, [name for name in invalid if name not in values]
+
+
+def preview_listener(on_preview, require_id=False):
+    """
+    Returns a callback for StreamingJSONParser events that calls `on_preview(fields)` once per
+    streamed analysis object, as soon as its name and score are complete. `fields` holds the
+    validated "Candidate Name" and "Fit Score", plus the "Resume ID" in batched responses.
+
+    Args:
+        require_id (bool): Batched responses: the fields of an object are buffered until its
+            "Resume ID" has arrived too, whichever order the model writes them in.
+    """
+    entries, shown = {}, set()
+
+    def on_field(path, value):
+        entry_path, key = path[:-1], path[-1]
+        if not isinstance(key, str) or entry_path in shown:
+            return
+        entry = entries.setdefault(entry_path, {})
+        entry[key] = value
+        if require_id and "Resume ID" not in entry:
+            return
+        preview = preview_fields(entry)
+        if preview is not None:
+            shown.add(entry_path)
+            del entries[entry_path]
+            if "Resume ID" in entry:
+                preview["Resume ID"] = entry["Resume ID"]
+            on_preview(preview)
+
+    return on_field
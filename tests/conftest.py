@@ -0,0 +1,8 @@
+"""
+Test configuration: the app is a set of top-level modules, so the repository root is put on the
+import path. Run with `python -m pytest tests` from the repository root.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+import random
+
+from compaction import compact_text, count_tokens
+
+WORDS = ("python sql led team built api data cloud aws docker kubernetes 5 years, senior "
+         "engineer. (remote) c++ node.js").split()
+SECTIONS = ["Skills", "Projects", "Experience", "Education", "Summary", "Certifications",
+            "Hobbies", "References"]
+
+
+def random_resume(rng):
+    lines = ["John Doe", "john@example.com"]
+    for _ in range(rng.randint(1, 6)):
+        lines.append(rng.choice(SECTIONS) + ":")
+        for _ in range(rng.randint(1, 6)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(2, 40))]
+            lines.append("- " + " ".join(words) + ".")
+    return "\n".join(lines)
+
+
+def test_output_never_exceeds_the_budget():
+    rng = random.Random(5)
+    for _ in range(2000):
+        text = random_resume(rng)
+        budget = rng.randint(5, 120)
+        assert count_tokens(compact_text(text, budget)) <= budget
+
+
+def test_section_titles_are_written_once_per_kept_section():
+    text = "\n".join(["Skills:", "- python sql docker", "Hobbies:", "- chess", "Skills:",
+                      "- aws cloud"])
+    compacted = compact_text(text + "\nReferences:\n- available on request", 100)
+    assert compacted.splitlines() == ["Skills:", "- python sql docker", "Hobbies:", "- chess",
+                                      "Skills:", "- aws cloud"]
+
+
+def test_text_within_the_budget_is_unchanged():
+    text = "Skills:\n- python sql"
+    assert compact_text(text, 100) == text
@@ -0,0 +1,230 @@
+import time
+
+import openai
+import pytest
+
+import llm_client
+from llm_client import CircuitBreaker, CircuitOpenError, LLMClient, TokenBucket
+from mock_llm import start_mock_server
+
+MESSAGES = [{"role": "user", "content": "Score this resume."}]
+
+
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_mock_server(**kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(base_url, **kwargs):
+        # Rate limits off unless a test sets its own bucket
+        kwargs.setdefault("requests_per_minute", 0)
+        kwargs.setdefault("tokens_per_minute", 0)
+        client = LLMClient(api_key="mock", base_url=base_url, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_MAX", 0.2)
+
+
+# -- Retries --
+def test_retryable_failure_is_retried(mock_server, make_client, fast_backoff):
+    # Every second request fails with 429: the first call succeeds, the second is retried once
+    server, base_url = mock_server(fail_every=2)
+    client = make_client(base_url)
+    client.chat_completion(MESSAGES, "o3-mini")
+    response = client.chat_completion(MESSAGES, "o3-mini")
+
+    assert response.choices[0].message.content
+    assert server.request_count == 3
+    assert client.stats.snapshot()["retries"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_server_errors_are_retried_until_max_retries(mock_server, make_client, fast_backoff):
+    server, base_url = mock_server(fail_every=1, fail_status=503)
+    client = make_client(base_url, max_retries=2)
+    with pytest.raises(openai.InternalServerError):
+        client.chat_completion(MESSAGES, "o3-mini")
+
+    assert server.request_count == 3
+    stats = client.stats.snapshot()
+    assert (stats["retries"], stats["failures"]) == (2, 1)
+    assert client.breaker.failures == 1
+
+
+def test_rejected_request_is_not_retried(mock_server, make_client, fast_backoff):
+    server, base_url = mock_server(fail_every=1, fail_status=400)
+    client = make_client(base_url)
+    with pytest.raises(openai.BadRequestError):
+        client.chat_completion(MESSAGES, "o3-mini")
+
+    assert server.request_count == 1
+    assert client.breaker.failures == 0
+
+
+def test_retry_after_is_capped_at_backoff_max(mock_server, make_client, fast_backoff):
+    server, base_url = mock_server(fail_every=2, retry_after=3600)
+    client = make_client(base_url)
+    client.chat_completion(MESSAGES, "o3-mini")
+    started = time.monotonic()
+    client.chat_completion(MESSAGES, "o3-mini")
+    elapsed = time.monotonic() - started
+
+    # The hour-long Retry-After is honored only up to LLM_BACKOFF_MAX
+    assert server.request_count == 3
+    assert 0.2 <= elapsed < 2
+
+
+def test_short_retry_after_is_honored(mock_server, make_client, fast_backoff):
+    server, base_url = mock_server(fail_every=2, retry_after=0.1)
+    client = make_client(base_url)
+    client.chat_completion(MESSAGES, "o3-mini")
+    started = time.monotonic()
+    client.chat_completion(MESSAGES, "o3-mini")
+
+    assert time.monotonic() - started >= 0.1
+
+
+# -- Rate limiting --
+def test_token_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(600, capacity=2)
+    started = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - started < 0.05
+    bucket.acquire()
+    # 600 per minute refills one token every 0.1 s
+    assert time.monotonic() - started >= 0.09
+
+
+def test_token_bucket_caps_oversized_requests_at_capacity():
+    bucket = TokenBucket(600, capacity=5)
+    started = time.monotonic()
+    bucket.acquire(1000)
+    assert time.monotonic() - started < 0.05
+    assert bucket.tokens <= 0
+
+
+def test_token_bucket_consume_delays_the_next_acquire():
+    bucket = TokenBucket(600, capacity=1)
+    bucket.consume(2)
+    started = time.monotonic()
+    bucket.acquire()
+    # From -1 back to one token at 10 tokens per second
+    assert time.monotonic() - started >= 0.18
+
+
+def test_zero_rate_disables_the_bucket():
+    bucket = TokenBucket(0)
+    for _ in range(1000):
+        bucket.acquire()
+    bucket.consume(10**6)
+
+
+def test_client_requests_wait_for_the_request_bucket(mock_server, make_client):
+    server, base_url = mock_server()
+    client = make_client(base_url)
+    client.request_limiter = TokenBucket(600, capacity=1)
+    started = time.monotonic()
+    for _ in range(3):
+        client.chat_completion(MESSAGES, "o3-mini")
+
+    assert server.request_count == 3
+    assert time.monotonic() - started >= 0.18
+
+
+# -- Circuit breaker --
+def test_breaker_opens_and_rejects_calls_without_sending_them(mock_server, make_client):
+    server, base_url = mock_server(fail_every=1, fail_status=500)
+    client = make_client(base_url, max_retries=0)
+    client.breaker = CircuitBreaker(threshold=2, cooldown=60)
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            client.chat_completion(MESSAGES, "o3-mini")
+
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.chat_completion(MESSAGES, "o3-mini")
+    assert server.request_count == 2
+
+
+def test_half_open_probe_success_closes_the_breaker(mock_server, make_client):
+    server, base_url = mock_server(fail_every=1, fail_status=500)
+    client = make_client(base_url, max_retries=0)
+    client.breaker = CircuitBreaker(threshold=1, cooldown=0.1)
+    with pytest.raises(openai.InternalServerError):
+        client.chat_completion(MESSAGES, "o3-mini")
+    time.sleep(0.15)
+    assert client.breaker.state == "half-open"
+
+    server.fail_every = 0
+    client.chat_completion(MESSAGES, "o3-mini")
+    assert client.breaker.state == "closed"
+    assert client.breaker.failures == 0
+
+
+def test_half_open_probe_failure_reopens_the_breaker(mock_server, make_client):
+    server, base_url = mock_server(fail_every=1, fail_status=500)
+    client = make_client(base_url, max_retries=0)
+    client.breaker = CircuitBreaker(threshold=3, cooldown=0.1)
+    for _ in range(3):
+        with pytest.raises(openai.InternalServerError):
+            client.chat_completion(MESSAGES, "o3-mini")
+    time.sleep(0.15)
+
+    # A single failed probe is enough to open it again for a full cooldown
+    with pytest.raises(openai.InternalServerError):
+        client.chat_completion(MESSAGES, "o3-mini")
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.chat_completion(MESSAGES, "o3-mini")
+    assert server.request_count == 4
+
+
+def test_half_open_lets_one_probe_through_at_a_time():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # A probe that says nothing about the service (e.g. a 400) frees the slot
+    breaker.release()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_rejected_probe_releases_the_half_open_breaker(mock_server, make_client):
+    server, base_url = mock_server(fail_every=1, fail_status=400)
+    client = make_client(base_url, max_retries=0)
+    client.breaker = CircuitBreaker(threshold=1, cooldown=0)
+    client.breaker.record_failure()
+    for _ in range(2):
+        with pytest.raises(openai.BadRequestError):
+            client.chat_completion(MESSAGES, "o3-mini")
+
+    assert server.request_count == 2
+    assert client.breaker.state == "half-open"
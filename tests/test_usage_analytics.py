@@ -0,0 +1,69 @@
+from datetime import date, datetime
+
+from fake_firestore import FakeFirestore, Increment
+from usage_analytics import (DAILY_ROLLUP_COLLECTION, count_unique_users, load_daily_rollups,
+                             rebuild_rollups, user_key)
+from usage_logger import UsageLogWriter
+
+LOGS = [
+    ("a@example.com", 2, datetime(2025, 3, 14, 9, 0)),
+    ("a@example.com", 3, datetime(2025, 3, 14, 15, 0)),
+    ("b@example.com", 1, datetime(2025, 3, 14, 11, 0)),
+    ("b@example.com", 4, datetime(2025, 3, 16, 10, 0)),
+]
+
+
+def seed_logs(db):
+    for email, num_resumes, timestamp in LOGS:
+        db.collection("usage_logs").document().set(
+            {"user_email": email, "num_resumes": num_resumes, "timestamp": timestamp})
+
+
+def test_rebuild_rollups_counts_users_and_days():
+    db = FakeFirestore()
+    seed_logs(db)
+    assert rebuild_rollups(db) == {"users": 2, "days": 2}
+
+    user = db.collection("users").document("a@example.com").get().to_dict()
+    assert user == {"usage_count": 2, "total_resumes_screened": 5,
+                    "last_used": datetime(2025, 3, 14, 15, 0)}
+    day = db.collection(DAILY_ROLLUP_COLLECTION).document("2025-03-14").get().to_dict()
+    assert day == {"date": "2025-03-14", "usage_count": 3, "num_resumes": 6,
+                   "users": {user_key("a@example.com"): True, user_key("b@example.com"): True}}
+
+
+def test_rebuild_rollups_keeps_other_user_fields():
+    db = FakeFirestore()
+    db.collection("users").document("a@example.com").set({"name": "A", "role": "admin"})
+    seed_logs(db)
+    rebuild_rollups(db)
+
+    user = db.collection("users").document("a@example.com").get().to_dict()
+    assert user["role"] == "admin"
+    assert user["usage_count"] == 2
+
+
+def test_unique_users_over_a_date_range():
+    db = FakeFirestore()
+    seed_logs(db)
+    rebuild_rollups(db)
+
+    days = load_daily_rollups(db, date(2025, 3, 14), date(2025, 3, 16))
+    assert [day["date"] for day in days] == ["2025-03-14", "2025-03-16"]
+    assert count_unique_users(days) == 2
+    assert count_unique_users(load_daily_rollups(db, date(2025, 3, 16), date(2025, 3, 16))) == 1
+    assert count_unique_users(load_daily_rollups(db, date(2025, 3, 17), date(2025, 3, 18))) == 0
+
+
+def test_rebuild_matches_rollups_written_by_the_usage_writer():
+    written = FakeFirestore()
+    writer = UsageLogWriter(written, flush_size=1000, flush_interval=3600, increment=Increment)
+    for email, num_resumes, timestamp in LOGS:
+        writer.log(email, num_resumes, timestamp)
+    writer.close()
+
+    rebuilt = FakeFirestore()
+    seed_logs(rebuilt)
+    rebuild_rollups(rebuilt)
+    for collection in ("users", DAILY_ROLLUP_COLLECTION):
+        assert written.collections[collection] == rebuilt.collections[collection]
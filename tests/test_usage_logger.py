@@ -0,0 +1,144 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from fake_firestore import FakeFirestore, Increment, WriteBatch
+from usage_analytics import DAILY_ROLLUP_COLLECTION, user_key
+from usage_logger import UsageLogWriter
+
+DAY_1 = datetime(2025, 3, 14, 9, 30)
+DAY_2 = datetime(2025, 3, 15, 17, 0)
+
+
+class FailingBatch(WriteBatch):
+    def __init__(self, db):
+        super().__init__()
+        self._db = db
+
+    def commit(self):
+        if self._db.failures:
+            self._db.failures -= 1
+            raise ConnectionError("Firestore unavailable")
+        super().commit()
+
+
+class FlakyFirestore(FakeFirestore):
+    """
+    Fake whose next `failures` batch commits raise.
+    """
+
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+
+    def batch(self):
+        return FailingBatch(self)
+
+
+@pytest.fixture
+def make_writer():
+    writers = []
+
+    def make(db, **kwargs):
+        # Long interval and large batch: nothing is written until the test flushes
+        kwargs.setdefault("flush_size", 1000)
+        kwargs.setdefault("flush_interval", 3600)
+        writer = UsageLogWriter(db, increment=Increment, **kwargs)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.close()
+
+
+def document(db, collection, document_id):
+    return db.collection(collection).document(document_id).get().to_dict()
+
+
+def test_log_does_not_write_until_flush(make_writer):
+    db = FakeFirestore()
+    writer = make_writer(db)
+    writer.log("a@example.com", 3, DAY_1)
+    assert writer.pending() == 1
+    assert db.writes == 0
+
+    writer.flush()
+    assert writer.pending() == 0
+    logs = [doc.to_dict() for doc in db.collection("usage_logs").stream()]
+    assert logs == [{"user_email": "a@example.com", "num_resumes": 3, "timestamp": DAY_1}]
+
+
+def test_flush_coalesces_increments_per_user_and_day(make_writer):
+    db = FakeFirestore()
+    db.collection("users").document("a@example.com").set({"name": "A", "usage_count": 2,
+                                                           "total_resumes_screened": 10})
+    writer = make_writer(db)
+    for num_resumes in (1, 2, 3):
+        writer.log("a@example.com", num_resumes, DAY_1)
+    writer.log("b@example.com", 5, DAY_2)
+    writes = db.writes
+    writer.flush()
+
+    # One document per event, then one increment per user and one per day
+    assert db.writes - writes == 4 + 2 + 2
+    user = document(db, "users", "a@example.com")
+    assert user == {"name": "A", "usage_count": 5, "total_resumes_screened": 16,
+                    "last_used": DAY_1}
+    assert document(db, "users", "b@example.com")["usage_count"] == 1
+    day = document(db, DAILY_ROLLUP_COLLECTION, "2025-03-14")
+    assert day == {"date": "2025-03-14", "num_resumes": 6, "usage_count": 3,
+                   "users": {user_key("a@example.com"): True}}
+
+
+def test_daily_users_map_accumulates_across_flushes(make_writer):
+    db = FakeFirestore()
+    writer = make_writer(db)
+    writer.log("a@example.com", 1, DAY_1)
+    writer.flush()
+    writer.log("B@example.com", 1, DAY_1)
+    writer.log("a@example.com", 1, DAY_1)
+    writer.flush()
+
+    day = document(db, DAILY_ROLLUP_COLLECTION, "2025-03-14")
+    assert day["usage_count"] == 3
+    assert set(day["users"]) == {user_key("a@example.com"), user_key("b@example.com")}
+
+
+def test_failed_flush_requeues_events_and_retry_writes_them_once(make_writer):
+    db = FlakyFirestore(failures=1)
+    writer = make_writer(db)
+    writer.log("a@example.com", 2, DAY_1)
+    writer.log("a@example.com", 4, DAY_1)
+
+    writer.flush()
+    assert writer.pending() == 2
+    assert db.collections.get("usage_logs", {}) == {}
+
+    writer.log("a@example.com", 1, DAY_2)
+    writer.flush()
+    assert writer.pending() == 0
+    assert len(db.collections["usage_logs"]) == 3
+    assert document(db, "users", "a@example.com")["total_resumes_screened"] == 7
+    assert document(db, DAILY_ROLLUP_COLLECTION, "2025-03-14")["num_resumes"] == 6
+
+
+def test_flush_size_triggers_background_flush(make_writer):
+    db = FakeFirestore()
+    writer = make_writer(db, flush_size=3)
+    for _ in range(3):
+        writer.log("a@example.com", 1, DAY_1)
+    deadline = time.monotonic() + 5
+    while writer.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.pending() == 0
+    assert document(db, "users", "a@example.com")["usage_count"] == 3
+
+
+def test_close_flushes_remaining_events():
+    db = FakeFirestore()
+    writer = UsageLogWriter(db, flush_size=1000, flush_interval=3600, increment=Increment)
+    writer.log("a@example.com", 1, DAY_1)
+    writer.close()
+    assert len(db.collections["usage_logs"]) == 1
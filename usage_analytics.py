@@ -0,0 +1,142 @@
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+# Collection holding one rollup document per day, keyed by ISO date (e.g. "2025-03-14")
+DAILY_ROLLUP_COLLECTION = "usage_daily"
+USAGE_LOG_PAGE_SIZE = 50
+
+
+def day_key(timestamp):
+    """
+    Returns the rollup document ID for a timestamp or date.
+    """
+    return timestamp.date().isoformat() if isinstance(timestamp, datetime) else timestamp.isoformat()
+
+
+def user_key(email):
+    """
+    Returns the key of a user in a daily rollup's `users` map.
+
+    Emails are hashed because Firestore map keys cannot safely contain dots.
+    """
+    return hashlib.sha256((email or "").lower().encode("utf-8")).hexdigest()[:16]
+
+
+def load_user_summaries(db):
+    """
+    Reads the per-user counters maintained on each `users` document.
+
+    Returns:
+        list: One dict per user with email, role, usage_count, total_resumes_screened and last_used.
+    """
+    summaries = []
+    for user in db.collection("users").stream():
+        data = user.to_dict()
+        summaries.append({
+            "email": data.get("email", user.id),
+            "role": data.get("role", "user"),
+            "usage_count": data.get("usage_count", 0),
+            "total_resumes_screened": data.get("total_resumes_screened", 0),
+            "last_used": data.get("last_used"),
+        })
+    return summaries
+
+
+def load_daily_rollups(db, start_date, end_date):
+    """
+    Reads the per-day rollups between two dates (inclusive).
+
+    Returns:
+        list: One dict per day with date, usage_count, num_resumes and users (the keys of the
+        users active that day), oldest first.
+    """
+    query = (db.collection(DAILY_ROLLUP_COLLECTION)
+             .where("date", ">=", start_date.isoformat())
+             .where("date", "<=", end_date.isoformat())
+             .order_by("date"))
+    return [{
+        "date": data.get("date"),
+        "usage_count": data.get("usage_count", 0),
+        "num_resumes": data.get("num_resumes", 0),
+        "users": list(data.get("users", {})),
+    } for data in (doc.to_dict() for doc in query.stream())]
+
+
+def count_unique_users(daily_rollups):
+    """
+    Counts the distinct users active on any of the given days.
+    """
+    return len(set().union(*(day["users"] for day in daily_rollups)))
+
+
+def load_usage_log_page(db, start_date, end_date, page_size=USAGE_LOG_PAGE_SIZE, after=None):
+    """
+    Reads one page of raw usage logs in a date range, newest first.
+
+    Args:
+        after (datetime): Timestamp of the last log on the previous page, or None for the first page.
+
+    Returns:
+        tuple: (logs, next_cursor) where next_cursor is None on the last page.
+    """
+    query = (db.collection("usage_logs")
+             .where("timestamp", ">=", datetime.combine(start_date, time.min))
+             .where("timestamp", "<", datetime.combine(end_date + timedelta(days=1), time.min))
+             .order_by("timestamp", direction="DESCENDING"))
+    if after is not None:
+        query = query.start_after({"timestamp": after})
+    # Read one extra document to know whether there is a next page
+    logs = [doc.to_dict() for doc in query.limit(page_size + 1).stream()]
+    next_cursor = logs[page_size - 1]["timestamp"] if len(logs) > page_size else None
+    return logs[:page_size], next_cursor
+
+
+def rebuild_rollups(db):
+    """
+    Recomputes per-user and per-day counters from the full `usage_logs` collection.
+
+    This streams every log once; it is only needed to backfill rollups for logs written before
+    rollups were maintained.
+    """
+    users, days = {}, {}
+    for doc in db.collection("usage_logs").stream():
+        log = doc.to_dict()
+        timestamp = log.get("timestamp")
+        email = log.get("user_email")
+        num_resumes = log.get("num_resumes", 0)
+        user = users.setdefault(email, {"usage_count": 0, "total_resumes_screened": 0,
+                                        "last_used": timestamp})
+        user["usage_count"] += 1
+        user["total_resumes_screened"] += num_resumes
+        if timestamp and (user["last_used"] is None or timestamp > user["last_used"]):
+            user["last_used"] = timestamp
+        if timestamp:
+            day = days.setdefault(day_key(timestamp),
+                                  {"usage_count": 0, "num_resumes": 0, "users": {}})
+            day["usage_count"] += 1
+            day["num_resumes"] += num_resumes
+            day["users"][user_key(email)] = True
+    batch, pending = db.batch(), 0
+    for collection, documents in (("users", users), (DAILY_ROLLUP_COLLECTION, days)):
+        for document_id, counters in documents.items():
+            if document_id is None:
+                continue
+            data = dict(counters)
+            if collection == DAILY_ROLLUP_COLLECTION:
+                data["date"] = document_id
+            batch.set(db.collection(collection).document(document_id), data, merge=True)
+            pending += 1
+            if pending == 500:
+                batch.commit()
+                batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return {"users": len(users), "days": len(days)}
+
+
+def default_date_range(days=30):
+    """
+    Returns (start_date, end_date) covering the last `days` days up to today.
+    """
+    today = date.today()
+    return today - timedelta(days=days - 1), today
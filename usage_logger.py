@@ -0,0 +1,181 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import metrics
+from usage_analytics import DAILY_ROLLUP_COLLECTION, day_key, user_key
+
+# Flush buffered usage events once this many are queued or this many seconds have passed
+USAGE_FLUSH_SIZE = int(os.environ.get("USAGE_FLUSH_SIZE", "50"))
+USAGE_FLUSH_INTERVAL = float(os.environ.get("USAGE_FLUSH_INTERVAL", "5"))
+# Firestore allows at most 500 writes per batch
+FIRESTORE_BATCH_LIMIT = 500
+FIREBASE_CREDENTIALS_PATH = "talent-iq-firebase.json"
+
+
+def get_firestore_db():
+    """
+    Returns the Firestore client, initializing the Firebase app on first use.
+
+    Unlike `authentication.get_db`, this does not import Streamlit, so job workers can log usage.
+    """
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+
+    if not os.path.exists(FIREBASE_CREDENTIALS_PATH):
+        raise FileNotFoundError(f"Firebase credentials file not found: {FIREBASE_CREDENTIALS_PATH}")
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS_PATH))
+    return firestore.client()
+
+
+def _firestore_increment(value):
+    from firebase_admin import firestore
+
+    return firestore.Increment(value)
+
+
+class UsageLogWriter:
+    """
+    Buffers usage events in-process and writes them to Firestore from a background thread.
+
+    Each flush writes one `usage_logs` document per event plus a single coalesced increment per
+    user (in `users`) and per day (in `usage_daily`, which also records the day's active users),
+    grouped into Firestore write batches.
+
+    Args:
+        db: A Firestore client (or an in-memory fake with the same interface).
+        flush_size (int): Flush as soon as this many events are queued.
+        flush_interval (float): Flush at least this often, in seconds.
+        increment: Factory for increment transforms (defaults to `firestore.Increment`).
+    """
+
+    def __init__(self, db, flush_size=USAGE_FLUSH_SIZE, flush_interval=USAGE_FLUSH_INTERVAL,
+                 increment=None):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.increment = increment or _firestore_increment
+        self._events = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, email, num_resumes, timestamp=None):
+        """
+        Queues a usage event without blocking on Firestore.
+        """
+        # The document ID is fixed up front so a retried flush overwrites instead of duplicating
+        event_id = uuid.uuid4().hex
+        with self._condition:
+            self._events.append((event_id, {
+                "user_email": email,
+                "num_resumes": num_resumes,
+                "timestamp": timestamp or datetime.now(),
+            }))
+            if len(self._events) >= self.flush_size:
+                self._condition.notify()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._condition:
+                while (not self._closed and len(self._events) < self.flush_size
+                       and time.monotonic() < deadline):
+                    self._condition.wait(max(0, deadline - time.monotonic()))
+                if self._closed:
+                    return
+            self.flush()
+            deadline = time.monotonic() + self.flush_interval
+
+    def flush(self):
+        """
+        Writes every queued event to Firestore. Events from a failed write are queued again.
+        """
+        with self._flush_lock:
+            with self._condition:
+                events, self._events = self._events, []
+            if not events:
+                return
+            try:
+                self._write(events)
+            except Exception as e:
+                print(f"Error writing usage logs, will retry: {e}")
+                with self._condition:
+                    self._events[:0] = events
+
+    def _write(self, events):
+        user_totals, day_totals, day_users, last_used = {}, {}, {}, {}
+        operations = []
+        for event_id, event in events:
+            operations.append(("set", self.db.collection("usage_logs").document(event_id), event))
+            email, day = event["user_email"], day_key(event["timestamp"])
+            resumes, uses = user_totals.get(email, (0, 0))
+            user_totals[email] = (resumes + event["num_resumes"], uses + 1)
+            resumes, uses = day_totals.get(day, (0, 0))
+            day_totals[day] = (resumes + event["num_resumes"], uses + 1)
+            day_users.setdefault(day, {})[user_key(email)] = True
+            last_used[email] = max(last_used.get(email, event["timestamp"]), event["timestamp"])
+        # Per-user and per-day rollups read by the admin analytics page
+        for email, (resumes, uses) in user_totals.items():
+            operations.append(("merge", self.db.collection("users").document(email), {
+                "total_resumes_screened": self.increment(resumes),
+                "usage_count": self.increment(uses),
+                "last_used": last_used[email],
+            }))
+        for day, (resumes, uses) in day_totals.items():
+            operations.append(("merge", self.db.collection(DAILY_ROLLUP_COLLECTION).document(day), {
+                "date": day,
+                "num_resumes": self.increment(resumes),
+                "usage_count": self.increment(uses),
+                "users": day_users[day],
+            }))
+        for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for kind, reference, data in operations[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(reference, data, merge=kind == "merge")
+            batch.commit()
+
+    def close(self):
+        """
+        Stops the background thread and flushes the remaining events.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def pending(self):
+        with self._condition:
+            return len(self._events)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_usage_writer(db):
+    """
+    Returns the process-wide usage writer for the Firestore client, flushed at interpreter exit.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = UsageLogWriter(db)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def log_usage(email, num_resumes):
+    """
+    Queues a usage event for the process-wide writer (written to Firestore in the background).
+    """
+    with metrics.span("log_usage"):
+        get_usage_writer(get_firestore_db()).log(email, num_resumes)
@@ -1,91 +1,245 @@
-import fitz  # PyMuPDF
-import docx  # python-docx
+import io
+import multiprocessing as mp
+import os
 import re
-from pdfminer.high_level import extract_text as pdfminer_extract_text
-import PyPDF2
-import docx2txt as d2t
+import time
+import unicodedata
+from collections import deque
+from multiprocessing import connection as mp_connection
+
+import metrics
+from ocr import ocr_pdf_text, ocr_share
+from office import doc_text, docx_text
+
+# Parser libraries (PyMuPDF, PDFMiner, PyPDF2, python-docx, docx2txt) are imported inside the
+# backends that use them, so a TXT-only upload never pays for loading the PDF/Office parsers.
+# Scanned PDFs fall through every text backend to OCR (see ocr.py); Word files are read by the
+# streaming DOCX and native DOC readers first (see office.py).
+
+
+# A word hyphenated across a line break ("experi-\nence"), as PDF text extraction leaves it
+_HYPHENATED_BREAK = re.compile(r"(?<=[a-z])-\n(?=[a-z])")
+
+
+def _collapse_whitespace(text):
+    # str.split() collapses and strips the whitespace of each line in one C-level pass
+    return "\n".join(line for line in (" ".join(line.split()) for line in text.splitlines())
+                     if line)
+
+
+def _repair_line_breaks(text):
+    # The substring check is a C-level scan; most texts have nothing to repair
+    return _HYPHENATED_BREAK.sub("", text) if "-\n" in text else text
 
 
 def normalize_text(text):
     """
-    Normalizes text by removing extra spaces and non-ASCII characters.
+    Normalizes text by collapsing whitespace, rejoining hyphenated words split across lines and
+    folding non-ASCII characters to ASCII.
+
+    Whitespace runs within a line become a single space and blank lines are dropped, but other
+    line breaks are kept: compaction recognizes section headers and bullets by the lines they
+    start. Characters with an ASCII decomposition are folded (e.g. "é" -> "e", the "ﬁ" ligature
+    -> "fi"); the rest (e.g. bullet symbols) are dropped.
+    """
+    text = _collapse_whitespace(text)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+        # Dropped characters may leave double spaces and empty lines behind
+        text = _collapse_whitespace(text)
+    return _repair_line_breaks(text)
+
+
+def iter_pdf_pages(data, max_pages=None):
     """
-    text = re.sub(r"\s+", " ", text)  # Replace multiple spaces with a single space
-    text = text.encode("ascii", "ignore").decode("utf-8")  # Remove non-ASCII characters
-    return text.strip()
+    Yields the normalized text of each PDF page with PyMuPDF, so callers can stop early.
+
+    Args:
+        data (bytes): The PDF file contents.
+        max_pages (int, optional): Stop after this many pages.
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page_number, page in enumerate(doc):
+            if max_pages is not None and page_number >= max_pages:
+                break
+            yield normalize_text(page.get_text())
 
 
-def fix_line_breaks(text):
+def _pdf_text_pymupdf(data):
     """
-    Fixes unintended line breaks in the text.
+    Extracts raw PDF text with PyMuPDF (fitz).
     """
-    text = re.sub(r"(\w+)\n(\w+)", r"\1 \2", text)  # Join words split by line breaks
-    return text
+    import fitz  # PyMuPDF
 
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        # Join the page chunks once instead of growing a string page by page
+        return "\n".join([page.get_text() for page in doc])
 
-def extract_text_from_pdf(file):
+
+def _pdf_text_pdfminer(data):
+    """
+    Extracts raw PDF text with PDFMiner.
     """
-    Extracts text from a PDF file using PyMuPDF, PDFMiner, and PyPDF2 as fallbacks.
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+
+    return pdfminer_extract_text(io.BytesIO(data))
+
+
+def _pdf_text_pypdf2(data):
+    """
+    Extracts raw PDF text with PyPDF2.
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return "".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _docx_text_docx2txt(data):
+    """
+    Extracts raw DOCX text with docx2txt.
+    """
+    import docx2txt as d2t
+
+    return d2t.process(io.BytesIO(data))
+
+
+def _doc_text_python_docx(data):
+    """
+    Extracts raw DOC text with python-docx (may not work for all DOC files).
+    """
+    import docx  # python-docx
+
+    doc = docx.Document(io.BytesIO(data))
+    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+
+
+def _txt_text(data):
+    """
+    Decodes a UTF-8 text file.
+    """
+    return data.decode("utf-8")
+
+
+# Extraction backends by name, and the backends tried in order for each MIME type
+BACKENDS = {
+    "pymupdf": _pdf_text_pymupdf,
+    "pdfminer": _pdf_text_pdfminer,
+    "pypdf2": _pdf_text_pypdf2,
+    "ocr": ocr_pdf_text,
+    "office-docx": docx_text,
+    "docx2txt": _docx_text_docx2txt,
+    "office-doc": doc_text,
+    "python-docx": _doc_text_python_docx,
+    "txt": _txt_text,
+}
+BACKENDS_BY_TYPE = {
+    "application/pdf": ["pymupdf", "pdfminer", "pypdf2", "ocr"],
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        ["office-docx", "docx2txt"],
+    "application/msword": ["office-doc", "python-docx"],
+    "text/plain": ["txt"],
+}
+UNSUPPORTED_FILE_TYPE_MESSAGE = "Unsupported file type. Please upload PDF, DOCX, DOC, or TXT files."
+NO_TEXT_MESSAGE = "No text could be extracted from the file."
+# Backends cheap enough to run in the calling process instead of an extraction worker
+INLINE_BACKENDS = frozenset({"txt"})
+
+# Default number of extraction processes and per-document, per-backend timeout (seconds)
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", str(os.cpu_count() or 2)))
+EXTRACTION_TIMEOUT = float(os.environ.get("EXTRACTION_TIMEOUT", "60"))
+
+
+def _read_bytes(file):
+    """
+    Returns the full contents of an uploaded file without consuming it.
+    """
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    return file.read()
+
+
+def _extract_with_backends(data, backends, label):
+    """
+    Runs the backends in order until one returns non-empty text.
+
+    Raises:
+        RuntimeError: If every backend failed.
+        ValueError: If no backend extracted any text.
     """
     text = ""
-    try:
-        # First try with PyMuPDF (fitz)
-        with fitz.open(stream=file.read(), filetype="pdf") as doc:
-            for page in doc:
-                text += page.get_text()
-        if not text.strip():
-            # If PyMuPDF fails, try with PDFMiner
-            file.seek(0)  # Reset file pointer
-            text = pdfminer_extract_text(file)
-        if not text.strip():
-            # If both fail, try with PyPDF2
-            file.seek(0)  # Reset file pointer
-            reader = PyPDF2.PdfFileReader(file)
-            num_pages = reader.getNumPages()
-            for i in range(num_pages):
-                page = reader.getPage(i)
-                text += page.extractText()
-    except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        text = ""
-    return normalize_text(fix_line_breaks(text))
+    errors = []
+    for position, backend in enumerate(backends):
+        try:
+            with metrics.span("extract", backend=backend):
+                text = BACKENDS[backend](data)
+        except Exception as e:
+            print(f"Error extracting text from {label} with {backend}: {e}")
+            metrics.increment("extraction_backend", backend=backend, outcome="error")
+            errors.append(f"{backend}: {e}")
+            text = ""
+        else:
+            metrics.increment("extraction_backend", backend=backend,
+                              outcome="success" if text.strip() else "empty")
+        if text.strip():
+            break
+        if position + 1 < len(backends):
+            metrics.increment("extraction_fallbacks", backend=backend)
+    if not text.strip():
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        raise ValueError(NO_TEXT_MESSAGE)
+    with metrics.span("normalize"):
+        return normalize_text(text)
+
+
+def extract_text_from_pdf(file, max_pages=None):
+    """
+    Extracts text from a PDF file using PyMuPDF, PDFMiner, and PyPDF2 as fallbacks, and OCR for
+    scanned documents without a text layer.
+
+    If `max_pages` is given, only the first pages are read with PyMuPDF; the fallbacks are
+    only used when PyMuPDF finds no text.
+    """
+    if max_pages is not None:
+        data = _read_bytes(file)
+        try:
+            text = "\n".join(filter(None, iter_pdf_pages(data, max_pages)))
+            if text:
+                return text
+        except Exception as e:
+            print(f"Error extracting text from PDF with pymupdf: {e}")
+        return _extract_with_backends(data, ["pdfminer", "pypdf2", "ocr"], "PDF")
+    return _extract_with_backends(_read_bytes(file), BACKENDS_BY_TYPE["application/pdf"], "PDF")
 
 
 def extract_text_from_docx(file):
     """
-    Extracts text from a DOCX file using docx2txt.
+    Extracts text from a DOCX file with the streaming reader, using docx2txt as a fallback.
     """
-    try:
-        text = d2t.process(file)
-    except Exception as e:
-        print(f"Error extracting text from DOCX: {e}")
-        text = ""
-    return normalize_text(fix_line_breaks(text))
+    return _extract_with_backends(
+        _read_bytes(file),
+        BACKENDS_BY_TYPE["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+        "DOCX")
 
 
 def extract_text_from_doc(file):
     """
-    Extracts text from a DOC file using python-docx (fallback for textract).
+    Extracts text from a Word 97-2003 DOC file with the native reader, using python-docx as a
+    fallback for DOCX files uploaded as DOC.
     """
-    try:
-        # Try reading DOC files using python-docx (may not work for all DOC files)
-        doc = docx.Document(file)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-    except Exception as e:
-        print(f"Error extracting text from DOC: {e}")
-        text = ""
-    return normalize_text(fix_line_breaks(text))
+    return _extract_with_backends(_read_bytes(file), BACKENDS_BY_TYPE["application/msword"],
+                                  "DOC")
 
 
 def extract_text_from_txt(file):
     """
     Extracts text from a TXT file.
     """
-    try:
-        return normalize_text(fix_line_breaks(file.read().decode("utf-8")))
-    except Exception as e:
-        print(f"Error extracting text from TXT: {e}")
-        return ""
+    return _extract_with_backends(_read_bytes(file), ["txt"], "TXT")
 
 
 def extract_text_from_file(file):
@@ -101,6 +255,168 @@ def extract_text_from_file(file):
     elif file.type == "text/plain":
         return extract_text_from_txt(file)
     else:
-        raise ValueError(
-            "Unsupported file type. Please upload PDF, DOCX, DOC, or TXT files."
-        )
\ No newline at end of file
+        raise ValueError(UNSUPPORTED_FILE_TYPE_MESSAGE)
+
+
+# -- Parallel Batch Extraction --
+def _extraction_worker(conn):
+    """
+    Worker process loop: runs one backend per request and sends back the normalized text.
+    """
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        backend, data, options = task
+        start = time.perf_counter()
+        try:
+            raw_text = BACKENDS[backend](data, **options)
+            parsed = time.perf_counter()
+            text = normalize_text(raw_text)
+            conn.send((text, None, {"extract": parsed - start,
+                                    "normalize": time.perf_counter() - parsed}))
+        except Exception as e:
+            # Exceptions are sent as strings since not all of them can be pickled
+            conn.send(("", f"{backend}: {e}", {"extract": time.perf_counter() - start}))
+    conn.close()
+
+
+def _start_extraction_worker(ctx):
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_extraction_worker, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    return process, parent_conn
+
+
+def _stop_extraction_worker(process, conn, graceful=True):
+    if graceful and process.is_alive():
+        try:
+            conn.send(None)
+            process.join(timeout=1)
+        except (OSError, BrokenPipeError):
+            pass
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    conn.close()
+
+
+def extract_texts(files, workers=EXTRACTION_WORKERS, timeout=EXTRACTION_TIMEOUT):
+    """
+    Extracts text from many files in a pool of worker processes.
+
+    Each document runs its backends in order (e.g. PyMuPDF, then PDFMiner, then PyPDF2 for PDFs).
+    A backend that exceeds the timeout has its worker process killed and replaced, and the
+    document falls through to its next backend.
+    An OCR run gets an equal share of the cores among the documents being extracted at that
+    moment, so a lone scanned PDF is recognized on every core.
+
+    Args:
+        files (list): File-like objects with `name`, `type` and `read()`/`getvalue()`.
+        workers (int): Maximum number of extraction processes.
+        timeout (float): Timeout in seconds for a single backend on a single document.
+
+    Yields:
+        tuple: (index, file_name, text, error) in completion order, where `index` is the position
+        of the file in `files` and `error` is an exception if every backend failed or none
+        extracted any text, else None.
+    """
+    docs = {}
+    pending = deque()
+    for index, file in enumerate(files):
+        backends = BACKENDS_BY_TYPE.get(file.type)
+        if backends is None:
+            yield index, file.name, "", ValueError(UNSUPPORTED_FILE_TYPE_MESSAGE)
+            continue
+        if set(backends) <= INLINE_BACKENDS:
+            # Plain text is decoded here: a worker process would cost more than the decoding
+            with metrics.span("upload_read"):
+                data = _read_bytes(file)
+            try:
+                yield index, file.name, _extract_with_backends(data, backends, file.name), None
+            except Exception as e:
+                yield index, file.name, "", e
+            continue
+        # The bytes are read when the document is first dispatched and dropped once it is done,
+        # so only the documents in flight are held in memory
+        docs[index] = {"name": file.name, "file": file, "data": None,
+                       "backends": list(backends), "errors": []}
+        pending.append(index)
+    if not pending:
+        return
+
+    # Spawned workers avoid forking the multi-threaded Streamlit server
+    ctx = mp.get_context("spawn")
+    idle = [_start_extraction_worker(ctx) for _ in range(max(1, min(workers, len(pending))))]
+    busy = {}  # conn -> (process, index, backend, deadline)
+    try:
+        while pending or busy:
+            while pending and idle:
+                process, conn = idle.pop()
+                index = pending.popleft()
+                doc = docs[index]
+                if doc["data"] is None:
+                    with metrics.span("upload_read"):
+                        doc["data"] = _read_bytes(doc.pop("file"))
+                backend = doc["backends"].pop(0)
+                options = {}
+                if backend == "ocr":
+                    # Share the cores among the documents extracted at the same time: the ones
+                    # in flight plus those still queued, up to the number of worker processes
+                    concurrent = min(len(busy) + len(idle) + 1, len(busy) + len(pending) + 1)
+                    options["workers"] = ocr_share(concurrent)
+                conn.send((backend, doc["data"], options))
+                busy[conn] = (process, index, backend, time.monotonic() + timeout)
+
+            next_deadline = min(deadline for *_, deadline in busy.values())
+            ready = mp_connection.wait(list(busy), timeout=max(0, next_deadline - time.monotonic()))
+            finished = []
+            for conn in ready:
+                process, index, backend, _ = busy.pop(conn)
+                try:
+                    text, error, timings = conn.recv()
+                    idle.append((process, conn))
+                    outcome = "error" if error else "success" if text.strip() else "empty"
+                except EOFError:
+                    # The worker crashed (e.g. a native parser segfault); replace it
+                    text, error = "", f"{backend}: extraction process exited unexpectedly"
+                    timings, outcome = {}, "crash"
+                    _stop_extraction_worker(process, conn, graceful=False)
+                    idle.append(_start_extraction_worker(ctx))
+                for stage, seconds in timings.items():
+                    metrics.observe(stage, seconds, backend=backend)
+                metrics.increment("extraction_backend", backend=backend, outcome=outcome)
+                finished.append((index, backend, text, error))
+
+            now = time.monotonic()
+            for conn, (process, index, backend, deadline) in list(busy.items()):
+                if now >= deadline:
+                    del busy[conn]
+                    metrics.increment("extraction_backend", backend=backend, outcome="timeout")
+                    _stop_extraction_worker(process, conn, graceful=False)
+                    idle.append(_start_extraction_worker(ctx))
+                    finished.append((index, backend, "", f"{backend}: timed out after {timeout}s"))
+
+            for index, backend, text, error in finished:
+                doc = docs[index]
+                if error:
+                    print(f"Error extracting text from {doc['name']} with {error}")
+                    doc["errors"].append(error)
+                if text.strip() or not doc["backends"]:
+                    if text.strip():
+                        yield index, doc["name"], text, None
+                    elif doc["errors"]:
+                        yield index, doc["name"], "", RuntimeError("; ".join(doc["errors"]))
+                    else:
+                        yield index, doc["name"], "", ValueError(NO_TEXT_MESSAGE)
+                    del docs[index]
+                else:
+                    # Retry with the next backend ahead of documents not yet started
+                    metrics.increment("extraction_fallbacks", backend=backend)
+                    pending.appendleft(index)
+    finally:
+        for process, conn in idle:
+            _stop_extraction_worker(process, conn)
+        for conn, (process, *_) in busy.items():
+            _stop_extraction_worker(process, conn, graceful=False)
\ No newline at end of file